@@ -0,0 +1,150 @@
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+
+import discord
+
+from benchmarks.fakes import FakeBot, make_guild
+from utils import bulkroles, db
+
+# Gives a role to a few thousand members through a fake REST backend: every
+# role edit takes a round-trip, the route allows a fixed number of edits per
+# second (waiting out the reset like discord.py does) and a small share of
+# requests fail with a 500. "one by one" is what running /role for each member
+# amounts to, the other rows are the bulk executor at a few concurrencies.
+# Members that already have the role never cost a request. "resume" kills a
+# run halfway and starts it again from the database.
+#
+#   python -m benchmarks.bench_bulk_roles [members] [latency_ms] [edits_per_second]
+
+HAS_ROLE_SHARE = 0.3
+ERROR_RATE = 0.01
+
+
+class FakeHTTP:
+    def __init__(self, guild, latency, per_second, error_rate=ERROR_RATE, seed=0):
+        self.guild = guild
+        self.latency = latency
+        self.per_second = per_second
+        self.error_rate = error_rate
+        self.rng = random.Random(seed)
+        self.requests = 0
+        self.rate_limited = 0
+        self._window = 0.0
+        self._used = 0
+
+    async def _bucket(self):
+        while True:
+            now = time.perf_counter()
+            if now - self._window >= 1.0:
+                self._window, self._used = now, 0
+            if self._used < self.per_second:
+                self._used += 1
+                return
+            self.rate_limited += 1
+            await asyncio.sleep(self._window + 1.0 - now)
+
+    async def _edit(self, member_id, role_id, add):
+        await self._bucket()
+        self.requests += 1
+        await asyncio.sleep(self.latency)
+        if self.rng.random() < self.error_rate:
+            raise discord.HTTPException(SimpleNamespace(status=500, reason="Internal Server Error"), "oops")
+        member = self.guild.get_member(member_id)
+        if member is None:
+            raise discord.NotFound(SimpleNamespace(status=404, reason="Not Found"), "Unknown Member")
+        role = self.guild.get_role(role_id)
+        # What the member update from the gateway would do to the cache
+        if add and role not in member.roles:
+            member.roles.append(role)
+        elif not add and role in member.roles:
+            member.roles.remove(role)
+
+    async def add_role(self, guild_id, user_id, role_id, reason=None):
+        await self._edit(user_id, role_id, True)
+
+    async def remove_role(self, guild_id, user_id, role_id, reason=None):
+        await self._edit(user_id, role_id, False)
+
+
+def setup(count, latency, per_second):
+    guild = make_guild(members=count, roles=5, channels=0, role_names=["Event"])
+    role = guild.roles[-1]
+    rng = random.Random(1)
+    for member in guild._members.values():
+        if rng.random() < HAS_ROLE_SHARE and role not in member.roles:
+            member.roles.append(role)
+    bot = FakeBot()
+    bot.guilds = [guild]
+    bot.http = FakeHTTP(guild, latency, per_second)
+    # Members that left after the list was made
+    member_ids = list(guild._members) + [10**17 + i for i in range(count // 100)]
+    run_id = bulkroles.create_run(guild.id, 1, role.id, "add", member_ids)
+    return bot, guild, role, run_id
+
+
+def check(guild, role):
+    return all(role in member.roles for member in guild._members.values())
+
+
+def report(label, result, elapsed, http):
+    print(f"{label:<16} {result.handled / elapsed:>8.1f} members/s  {elapsed:>6.2f}s  "
+          f"{result.done:>5} added  {result.skipped:>5} skipped  {result.failed:>3} failed  "
+          f"{http.requests:>5} requests  {http.rate_limited:>4} waits")
+
+
+async def one_by_one(count, latency, per_second):
+    # Like /role per member: check the cache, add the role, next member
+    bot, guild, role, run_id = setup(count, latency, per_second)
+    started = time.perf_counter()
+    result = await bulkroles.BulkRoles(bot, run_id, concurrency=1).run()
+    report("one by one", result, time.perf_counter() - started, bot.http)
+
+
+async def bulk(count, latency, per_second, concurrency):
+    bot, guild, role, run_id = setup(count, latency, per_second)
+    started = time.perf_counter()
+    result = await bulkroles.BulkRoles(bot, run_id, concurrency=concurrency).run()
+    report(f"bulk x{concurrency}", result, time.perf_counter() - started, bot.http)
+    return check(guild, role) or result.failed
+
+
+async def resume(count, latency, per_second):
+    bot, guild, role, run_id = setup(count, latency, per_second)
+    engine = bulkroles.BulkRoles(bot, run_id)
+    started = time.perf_counter()
+    task = asyncio.create_task(engine.run())
+    while engine.progress().handled < count // 2:
+        await asyncio.sleep(0.01)
+    # The process dies; whatever wasn't flushed yet is redone
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+    interrupted = engine.progress().handled
+    result = await bulkroles.BulkRoles(bot, run_id).run()
+    report("resume", result, time.perf_counter() - started, bot.http)
+    print(f"interrupted after {interrupted}, state {bulkroles.get_run(run_id)['state']}, "
+          f"all members have the role: {check(guild, role) or f'no, {result.failed} failed'}")
+
+
+async def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    latency = (float(sys.argv[2]) if len(sys.argv) > 2 else 80) / 1000
+    per_second = int(sys.argv[3]) if len(sys.argv) > 3 else 50
+    folder = tempfile.mkdtemp()
+    db.DB_PATH = os.path.join(folder, "bench.db")
+    bulkroles.RETRY_DELAY = 0.05
+    print(f"{count} members, {HAS_ROLE_SHARE:.0%} already have the role, {latency * 1000:.0f} ms per edit, "
+          f"{per_second} edits/s allowed, {ERROR_RATE:.0%} server errors")
+
+    await one_by_one(count, latency, per_second)
+    for concurrency in (2, 4, 8):
+        await bulk(count, latency, per_second, concurrency)
+    await resume(count, latency, per_second)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
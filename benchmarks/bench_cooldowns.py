@@ -0,0 +1,77 @@
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from utils import cooldowns, db
+
+# Fills the cooldown service with a large number of users and measures check
+# throughput, memory, eviction once the cooldowns run out, and how long a
+# write-behind flush of every dirty entry takes.
+#
+#   python -m benchmarks.bench_cooldowns [users]
+
+SCOPES = ("wip", "help", "feedback")
+COOLDOWN = 7200
+
+
+def main():
+    users = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    db.DB_PATH = os.path.join(tempfile.mkdtemp(), "bot.db")
+    now = time.time()
+    user_ids = [random.getrandbits(63) for _ in range(users)]
+
+    def fill(service):
+        for i, user_id in enumerate(user_ids):
+            # Spread the pings over the cooldown window, like real traffic.
+            service.start(SCOPES[i % 3], user_id, COOLDOWN, now + i * COOLDOWN / users)
+
+    # Memory is measured on a separate fill, tracemalloc slows it down a lot.
+    tracemalloc.start()
+    measured = cooldowns.CooldownService(persist=False)
+    fill(measured)
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del measured
+
+    service = cooldowns.CooldownService()
+    started = time.perf_counter()
+    fill(service)
+    fill = time.perf_counter() - started
+    print(f"start        {users:>9} users {fill:>7.3f}s {users / fill:>12.0f} ops/s  {memory / 2**20:>8.1f} MiB tracked ({memory / users:.0f} B/user)")
+
+    check_time = now + COOLDOWN / 2
+    probes = user_ids[::2] + [random.getrandbits(63) for _ in range(users // 2)]
+    random.shuffle(probes)
+    started = time.perf_counter()
+    for i, user_id in enumerate(probes):
+        service.remaining(SCOPES[i % 3], user_id, check_time)
+    checks = time.perf_counter() - started
+    print(f"remaining    {len(probes):>9} checks {checks:>6.3f}s {len(probes) / checks:>12.0f} checks/s")
+
+    started = time.perf_counter()
+    for i, user_id in enumerate(probes[:100_000]):
+        service.acquire(SCOPES[i % 3], user_id, COOLDOWN, check_time)
+    acquire = time.perf_counter() - started
+    print(f"acquire      {min(len(probes), 100_000):>9} calls  {acquire:>6.3f}s {min(len(probes), 100_000) / acquire:>12.0f} ops/s")
+
+    started = time.perf_counter()
+    written = service.flush()
+    flush = time.perf_counter() - started
+    print(f"flush        {written:>9} rows   {flush:>6.3f}s {written / flush:>12.0f} rows/s")
+
+    started = time.perf_counter()
+    service.start("wip", 1, COOLDOWN, now + COOLDOWN * 3)
+    evict = time.perf_counter() - started
+    print(f"evict        {users:>9} expired {evict:>5.3f}s  {len(service):>9} still tracked")
+
+    started = time.perf_counter()
+    reloaded = cooldowns.CooldownService()
+    load = time.perf_counter() - started
+    print(f"reload       {len(reloaded):>9} rows   {load:>6.3f}s  active after a restart")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,249 @@
+import asyncio
+import gc
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+# Starts the real bot client (bot.client) under each MEMORY_PROFILE against
+# a simulated large guild, fed straight into discord.py's gateway parser: the
+# READY and GUILD_CREATE payloads, member chunks when the profile asks for
+# them, then a burst of messages. Reports startup time and RSS after ready and
+# after the traffic, plus what 1000 author lookups of 200 users cost in REST
+# calls, and for profiles without a member cache how long listing everyone on
+# demand takes. RSS is relative to the process before READY, "end" is after
+# everything. Every profile runs in its own process so RSS isn't shared.
+#
+#   python -m benchmarks.bench_memory [members] [messages] [profile,...]
+
+GUILD_ID = 10**17
+BOT_ID = 10**17 + 1
+ROLES = 60
+CHANNELS = 120
+# Seconds between two member chunks of 1000 arriving from the gateway
+CHUNK_LATENCY = 0.005
+# Round-trip of one GET /guilds/{id}/members/{id}
+FETCH_LATENCY = 0.05
+
+
+def rss_mb(field="VmRSS"):
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith(field):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def user_payload(user_id, rng):
+    return {
+        "id": str(user_id),
+        "username": f"user{user_id % 10**6}",
+        "discriminator": "0",
+        "global_name": f"User {user_id % 10**6}",
+        "avatar": f"{rng.getrandbits(128):032x}",
+        "bot": False,
+    }
+
+
+def member_payload(user_id, rng, role_ids):
+    return {
+        "user": user_payload(user_id, rng),
+        "roles": rng.sample(role_ids, rng.randint(0, min(5, len(role_ids)))),
+        "joined_at": "2024-05-01T12:00:00.000000+00:00",
+        "premium_since": "2025-01-01T00:00:00.000000+00:00" if rng.random() < 0.02 else None,
+        "deaf": False,
+        "mute": False,
+        "flags": 0,
+        "nick": None,
+        "avatar": None,
+    }
+
+
+def guild_payload(members):
+    rng = random.Random(1)
+    role_ids = [str(GUILD_ID + 100 + i) for i in range(ROLES)]
+    roles = [{"id": str(GUILD_ID), "name": "@everyone", "color": 0, "position": 0, "permissions": "0",
+              "hoist": False, "managed": False, "mentionable": False, "flags": 0}]
+    roles += [{"id": role_id, "name": f"role-{i}", "color": rng.getrandbits(24), "position": i + 1,
+               "permissions": "0", "hoist": False, "managed": False, "mentionable": True, "flags": 0}
+              for i, role_id in enumerate(role_ids)]
+    channels = [{"id": str(GUILD_ID + 1000 + i), "type": 0, "name": f"channel-{i}", "position": i,
+                 "permission_overwrites": [], "guild_id": str(GUILD_ID)} for i in range(CHANNELS)]
+    me = member_payload(BOT_ID, rng, [])
+    me["user"]["bot"] = True
+    data = {
+        "id": str(GUILD_ID), "name": "Big guild", "icon": None, "owner_id": str(BOT_ID + 1),
+        "large": True, "member_count": members + 1, "roles": roles, "channels": channels,
+        # A large guild only sends the bot itself, everyone else comes in chunks
+        "members": [me], "presences": [], "voice_states": [], "threads": [], "emojis": [],
+        "stickers": [], "features": [], "premium_tier": 0, "unavailable": False,
+        "verification_level": 0, "default_message_notifications": 0, "explicit_content_filter": 0,
+        "mfa_level": 0, "nsfw_level": 0, "preferred_locale": "en-US", "system_channel_flags": 0,
+    }
+    return data, role_ids
+
+
+def member_chunks(members, role_ids):
+    # Encoded like they come off the wire, decoded as they arrive
+    rng = random.Random(2)
+    ids = [BOT_ID + 2 + i for i in range(members)]
+    for start in range(0, members, 1000):
+        yield json.dumps([member_payload(user_id, rng, role_ids) for user_id in ids[start:start + 1000]])
+
+
+class FakeGateway:
+    # Answers member chunk requests the way the gateway does
+    def __init__(self, state, members, role_ids):
+        self.state = state
+        self.members = members
+        self.role_ids = role_ids
+        self.requests = 0
+
+    async def request_chunks(self, guild_id, query=None, *, limit, user_ids=None, presences=False, nonce=None):
+        self.requests += 1
+        asyncio.create_task(self._send(guild_id, nonce))
+
+    async def _send(self, guild_id, nonce):
+        chunks = list(member_chunks(self.members, self.role_ids))
+        for index, chunk in enumerate(chunks):
+            await asyncio.sleep(CHUNK_LATENCY)
+            self.state.parse_guild_members_chunk({
+                "guild_id": str(guild_id), "members": json.loads(chunk),
+                "chunk_index": index, "chunk_count": len(chunks), "nonce": nonce,
+            })
+
+
+def message_payloads(count, members):
+    rng = random.Random(3)
+    for i in range(count):
+        user_id = BOT_ID + 2 + rng.randrange(members)
+        member = member_payload(user_id, rng, [])
+        author = member.pop("user")
+        yield {
+            "id": str(10**18 + i), "channel_id": str(GUILD_ID + 1000 + rng.randrange(CHANNELS)),
+            "guild_id": str(GUILD_ID), "author": author, "member": member,
+            "content": f"message {i} " + "lorem ipsum " * rng.randint(1, 20),
+            "timestamp": "2025-06-01T12:00:00.000000+00:00", "edited_timestamp": None,
+            "tts": False, "mention_everyone": False, "mentions": [], "mention_roles": [],
+            "attachments": [], "embeds": [], "pinned": False, "type": 0, "flags": 0,
+        }
+
+
+async def settle():
+    # Lets the listeners dispatched so far run to completion
+    others = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+    await asyncio.gather(*others)
+
+
+class FakeMemberFetch:
+    # GET /guilds/{id}/members/{id}
+    def __init__(self, role_ids):
+        self.role_ids = role_ids
+        self.calls = 0
+
+    async def __call__(self, guild_id, user_id):
+        self.calls += 1
+        await asyncio.sleep(FETCH_LATENCY)
+        return member_payload(user_id, random.Random(user_id), self.role_ids)
+
+
+async def child(profile, members, messages):
+    os.environ["MEMORY_PROFILE"] = profile
+    from utils import db
+
+    db.DB_PATH = os.path.join(tempfile.mkdtemp(), "bench.db")
+    import bot
+    from utils.members import get_member_safe, guild_members, recent_members
+
+    client = bot.client
+    state = client._connection
+    # on_ready prints the startup breakdown only once, and there was no login here
+    bot.startup["ready"] = 0
+    guild_data, role_ids = guild_payload(members)
+    gateway = FakeGateway(state, members, role_ids)
+    fetch = FakeMemberFetch(role_ids)
+
+    async with client:
+        state._get_websocket = lambda guild_id=None, shard_id=None: gateway
+        state.guild_ready_timeout = 0.05
+        state.http.get_member = fetch
+
+        gc.collect()
+        baseline = rss_mb()
+        started = time.perf_counter()
+        state.parse_ready({
+            "v": 10, "user": {**user_payload(BOT_ID, random.Random(0)), "bot": True},
+            "guilds": [{"id": str(GUILD_ID), "unavailable": True}], "session_id": "bench",
+            "application": {"id": str(BOT_ID), "flags": 0},
+        })
+        state.parse_guild_create(guild_data)
+        await client.wait_until_ready()
+        startup = time.perf_counter() - started
+        guild = client.get_guild(GUILD_ID)
+        cached_members = len(guild.members)
+        gc.collect()
+        after_ready = rss_mb()
+
+        for i, payload in enumerate(message_payloads(messages, members)):
+            state.parse_message_create(payload)
+            if i % 100 == 99:
+                await settle()
+        await settle()
+        gc.collect()
+        after_traffic = rss_mb()
+        cached_messages = len(state._messages or ())
+
+        # Ticket authors: a couple hundred people, looked up again and again
+        rng = random.Random(4)
+        authors = [BOT_ID + 2 + rng.randrange(members) for _ in range(200)]
+        lookups_started = time.perf_counter()
+        for _ in range(5):
+            for user_id in authors:
+                await get_member_safe(guild, user_id)
+        lookups = time.perf_counter() - lookups_started
+
+        listing = None
+        if client.intents.members and not guild.chunked:
+            listing_started = time.perf_counter()
+            everyone = await guild_members(guild)
+            listing = (time.perf_counter() - listing_started, len(everyone))
+            del everyone
+        gc.collect()
+
+        print(json.dumps({
+            "profile": profile, "startup": startup, "baseline": baseline, "after_ready": after_ready,
+            "after_traffic": after_traffic, "peak": rss_mb("VmHWM"), "after_all": rss_mb(),
+            "cached_members": cached_members, "cached_messages": cached_messages,
+            "chunk_requests": gateway.requests, "lookups": lookups, "fetches": fetch.calls,
+            "lru": len(recent_members), "listing": listing,
+        }))
+
+
+def main():
+    members = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    messages = int(sys.argv[2]) if len(sys.argv) > 2 else 5000
+    profiles = sys.argv[3].split(",") if len(sys.argv) > 3 else ["default", "full", "low"]
+    print(f"{members} members, {ROLES} roles, {CHANNELS} channels, {messages} messages, "
+          f"{CHUNK_LATENCY * 1000:.0f} ms per member chunk, {FETCH_LATENCY * 1000:.0f} ms per member fetch")
+    print("profile    startup   RSS ready  +traffic      peak       end  members  messages   1000 lookups    list everyone")
+    for profile in profiles:
+        output = subprocess.run(
+            [sys.executable, "-m", "benchmarks.bench_memory", "--child", profile, str(members), str(messages)],
+            capture_output=True, text=True, check=True,
+        ).stdout
+        r = json.loads(output.strip().splitlines()[-1])
+        listing = f"{r['listing'][0]:>6.2f}s ({r['listing'][1]})" if r["listing"] else "cached" if r["cached_members"] > 1 else "no intent"
+        print(f"{r['profile']:<9} {r['startup']:>7.2f}s  {r['after_ready'] - r['baseline']:>7.1f} MB  "
+              f"{r['after_traffic'] - r['baseline']:>6.1f} MB  {r['peak'] - r['baseline']:>6.1f} MB  {r['after_all'] - r['baseline']:>6.1f} MB  "
+              f"{r['cached_members']:>7}  {r['cached_messages']:>8}  "
+              f"{r['lookups']:>5.2f}s {r['fetches']:>3} REST  {listing}")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "--child":
+        asyncio.run(child(sys.argv[2], int(sys.argv[3]), int(sys.argv[4])))
+    else:
+        main()
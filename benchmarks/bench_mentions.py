@@ -0,0 +1,69 @@
+import re
+import sys
+import time
+
+from benchmarks.fakes import FakeGuild, FakeMember, FakeRole, FakeUser, synthetic_ticket
+from utils.markdown import MarkdownRenderer
+
+# Compares the single-pass MarkdownRenderer with the three re.sub passes and
+# chained str.replace calls that transcripts used before it.
+#
+#   python -m benchmarks.bench_mentions [messages]
+
+
+def legacy_replace_mentions(text, msg):
+    guild = msg.guild
+
+    text = re.sub(r"<#(\d+)>", lambda m: f'<span class="channel-mention">#{guild.get_channel(int(m[1])).name if guild.get_channel(int(m[1])) else "deleted-channel"}</span>', text)
+
+    text = re.sub(r"<@!?(\d+)>", lambda m: f'<span class="mention">@{guild.get_member(int(m[1])).display_name if guild.get_member(int(m[1])) else msg.author.name}</span>', text)
+
+    def role_replace(m):
+        role = guild.get_role(int(m[1]))
+        if role:
+            r, g, b = role.color.r, role.color.g, role.color.b
+            bg = f"rgb({int(r*0.25)},{int(g*0.25)},{int(b*0.25)})" if role.color.value else "rgba(255,255,255,0.1)"
+            color = f"#{role.color.value:06x}" if role.color.value else "#ffffff"
+            return f'<span class="role-mention" style="background-color:{bg}; color:{color};">@{role.name}</span>'
+        else:
+            return "@deleted-role"
+    text = re.sub(r"<@&(\d+)>", role_replace, text)
+
+    return text
+
+
+def legacy(messages):
+    for msg in messages:
+        html = legacy_replace_mentions(msg.content, msg)
+        html.replace("**", "<b>").replace("*", "<i>").replace("__", "<u>")
+
+
+def single_pass(messages):
+    markdown = MarkdownRenderer(messages[0].guild)
+    for msg in messages:
+        markdown.render(msg.content)
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 50_000
+    roles = [FakeRole(1, "Staff", color=0xFFD941, position=5), FakeRole(2, "Support", color=0x3498DB, position=4)]
+    members = [FakeMember(100, "dudlesfx"), FakeMember(200, "helper", roles=roles[:1])]
+    guild = FakeGuild(members=members, roles=roles)
+    plain = list(synthetic_ticket(count, guild, members + [FakeUser(300, "departed")]))
+    # Staff replies that ping several people, roles and channels at once.
+    heavy = list(synthetic_ticket(count, guild, members))
+    for msg in heavy:
+        msg.content = f"<@100> <@!200> <@300> please check <#1102968475925876876> <@&1> <@&2> {msg.content}"
+
+    for scenario, messages in (("plain", plain), ("mention-heavy", heavy)):
+        results = {}
+        for label, func in (("legacy", legacy), ("single-pass", single_pass)):
+            started = time.perf_counter()
+            func(messages)
+            results[label] = time.perf_counter() - started
+            print(f"{scenario:<14} {label:<12} {count:>8} msgs {results[label]:>7.3f}s {count / results[label]:>10.0f} msg/s")
+        print(f"{scenario:<14} speedup      {results['legacy'] / results['single-pass']:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+import asyncio
+import random
+import sys
+import time
+
+import discord
+
+from benchmarks.fakes import FakeBot, FakeCategory, FakeGuild, FakeRole, FakeTextChannel
+from utils.names import GuildNameIndex
+
+# Name lookups on a large guild: discord.utils.get scans against the
+# GuildNameIndex, including the channel create/delete churn of tickets being
+# opened and closed between lookups. Like discord.py, the fake guild builds
+# a fresh (sorted, for roles) list on every .roles/.channels access.
+#
+#   python -m benchmarks.bench_names [channels] [roles]
+
+LOOKUPS = 20_000
+
+
+def make_guild(channels, roles):
+    guild = FakeGuild(roles=[FakeRole(i, f"role-{i}", position=i) for i in range(1, roles + 1)])
+    for name in ("Partnership Tickets", "Role Request Tickets", "Support Tickets"):
+        guild.add_channel(FakeCategory(len(guild.channels) + 1, name, guild))
+    for i in range(channels):
+        guild.add_channel(FakeTextChannel(10_000 + i, f"support-user{i}", guild, []))
+    # The names the bot actually looks up sit at the end, the worst case
+    # for a scan and the common one for freshly created roles.
+    for i, name in enumerate(("WIP", "Help", "Feedback", "VIP+")):
+        guild._roles[roles + 1 + i] = FakeRole(roles + 1 + i, name, position=roles + 1 + i)
+    return guild
+
+
+def lookups(guild):
+    # What one ticket open plus a ping command do.
+    names = [("roles", "WIP"), ("roles", "VIP+"), ("channels", f"support-user{len(guild.channels) // 2}"),
+             ("channels", "support-nobody"), ("categories", "Support Tickets")]
+    return [random.choice(names) for _ in range(LOOKUPS)]
+
+
+def scan(guild, queries):
+    for kind, name in queries:
+        discord.utils.get(getattr(guild, kind), name=name)
+
+
+def indexed(index, guild, queries):
+    find = {"roles": index.role, "channels": index.channel, "categories": index.category}
+    for kind, name in queries:
+        find[kind](guild, name)
+
+
+async def churn(index, guild, queries):
+    # A ticket opened and closed every 100 lookups.
+    find = {"roles": index.role, "channels": index.channel, "categories": index.category}
+    for i, (kind, name) in enumerate(queries):
+        if i % 100 == 0:
+            channel = FakeTextChannel(10**9 + i, f"support-new{i}", guild, [])
+            guild.add_channel(channel)
+            await index.on_guild_channel_create(channel)
+            guild.remove_channel(channel)
+            await index.on_guild_channel_delete(channel)
+        find[kind](guild, name)
+
+
+def report(label, elapsed):
+    print(f"{label:<16} {LOOKUPS:>8} lookups {elapsed:>7.3f}s {LOOKUPS / elapsed:>12.0f} lookups/s")
+
+
+def main():
+    channels = int(sys.argv[1]) if len(sys.argv) > 1 else 5_000
+    roles = int(sys.argv[2]) if len(sys.argv) > 2 else 1_000
+    guild = make_guild(channels, roles)
+    queries = lookups(guild)
+    print(f"guild with {len(guild.channels)} channels and {len(guild.roles)} roles")
+
+    started = time.perf_counter()
+    scan(guild, queries)
+    report("utils.get", time.perf_counter() - started)
+
+    index = GuildNameIndex(FakeBot())
+    started = time.perf_counter()
+    indexed(index, guild, queries)
+    report("index", time.perf_counter() - started)
+
+    started = time.perf_counter()
+    asyncio.run(churn(index, guild, queries))
+    report("index + churn", time.perf_counter() - started)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+import asyncio
+import datetime
+import sys
+import time
+
+import discord
+
+from benchmarks.fakes import FakeGuild, FakeMember, FakeMessage, rest_call
+from utils import purge
+
+# Purges a fake channel whose REST calls take a fixed round-trip: history
+# pages of 100, bulk deletes and single deletes. "sequential" is the shape
+# of discord.py's channel.purge, which /purge used before: fetch, delete a
+# full batch, fetch again, and fall back to one delete at a time (with no
+# more batching) as soon as it reaches a message older than 14 days.
+#
+#   python -m benchmarks.bench_purge [messages] [old_fraction]
+
+PAGE_LATENCY = 0.08
+BULK_LATENCY = 0.10
+SINGLE_LATENCY = 0.01
+
+
+class PurgeChannel:
+    def __init__(self, count, old_fraction):
+        guild = FakeGuild()
+        people = [FakeMember(100 + i, f"user{i}") for i in range(5)]
+        bot = FakeMember(999, "bot", bot=True)
+        now = discord.utils.utcnow()
+        old = int(count * old_fraction)
+        self.messages = []
+        for i in range(count):
+            # Newest first; the oldest `old` messages are past the bulk window.
+            age = datetime.timedelta(minutes=i) if i < count - old else datetime.timedelta(days=20, minutes=i)
+            author = bot if i % 7 == 0 else people[i % len(people)]
+            content = f"message {i}" + (" giveaway link" if i % 11 == 0 else "")
+            self.messages.append(FakeMessage(
+                count - i, author, content, guild, now - age,
+                attachments=["image.png"] if i % 5 == 0 else [], channel=self,
+            ))
+        self.deleted = set()
+        self.calls = {"history": 0, "bulk": 0, "single": 0}
+
+    async def history(self, limit=None, before=None, after=None):
+        for index, message in enumerate(self.messages[:limit]):
+            if index % 100 == 0:
+                self.calls["history"] += 1
+                await rest_call(PAGE_LATENCY)
+            yield message
+
+    async def delete_messages(self, messages):
+        self.calls["bulk"] += 1
+        await rest_call(BULK_LATENCY)
+        self.deleted.update(message.id for message in messages)
+
+    async def delete_message(self, message):
+        self.calls["single"] += 1
+        await rest_call(SINGLE_LATENCY)
+        self.deleted.add(message.id)
+
+
+async def sequential_purge(channel, limit, check):
+    cutoff = discord.utils.utcnow() - purge.BULK_MAX_AGE
+    batch = []
+    single = False
+    async for message in channel.history(limit=limit):
+        if not check(message):
+            continue
+        if single or message.created_at < cutoff:
+            if batch:
+                await channel.delete_messages(batch)
+                batch = []
+            single = True
+            await message.delete()
+            continue
+        batch.append(message)
+        if len(batch) == 100:
+            await channel.delete_messages(batch)
+            batch = []
+    if batch:
+        await channel.delete_messages(batch)
+
+
+async def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 5_000
+    old_fraction = float(sys.argv[2]) if len(sys.argv) > 2 else 0.2
+    print(f"{count} messages, {old_fraction:.0%} older than 14 days; "
+          f"{PAGE_LATENCY * 1000:.0f} ms per page, {BULK_LATENCY * 1000:.0f} ms per bulk delete, {SINGLE_LATENCY * 1000:.0f} ms per single delete")
+    scenarios = (
+        ("everything", purge.message_filter()),
+        ("bots", purge.message_filter(bots=True)),
+        ("regex", purge.message_filter(pattern=r"giveaway")),
+    )
+    for scenario, check in scenarios:
+        for label in ("sequential", "engine"):
+            channel = PurgeChannel(count, old_fraction)
+            started = time.perf_counter()
+            if label == "sequential":
+                await sequential_purge(channel, count, check)
+            else:
+                await purge.Purge(channel, count, check=check, scan_limit=count).run()
+            elapsed = time.perf_counter() - started
+            calls = channel.calls
+            print(f"{scenario:<11} {label:<11} {len(channel.deleted):>6} deleted {elapsed:>6.2f}s {len(channel.deleted) / elapsed:>8.0f} msg/s  "
+                  f"({calls['history']} pages, {calls['bulk']} bulk, {calls['single']} single)")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
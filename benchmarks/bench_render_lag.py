@@ -0,0 +1,83 @@
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+from benchmarks.fakes import FakeBot, FakeSendable, FakeTextChannel, FakeUser, generate_history, make_guild
+from cogs import tickets
+from utils import archive, db, render, transcripts
+
+# Renders several large transcripts at once and measures how late a 10 ms
+# timer on the event loop fires meanwhile, which is what heartbeats and
+# interactions wait on. 0 workers renders on the event loop, as before the
+# render pool.
+#
+#   python -m benchmarks.bench_render_lag [transcripts] [messages] [workers,...]
+
+TICK = 0.01
+PAGE_LATENCY = 0.02
+
+
+def make_ticket(index, count):
+    guild = make_guild(members=100, roles=10, channels=10)
+    guild.history_latency = PAGE_LATENCY
+    authors = [guild.get_member(member_id) for member_id in list(guild._members)[:2]] + [FakeUser(102, "departed")]
+    return FakeTextChannel(
+        index + 1, f"support-member{index}", guild,
+        lambda: generate_history(count, guild, authors, mentions=0.3, embeds=0.05, attachments=0.1, seed=index),
+    )
+
+
+async def sample_lag(lags, stop):
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        started = loop.time()
+        await asyncio.sleep(TICK)
+        lags.append(loop.time() - started - TICK)
+
+
+async def run(workers, tickets_count, count):
+    render.shutdown_render_pool()
+    render.TRANSCRIPT_RENDER_WORKERS = workers
+    if workers:
+        # Start the workers up front, spawning them isn't what's measured
+        pool = render.get_render_pool()
+        await asyncio.gather(*(asyncio.get_running_loop().run_in_executor(pool, time.sleep, 0.1) for _ in range(workers)))
+
+    bot = FakeBot({tickets.TRANSCRIPT_CHANNEL_ID: FakeSendable()})
+    channels = [make_ticket(i, count) for i in range(tickets_count)]
+    lags = []
+    stop = asyncio.Event()
+    sampler = asyncio.create_task(sample_lag(lags, stop))
+    started = time.perf_counter()
+    await asyncio.gather(*(tickets.save_ticket_transcript_html(bot, channel) for channel in channels))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await sampler
+
+    lags.sort()
+    print(f"{workers:>7}  {elapsed:>7.2f}s  lag p50 {lags[len(lags) // 2] * 1000:>6.1f} ms  "
+          f"p99 {lags[int(len(lags) * 0.99)] * 1000:>7.1f} ms  max {lags[-1] * 1000:>7.1f} ms")
+
+
+async def main():
+    tickets_count = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    count = int(sys.argv[2]) if len(sys.argv) > 2 else 10_000
+    workers_list = [int(n) for n in sys.argv[3].split(",")] if len(sys.argv) > 3 else [0, 2, 4]
+    folder = tempfile.mkdtemp()
+    db.DB_PATH = os.path.join(folder, "bench.db")
+    transcripts.TRANSCRIPT_FOLDER = folder
+    archive._archive = archive.TranscriptArchive(os.path.join(folder, "archive"))
+
+    print(f"{tickets_count} transcripts of {count} messages at once, {PAGE_LATENCY * 1000:.0f} ms per history page")
+    print("workers     total")
+    try:
+        for workers in workers_list:
+            await run(workers, tickets_count, count)
+    finally:
+        render.shutdown_render_pool()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
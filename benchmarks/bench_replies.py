@@ -0,0 +1,109 @@
+import asyncio
+import sys
+import time
+import tracemalloc
+from types import SimpleNamespace
+
+from benchmarks.fakes import FakeBot, FakePartialMessageable
+from utils.replies import ReplyTracker
+
+# Replays a large purge through the delete listeners. Before the tracker,
+# WIP, Help and Feedback each had their own on_message_delete listener and
+# an unbounded dict, so every deleted message was dispatched three times.
+# discord.py schedules one task per listener per event, which is what the
+# dispatch below does too.
+#
+#   python -m benchmarks.bench_replies [deleted_messages]
+
+CHANNEL_ID = 1282266945315672094
+TRACKED = 5_000
+
+
+class LegacyCog:
+    def __init__(self, bot):
+        self.bot = bot
+        self.cooldown_messages = {}
+
+    async def on_message_delete(self, message):
+        if message.author.bot:
+            return
+        bot_msg_id = self.cooldown_messages.pop(message.id, None)
+        if bot_msg_id:
+            try:
+                await message.channel.get_partial_message(bot_msg_id).delete()
+            except Exception:
+                pass
+
+
+async def dispatch(listeners, event):
+    tasks = [asyncio.create_task(listener(event)) for listener in listeners]
+    await asyncio.gather(*tasks)
+
+
+async def legacy(count):
+    bot = FakeBot()
+    cogs = [LegacyCog(bot) for _ in range(3)]
+    channel = FakePartialMessageable(bot, CHANNEL_ID)
+    author = SimpleNamespace(bot=False)
+    for message_id in range(0, TRACKED * 2, 2):
+        cogs[message_id % 3].cooldown_messages[message_id] = 10**9 + message_id
+    listeners = [cog.on_message_delete for cog in cogs]
+
+    started = time.perf_counter()
+    for message_id in range(count):
+        await dispatch(listeners, SimpleNamespace(id=message_id, author=author, channel=channel))
+    return time.perf_counter() - started, len(bot.deleted), sum(len(cog.cooldown_messages) for cog in cogs)
+
+
+def tracked_bot():
+    bot = FakeBot()
+    tracker = ReplyTracker(bot)
+    reply = SimpleNamespace(channel=SimpleNamespace(id=CHANNEL_ID), id=0)
+    for message_id in range(0, TRACKED * 2, 2):
+        reply.id = 10**9 + message_id
+        tracker.track(SimpleNamespace(id=message_id), reply)
+    return bot, tracker
+
+
+async def single(count):
+    bot, tracker = tracked_bot()
+    listeners = bot.listeners["on_raw_message_delete"]
+    started = time.perf_counter()
+    for message_id in range(count):
+        await dispatch(listeners, SimpleNamespace(message_id=message_id, channel_id=CHANNEL_ID))
+    return time.perf_counter() - started, len(bot.deleted), len(tracker)
+
+
+async def bulk(count):
+    bot, tracker = tracked_bot()
+    listeners = bot.listeners["on_raw_bulk_message_delete"]
+    started = time.perf_counter()
+    for start in range(0, count, 100):
+        ids = set(range(start, min(start + 100, count)))
+        await dispatch(listeners, SimpleNamespace(message_ids=ids, channel_id=CHANNEL_ID))
+    return time.perf_counter() - started, len(bot.deleted), len(tracker)
+
+
+def index_memory(entries):
+    tracemalloc.start()
+    tracker = ReplyTracker(FakeBot(), max_entries=entries // 10)
+    reply = SimpleNamespace(channel=SimpleNamespace(id=CHANNEL_ID), id=0)
+    for message_id in range(entries):
+        reply.id = message_id
+        tracker.track(SimpleNamespace(id=message_id), reply)
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return len(tracker), memory
+
+
+async def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    for label, func in (("3 listeners", legacy), ("tracker", single), ("tracker bulk", bulk)):
+        elapsed, deleted, left = await func(count)
+        print(f"{label:<13} {count:>8} deletes {elapsed:>7.3f}s {count / elapsed:>10.0f} deletes/s  {deleted:>6} replies deleted  {left:>6} still tracked")
+    kept, memory = index_memory(count)
+    print(f"index bounded to {kept} of {count} tracked replies, {memory / 2**20:.1f} MiB")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
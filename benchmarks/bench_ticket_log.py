@@ -0,0 +1,86 @@
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+from benchmarks.fakes import FakeBot, FakeSendable, FakeTextChannel, FakeUser, generate_history, make_guild
+from cogs import tickets
+from utils import archive, db, registry, transcripts
+from utils.ticketlog import TicketLog
+
+# Closes a ticket whose history pages take a fixed round-trip, three ways:
+# "crawl" walks the whole history like before the ticket log, "live" renders
+# from a log that captured every message, "downtime" from one that missed a
+# tenth of the ticket while the bot was offline and crawls just that gap.
+# All three must produce the same transcript.
+#
+#   python -m benchmarks.bench_ticket_log [messages] [page_ms]
+
+
+def make_ticket(count, page_latency):
+    guild = make_guild(members=50, roles=10, channels=10)
+    guild.history_latency = page_latency
+    authors = [guild.get_member(member_id) for member_id in list(guild._members)[:2]] + [FakeUser(102, "departed")]
+    messages = list(generate_history(count, guild, authors, mentions=0.3, embeds=0.05, attachments=0.1))
+    channel = FakeTextChannel(10**17, "support-member0", guild, messages)
+    for msg in messages:
+        msg.channel = channel
+    return channel, messages
+
+
+async def close(label, channel, messages, missed=None):
+    # `missed` is the (start, stop) slice of messages sent while offline
+    count = len(messages)
+    channel.history_pages = 0
+    bot = FakeBot({tickets.TRANSCRIPT_CHANNEL_ID: FakeSendable()})
+    registry.get_registry().open(channel, messages[0].author.id, "Support")
+
+    capture = None
+    if missed is not None:
+        bot.ticket_log = TicketLog(bot)
+        bot.ticket_log.started(channel.id)
+        missed_from, missed_to = missed
+        started = time.perf_counter()
+        for i, msg in enumerate(messages):
+            if i == missed_to:
+                # Back online: the gap is recorded on ready
+                await bot.ticket_log.on_ready()
+            if not missed_from <= i < missed_to:
+                await bot.ticket_log.on_message(msg)
+        bot.ticket_log.flush()
+        capture = (time.perf_counter() - started) / count
+
+    started = time.perf_counter()
+    await tickets.save_ticket_transcript_html(bot, channel)
+    elapsed = time.perf_counter() - started
+    with archive.get_archive().find(transcripts.ticket_key(channel)) as stored:
+        data = stored.read()
+    if bot.ticket_log is not None:
+        await bot.ticket_log.discard(channel.id)
+    registry.get_registry().close(channel.id)
+
+    capture_note = f"  capture {capture * 1e6:>5.1f} us/msg" if capture is not None else ""
+    print(f"{label:<9} {count:>7} msgs  close {elapsed:>6.2f}s  {channel.history_pages:>4} history pages{capture_note}")
+    return data
+
+
+async def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    page_latency = (float(sys.argv[2]) if len(sys.argv) > 2 else 80) / 1000
+    folder = tempfile.mkdtemp()
+    db.DB_PATH = os.path.join(folder, "bench.db")
+    transcripts.TRANSCRIPT_FOLDER = folder
+    archive._archive = archive.TranscriptArchive(os.path.join(folder, "archive"))
+    registry._registry = None
+    print(f"{page_latency * 1000:.0f} ms per history page of 100 messages")
+
+    channel, messages = make_ticket(count, page_latency)
+    crawl = await close("crawl", channel, messages)
+    live = await close("live", channel, messages, missed=(count, count))
+    downtime = await close("downtime", channel, messages, missed=(count * 8 // 10, count * 9 // 10))
+    print(f"transcripts identical: {crawl == live == downtime}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
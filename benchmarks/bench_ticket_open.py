@@ -0,0 +1,91 @@
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+import discord
+
+from benchmarks.fakes import FakeBot, FakeCategory, FakeGuild, FakeInteraction, FakeMember
+from cogs import tickets
+from utils import db, registry
+from utils.names import GuildNameIndex
+
+# End-to-end latency of opening a ticket against a fake guild where every
+# REST call takes a fixed round-trip. "sequential" is the callback from
+# before the category table: rebuild the config, then edit the panel,
+# create the channel, send the welcome message and the confirmation one
+# after another.
+#
+#   python -m benchmarks.bench_ticket_open [opens] [rest_ms]
+
+
+async def legacy_open(bot, interaction, category):
+    await interaction.message.edit(view=tickets.TicketDropdownView(bot))
+    user = interaction.user
+    categories = {
+        name: {
+            "title": config.title,
+            "description": config.description,
+            "ping": [int(rid[3:-1]) for rid in config.ping_roles.split()],
+            "ping_user": config.ping_user,
+            "discord_category": config.discord_category,
+            "ticket_opened_category": config.opened_label,
+        }
+        for name, config in tickets.TICKET_CATEGORIES.items()
+    }
+    channel_name = f"{category.lower().replace(' ', '-')}-{user.name}"
+    if category != "Support" and discord.utils.get(interaction.guild.channels, name=channel_name):
+        await interaction.followup.send(f"You already have a ticket in {category} category.", ephemeral=True)
+        return
+    overwrites = {
+        interaction.guild.default_role: discord.PermissionOverwrite(view_channel=False),
+        user: discord.PermissionOverwrite(view_channel=True, send_messages=True),
+        interaction.guild.me: discord.PermissionOverwrite(view_channel=True, send_messages=True, read_message_history=True),
+    }
+    category_obj = discord.utils.get(interaction.guild.categories, name=categories[category]["discord_category"])
+    channel = await interaction.guild.create_text_channel(name=channel_name, overwrites=overwrites, category=category_obj)
+    config = categories[category]
+    embed = discord.Embed(title=config["title"], description=config["description"].format(user=user), color=discord.Color.blue())
+    ping_roles = " ".join(f"<@&{rid}>" for rid in config["ping"])
+    content = f"{user.mention} {ping_roles}" if config.get("ping_user", True) else ping_roles
+    await channel.send(content=content, embed=embed, view=tickets.CloseButton(bot))
+    await interaction.followup.send(f"Your {config['ticket_opened_category']} has been opened {channel.mention} ✅", ephemeral=True)
+
+
+async def pipeline_open(bot, interaction, category):
+    await tickets.open_ticket(bot, interaction, tickets.TICKET_CATEGORIES[category])
+
+
+async def run(label, func, opens, latency):
+    bot = FakeBot()
+    bot.names = GuildNameIndex(bot)
+    guild = FakeGuild(rest_latency=latency)
+    for name in ("Partnership Tickets", "Role Request Tickets", "Support Tickets"):
+        guild.add_channel(FakeCategory(len(guild.channels) + 1, name, guild))
+    timings = []
+    for i in range(opens):
+        interaction = FakeInteraction(guild, FakeMember(1000 + i, f"user{i}"))
+        started = time.perf_counter()
+        await func(bot, interaction, ("Partnership", "Role Request", "Support")[i % 3])
+        timings.append(time.perf_counter() - started)
+    timings.sort()
+    print(f"{label:<11} {opens:>5} opens  mean {statistics.mean(timings) * 1000:>6.1f} ms  "
+          f"p95 {timings[int(len(timings) * 0.95)] * 1000:>6.1f} ms  ({len(guild.created_channels)} channels)")
+
+
+async def main():
+    opens = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    latency = (float(sys.argv[2]) if len(sys.argv) > 2 else 80) / 1000
+    db.DB_PATH = os.path.join(tempfile.mkdtemp(), "bot.db")
+    registry._registry = None
+    print(f"{latency * 1000:.0f} ms per REST call")
+    await run("sequential", legacy_open, opens, latency)
+    await run("pipeline", pipeline_open, opens, latency)
+    for stage, (samples, p50, p95, worst) in tickets.open_timings.summary().items():
+        print(f"  {stage:<16} p50 {p50 * 1000:>6.1f} ms  p95 {p95 * 1000:>6.1f} ms  max {worst * 1000:>6.1f} ms")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
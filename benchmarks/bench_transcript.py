@@ -0,0 +1,88 @@
+import asyncio
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from benchmarks.fakes import FakeBot, FakeGuild, FakeMember, FakeRole, FakeSendable, FakeTextChannel, FakeUser, synthetic_ticket
+from cogs import tickets
+from utils import archive, db, render, transcripts
+from utils.members import recent_members
+
+# Renders synthetic tickets of growing size and compares the streaming writer
+# against building the whole page in one string before writing it. Streaming
+# also compresses, indexes and archives the page, the in-memory baseline
+# doesn't. Both render on the event loop, so tracemalloc sees the rendering
+# (a render worker process would hide it).
+#
+#   python -m benchmarks.bench_transcript [max_messages]
+
+SIZES = (12_500, 25_000, 50_000)
+
+
+def make_ticket(count):
+    staff_role = FakeRole(1, "Staff", color=0xFFD941, position=5)
+    members = [FakeMember(100, "dudlesfx"), FakeMember(200, "helper", roles=[staff_role])]
+    guild = FakeGuild(members=members, roles=[staff_role])
+    # A third participant who has since left the server, so every one of their
+    # messages misses the member cache.
+    authors = members + [FakeUser(300, "departed")]
+    return FakeTextChannel(10, "support-dudlesfx", guild, lambda: synthetic_ticket(count, guild, authors))
+
+
+async def save_in_memory(channel, folder):
+    # The pre-streaming behaviour: one growing string, written at the end.
+    authors = tickets.AuthorResolver(channel.guild)
+    markdown = tickets.MarkdownRenderer(channel.guild)
+    html = transcripts.page_header(channel)
+    async for msg in channel.history(limit=None, oldest_first=True):
+        html += tickets.render_message(msg, await authors.resolve(msg.author), markdown)
+    html += transcripts.PAGE_FOOTER
+    with open(os.path.join(folder, f"{channel.name}.html"), "w", encoding="utf-8") as f:
+        f.write(html)
+
+
+async def save_streaming(channel, folder):
+    bot = FakeBot({tickets.TRANSCRIPT_CHANNEL_ID: FakeSendable()})
+    await tickets.save_ticket_transcript_html(bot, channel)
+
+
+def measure(func, count, folder):
+    # Every run starts cold, or the first one's lookups would serve the rest
+    recent_members.clear()
+    channel = make_ticket(count)
+    tracemalloc.start()
+    started = time.perf_counter()
+    asyncio.run(func(channel, folder))
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    stored = archive.get_archive().find(transcripts.ticket_key(channel))
+    if stored is not None:
+        stored.close()
+    size = stored.length if stored else os.path.getsize(os.path.join(folder, f"{channel.name}.html"))
+    return elapsed, peak, size, channel.guild.query_members_calls, channel.guild.fetch_member_calls
+
+
+def main():
+    sizes = SIZES
+    if len(sys.argv) > 1:
+        limit = int(sys.argv[1])
+        sizes = tuple(n for n in SIZES if n <= limit) or (limit,)
+
+    render.TRANSCRIPT_RENDER_WORKERS = 0
+    with tempfile.TemporaryDirectory() as folder:
+        transcripts.TRANSCRIPT_FOLDER = folder
+        db.DB_PATH = os.path.join(folder, "bench.db")
+        archive._archive = archive.TranscriptArchive(os.path.join(folder, "archive"))
+        print(f"{'mode':<10} {'messages':>9} {'seconds':>8} {'us/msg':>7} {'peak MiB':>9} {'file MiB':>9} {'queries':>8} {'fetches':>8}")
+        for label, func in (("in-memory", save_in_memory), ("streaming", save_streaming)):
+            for count in sizes:
+                elapsed, peak, size, queries, fetches = measure(func, count, folder)
+                print(f"{label:<10} {count:>9} {elapsed:>8.2f} {elapsed / count * 1e6:>7.1f} "
+                      f"{peak / 2**20:>9.2f} {size / 2**20:>9.2f} {queries:>8} {fetches:>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+import asyncio
+import multiprocessing
+import sys
+import tempfile
+import time
+
+import aiohttp
+
+from utils import transcripts
+
+# Load test for the transcript web server: the Flask development server in a
+# thread (as bot.py runs it by default) against the aiohttp frontend. Each
+# server runs in its own process, the client keeps connections alive.
+#
+#   python -m benchmarks.bench_web [requests] [concurrency]
+
+HOST = "127.0.0.1"
+PORTS = {"flask": 18080, "aiohttp": 18081}
+
+
+def write_transcript(folder, messages=2000):
+    transcripts.TRANSCRIPT_FOLDER = folder
+    with transcripts.TranscriptWriter("support-loadtest") as writer:
+        writer.write(transcripts.page_header("support-loadtest"))
+        for i in range(messages):
+            writer.write(f'<div class="message"><div class="content">Message {i} of the load test</div></div>')
+        writer.write(transcripts.PAGE_FOOTER)
+
+
+def run_flask(folder, port):
+    import logging
+
+    import bot
+
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+    transcripts.TRANSCRIPT_FOLDER = folder
+    bot.app.run(host=HOST, port=port, debug=False, use_reloader=False)
+
+
+def run_aiohttp(folder, port):
+    from utils.web import start_web_server
+
+    transcripts.TRANSCRIPT_FOLDER = folder
+
+    async def serve():
+        await start_web_server(HOST, port)
+        await asyncio.Event().wait()
+
+    asyncio.run(serve())
+
+
+async def wait_until_up(url):
+    async with aiohttp.ClientSession() as session:
+        for _ in range(100):
+            try:
+                async with session.get(url) as response:
+                    await response.read()
+                    return
+            except aiohttp.ClientError:
+                await asyncio.sleep(0.1)
+    raise RuntimeError(f"{url} did not come up")
+
+
+async def load(url, total, concurrency):
+    latencies = []
+    remaining = iter(range(total))
+    headers = {"Accept-Encoding": "gzip, br"}
+
+    async def worker(session):
+        for _ in remaining:
+            started = time.perf_counter()
+            async with session.get(url, headers=headers) as response:
+                await response.read()
+                assert response.status == 200, response.status
+            latencies.append(time.perf_counter() - started)
+
+    # Time the compressed bytes as they come off the wire, not inflating them
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    async with aiohttp.ClientSession(connector=connector, auto_decompress=False) as session:
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(session) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return total / elapsed, latencies[len(latencies) // 2], latencies[int(len(latencies) * 0.99) - 1]
+
+
+def main():
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    concurrency = int(sys.argv[2]) if len(sys.argv) > 2 else 32
+
+    with tempfile.TemporaryDirectory() as folder:
+        write_transcript(folder)
+        print(f"{'server':<8} {'requests':>8} {'clients':>7} {'req/s':>8} {'p50 ms':>7} {'p99 ms':>7}")
+        for name, target in (("flask", run_flask), ("aiohttp", run_aiohttp)):
+            process = multiprocessing.Process(target=target, args=(folder, PORTS[name]), daemon=True)
+            process.start()
+            try:
+                url = f"http://{HOST}:{PORTS[name]}/transcripts/support-loadtest.html"
+                asyncio.run(wait_until_up(url))
+                rps, p50, p99 = asyncio.run(load(url, total, concurrency))
+                print(f"{name:<8} {total:>8} {concurrency:>7} {rps:>8.0f} {p50 * 1000:>7.1f} {p99 * 1000:>7.1f}")
+            finally:
+                process.terminate()
+                process.join()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,376 @@
+import asyncio
+import datetime
+import itertools
+import random
+from types import SimpleNamespace
+
+# Minimal stand-ins for the discord.py objects the transcript code touches.
+# They only carry the attributes the cogs read, nothing talks to Discord.
+
+
+class FakeColor:
+    def __init__(self, value=0):
+        self.value = value
+        self.r = (value >> 16) & 0xFF
+        self.g = (value >> 8) & 0xFF
+        self.b = value & 0xFF
+
+
+class FakeRole:
+    def __init__(self, id, name, color=0, position=0):
+        self.id = id
+        self.name = name
+        self.color = FakeColor(color)
+        self.position = position
+
+    @property
+    def mention(self):
+        return f"<@&{self.id}>"
+
+
+class FakeUser:
+    def __init__(self, id, name, bot=False):
+        self.id = id
+        self.name = name
+        self.bot = bot
+        self.display_avatar = SimpleNamespace(url=f"https://cdn.discordapp.com/avatars/{id}/avatar.png?size=1024")
+
+    def __str__(self):
+        return self.name
+
+    @property
+    def mention(self):
+        return f"<@{self.id}>"
+
+
+class FakeMember(FakeUser):
+    def __init__(self, id, name, roles=(), bot=False):
+        super().__init__(id, name, bot=bot)
+        self.display_name = name
+        self.roles = list(roles)
+
+    def get_role(self, role_id):
+        return next((role for role in self.roles if role.id == role_id), None)
+
+
+_snowflakes = itertools.count(10**18)
+
+
+async def rest_call(latency):
+    # Stands in for one REST round-trip.
+    if latency:
+        await asyncio.sleep(latency)
+
+
+class FakeGuild:
+    def __init__(self, members=(), roles=(), channels=(), id=1, rest_latency=0.0):
+        self.id = id
+        self._members = {m.id: m for m in members}
+        self._roles = {r.id: r for r in roles}
+        self._channels = {c.id: c for c in channels}
+        self.fetch_member_calls = 0
+        self.query_members_calls = 0
+        self.rest_latency = rest_latency
+        self.history_latency = 0.0
+        self.default_role = FakeRole(id, "@everyone")
+        self.me = FakeMember(next(_snowflakes), "bot", bot=True)
+        self.created_channels = []
+
+    async def create_text_channel(self, name, overwrites=None, category=None, reason=None):
+        await rest_call(self.rest_latency)
+        channel = FakeTextChannel(next(_snowflakes), name, self, [])
+        channel.overwrites = dict(overwrites or {})
+        channel.category = category
+        self.add_channel(channel)
+        self.created_channels.append(channel)
+        return channel
+
+    @property
+    def roles(self):
+        return sorted(self._roles.values(), key=lambda role: role.position)
+
+    @property
+    def channels(self):
+        return list(self._channels.values())
+
+    @property
+    def categories(self):
+        return [channel for channel in self._channels.values() if isinstance(channel, FakeCategory)]
+
+    def add_channel(self, channel):
+        self._channels[channel.id] = channel
+
+    def remove_channel(self, channel):
+        self._channels.pop(channel.id, None)
+
+    def get_member(self, user_id):
+        return self._members.get(user_id)
+
+    def get_role(self, role_id):
+        return self._roles.get(role_id)
+
+    def get_channel(self, channel_id):
+        return self._channels.get(channel_id)
+
+    async def fetch_member(self, user_id):
+        import discord
+
+        self.fetch_member_calls += 1
+        raise discord.NotFound(SimpleNamespace(status=404, reason="Not Found"), "Unknown Member")
+
+    async def query_members(self, user_ids=None, cache=True):
+        # Works with the default intents too (discord.py only refuses
+        # presences without their intent). Anyone who left is just missing
+        # from the result.
+        self.query_members_calls += 1
+        await rest_call(self.rest_latency)
+        return [self._members[user_id] for user_id in user_ids if user_id in self._members]
+
+
+class FakeEmbed:
+    def __init__(self, title=None, description=None, color=None, fields=(), image=None, thumbnail=None):
+        self.title = title
+        self.description = description
+        self.color = FakeColor(color) if color is not None else None
+        self.fields = [SimpleNamespace(name=name, value=value) for name, value in fields]
+        self.image = SimpleNamespace(url=image)
+        self.thumbnail = SimpleNamespace(url=thumbnail)
+
+    def to_dict(self):
+        data = {"type": "rich", "fields": [{"name": field.name, "value": field.value, "inline": False} for field in self.fields]}
+        for key, value in (("title", self.title), ("description", self.description)):
+            if value is not None:
+                data[key] = value
+        if self.color is not None:
+            data["color"] = self.color.value
+        if self.image.url:
+            data["image"] = {"url": self.image.url}
+        if self.thumbnail.url:
+            data["thumbnail"] = {"url": self.thumbnail.url}
+        return data
+
+
+class FakeAttachment:
+    def __init__(self, id, filename, content_type=None):
+        self.id = id
+        self.filename = filename
+        self.content_type = content_type
+        self.url = f"https://cdn.discordapp.com/attachments/1/{id}/{filename}"
+
+
+class FakeMessage:
+    def __init__(self, id, author, content, guild, created_at, embeds=(), attachments=(), channel=None):
+        self.id = id
+        self.author = author
+        self.content = content
+        self.guild = guild
+        self.created_at = created_at
+        self.embeds = list(embeds)
+        self.attachments = list(attachments)
+        self.channel = channel
+
+    async def delete(self):
+        await self.channel.delete_message(self)
+
+
+class FakeTextChannel:
+    def __init__(self, id, name, guild, messages):
+        self.id = id
+        self.name = name
+        self.guild = guild
+        self.overwrites = {}
+        self._messages = messages
+        self.history_pages = 0
+
+    def __str__(self):
+        return self.name
+
+    @property
+    def mention(self):
+        return f"<#{self.id}>"
+
+    async def send(self, content=None, **kwargs):
+        await rest_call(self.guild.rest_latency)
+        return SimpleNamespace(id=next(_snowflakes), channel=self, content=content)
+
+    async def history(self, limit=None, oldest_first=False, after=None, before=None):
+        # `messages` may be a list or a zero-argument callable returning an
+        # iterator, so huge histories can be generated lazily. Like Discord,
+        # after/before bound the message ids and every 100 messages are one
+        # page, which costs the guild's history_latency.
+        source = self._messages() if callable(self._messages) else self._messages
+        if after is not None or before is not None:
+            source = (
+                msg for msg in source
+                if (after is None or msg.id > after.id) and (before is None or msg.id < before.id)
+            )
+        for index, msg in enumerate(itertools.islice(source, limit)):
+            if index % 100 == 0:
+                self.history_pages += 1
+                await rest_call(self.guild.history_latency)
+            yield msg
+
+
+class FakeCategory:
+    def __init__(self, id, name, guild):
+        self.id = id
+        self.name = name
+        self.guild = guild
+
+
+class FakeInteraction:
+    # A component interaction on the ticket panel, every REST call takes the
+    # guild's rest_latency.
+
+    def __init__(self, guild, user):
+        self.guild = guild
+        self.user = user
+        latency = guild.rest_latency
+
+        async def call(*args, **kwargs):
+            await rest_call(latency)
+
+        self.message = SimpleNamespace(edit=call)
+        self.response = SimpleNamespace(defer=call)
+        self.followup = SimpleNamespace(send=call)
+
+
+class FakeSendable:
+    def __init__(self):
+        self.sent = []
+
+    async def send(self, *args, **kwargs):
+        self.sent.append((args, kwargs))
+
+
+class FakePartialMessage:
+    def __init__(self, bot, channel, id):
+        self.bot = bot
+        self.channel = channel
+        self.id = id
+
+    async def delete(self):
+        self.bot.deleted.append(self.id)
+
+
+class FakePartialMessageable:
+    def __init__(self, bot, id):
+        self.bot = bot
+        self.id = id
+
+    def get_partial_message(self, id):
+        return FakePartialMessage(self.bot, self, id)
+
+
+class FakeContext:
+    # A prefix command invocation: `attachments` are on the command message,
+    # replies are recorded in `sent`.
+
+    def __init__(self, guild, channel_id, author, attachments=()):
+        self.guild = guild
+        self.author = author
+        self.channel = SimpleNamespace(id=channel_id)
+        self.message = SimpleNamespace(id=next(_snowflakes), channel=self.channel, attachments=list(attachments))
+        self.sent = []
+
+    async def send(self, content=None, **kwargs):
+        self.sent.append(content)
+        return SimpleNamespace(id=next(_snowflakes), channel=self.channel, content=content)
+
+
+class FakeBot:
+    def __init__(self, channels=None):
+        self._channels = dict(channels or {})
+        self.assets = None
+        self.ticket_log = None
+        self.listeners = {}
+        self.deleted = []
+        self.guilds = []
+
+    def get_channel(self, channel_id):
+        return self._channels.get(channel_id)
+
+    def get_guild(self, guild_id):
+        return next((guild for guild in self.guilds if guild.id == guild_id), None)
+
+    def add_listener(self, func, name=None):
+        self.listeners.setdefault(name or func.__name__, []).append(func)
+
+    def get_partial_messageable(self, channel_id):
+        return FakePartialMessageable(self, channel_id)
+
+
+def synthetic_ticket(count, guild, authors):
+    # Lazily yields `count` messages alternating between `authors` with a mix of
+    # mentions and markdown, roughly what a busy support ticket looks like.
+    start = datetime.datetime(2025, 1, 1, tzinfo=datetime.timezone.utc)
+    role_ids = list(guild._roles)
+    for i in range(count):
+        author = authors[i % len(authors)]
+        content = f"Message {i} from **{author.name}** about <@{authors[0].id}>"
+        if role_ids and i % 10 == 0:
+            content += f" ping <@&{role_ids[i % len(role_ids)]}>"
+        yield FakeMessage(
+            id=i,
+            author=author,
+            content=content,
+            guild=guild,
+            created_at=start + datetime.timedelta(seconds=i),
+        )
+
+
+def make_guild(members=50, roles=10, channels=20, rest_latency=0.0, role_names=()):
+    # A populated guild: `roles` coloured roles (plus one per `role_names`),
+    # `members` members holding a few of them, and `channels` text channels.
+    rng = random.Random(members * 31 + roles)
+    role_list = [FakeRole(next(_snowflakes), f"role-{i}", color=rng.getrandbits(24), position=i + 1) for i in range(roles)]
+    role_list += [FakeRole(next(_snowflakes), name, position=len(role_list) + i + 1) for i, name in enumerate(role_names)]
+    member_list = [
+        FakeMember(next(_snowflakes), f"member{i}", roles=rng.sample(role_list[:roles], min(3, roles)))
+        for i in range(members)
+    ]
+    guild = FakeGuild(members=member_list, roles=role_list, rest_latency=rest_latency)
+    for i in range(channels):
+        guild.add_channel(FakeTextChannel(next(_snowflakes), f"channel-{i}", guild, []))
+    return guild
+
+
+def generate_history(count, guild, authors, mentions=0.2, embeds=0.05, attachments=0.1, seed=0):
+    # Lazily yields `count` messages from `authors`. The arguments are the
+    # share of messages with mentions (users, roles and channels of `guild`,
+    # plus some that no longer resolve), with an embed and with attachments.
+    # The same seed always produces the same history.
+    rng = random.Random(seed)
+    start = datetime.datetime(2025, 1, 1, tzinfo=datetime.timezone.utc)
+    user_ids = [author.id for author in authors] + [next(_snowflakes)]
+    role_ids = [role.id for role in guild.roles] + [next(_snowflakes)]
+    channel_ids = [channel.id for channel in guild.channels] + [next(_snowflakes)]
+    for i in range(count):
+        author = authors[i % len(authors)]
+        content = f"Message {i} from **{author.name}**, see `step {i % 7}` and __this__"
+        if rng.random() < mentions:
+            content += (f" <@{rng.choice(user_ids)}> <@&{rng.choice(role_ids)}>"
+                        f" in <#{rng.choice(channel_ids)}>")
+        message_embeds = []
+        if rng.random() < embeds:
+            message_embeds.append(FakeEmbed(
+                title=f"Order #{i}",
+                description=f"Requested by <@{author.id}>\n**Budget:** ${rng.randint(5, 500)}",
+                color=rng.getrandbits(24),
+                fields=[("Status", "*open*"), ("Assigned", f"<@&{rng.choice(role_ids)}>")],
+                thumbnail=f"https://cdn.discordapp.com/embed/{i}.png",
+            ))
+        message_attachments = []
+        if rng.random() < attachments:
+            message_attachments.append(FakeAttachment(next(_snowflakes), f"reference-{i}.png", "image/png"))
+            if i % 3 == 0:
+                message_attachments.append(FakeAttachment(next(_snowflakes), f"brief-{i}.pdf", "application/pdf"))
+        yield FakeMessage(
+            id=next(_snowflakes),
+            author=author,
+            content=content,
+            guild=guild,
+            created_at=start + datetime.timedelta(seconds=i),
+            embeds=message_embeds,
+            attachments=message_attachments,
+        )
@@ -0,0 +1,402 @@
+import argparse
+import asyncio
+import collections
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.loadtest.gateway import Gateway
+from benchmarks.loadtest.server import FakeDiscord
+from benchmarks.loadtest.world import PING_CHANNELS, ROOT, World
+
+# End-to-end load test: the real bot (bot.py with every cog) logs in to a
+# local fake Discord (server.py) and gets its events from a scripted gateway
+# (gateway.py), then a scenario from scenarios/ plays users opening and
+# closing tickets, chatting, pinging and running slash commands. Reports per
+# step how many operations finished, throughput and latency percentiles,
+# and for the whole run every REST call and 429 the bot ran into.
+#
+#   python -m benchmarks.loadtest [scenario ...] [--profile low] [--out results.json]
+#
+# An operation's latency runs from the user's event to the request that
+# finishes it: the ticket confirmation for an open, the channel delete for a
+# close, the role ping for !wip, the followup for /role. Every scenario runs in
+# its own process, in a temporary directory so the database, transcripts and
+# archive start empty and the repo's own stay untouched.
+#
+# A scenario is a list of steps run one after the other; "count" operations
+# start evenly spread over "over" seconds (0 is all at once):
+#
+#   open_ticket   members pick a category ("category", or every one in turn)
+#   chat          "messages" per open ticket, from the owner and staff
+#   outage        the same, while the bot reconnects and can't see them
+#   close_ticket  owners click Close and Confirm on their tickets
+#   ping          !wip, !help or !feedback ("command") with an image
+#   slash         /role or /remove with a "role", or /purge with an "amount"
+#                 after "fill" old messages
+#
+# "members" sizes the guild, "profile" picks the MEMORY_PROFILE and "server"
+# overrides FakeDiscord's latency, global_limit and rate_limits.
+
+SCENARIOS_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "scenarios")
+TOKEN = "loadtest-token"
+TIMEOUT = 180.0
+READY_TIMEOUT = 0.5
+# Busiest routes in the report
+ROUTES_SHOWN = 8
+
+
+def percentile(values, q):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(q / 100 * (len(values) - 1))))]
+
+
+class Waiters:
+    # Futures the server observer resolves when the bot makes the request
+    # that finishes an operation
+    def __init__(self):
+        self.keyed = {}
+        self.queued = collections.defaultdict(collections.deque)
+
+    def expect(self, key):
+        future = asyncio.get_running_loop().create_future()
+        self.keyed[key] = future
+        return future
+
+    def expect_next(self, key):
+        # Anything in a channel answers whoever came first
+        future = asyncio.get_running_loop().create_future()
+        self.queued[key].append(future)
+        return future
+
+    def resolve(self, key, value=None):
+        future = self.keyed.pop(key, None)
+        if future is None:
+            queue = self.queued.get(key)
+            while queue and future is None:
+                future = queue.popleft()
+                if future.done():
+                    future = None
+        if future is not None and not future.done():
+            future.set_result(value)
+
+    def observe(self, method, route, params, body, status, payload):
+        if status >= 300:
+            return
+        if route == "/interactions/{interaction_id}/{token}/callback":
+            self.resolve(("callback", params["token"]), payload["resource"].get("message"))
+        elif method == "POST" and route == "/webhooks/{application_id}/{token}":
+            self.resolve(("followup", params["token"]), payload)
+        elif method == "DELETE" and route == "/webhooks/{application_id}/{token}/messages/{message_id}":
+            self.resolve(("delete_original", params["token"]))
+        elif method == "DELETE" and route == "/channels/{channel_id}":
+            self.resolve(("delete_channel", params["channel_id"]))
+        elif method == "POST" and route == "/channels/{channel_id}/messages":
+            self.resolve(("reply", params["channel_id"]), payload)
+
+
+class Runner:
+    def __init__(self, client, world, server, gateway):
+        self.client = client
+        self.world = world
+        self.server = server
+        self.gateway = gateway
+        self.waiters = Waiters()
+        server.observers.append(self.waiters.observe)
+        self.rng = random.Random(2)
+        # Members who haven't done anything yet, so cooldowns and one
+        # ticket per user don't turn operations into no-ops
+        self._fresh = iter(world.regular_members())
+        # channel id -> owner
+        self.tickets = {}
+        with open(os.path.join(ROOT, "config", "tickets.json"), encoding="utf-8") as f:
+            self.categories = list(json.load(f))
+
+    def fresh_member(self):
+        member = next(self._fresh, None)
+        if member is None:
+            member = self.world.add_member(f"member{len(self.world.members)}")
+            self.gateway.emit("GUILD_MEMBER_ADD", {**member, "guild_id": str(self.world.guild_id)})
+        return member
+
+    async def wait(self, future):
+        return await asyncio.wait_for(future, TIMEOUT)
+
+    # ---------------- Operations ----------------
+    #
+    # Each returns when the bot has finished what the user asked for
+
+    async def open_ticket(self, step, index):
+        member = self.fresh_member()
+        category = step.get("category") or self.categories[index % len(self.categories)]
+        token = self.gateway.click(self.world.panel, member, "ticket_category_dropdown", values=[category])
+        confirmation = self.waiters.expect(("followup", token))
+        await self.wait(confirmation)
+        for channel in self.world.channels.values():
+            if any(target["id"] == member["user"]["id"] for target in channel["permission_overwrites"]):
+                self.tickets[channel["id"]] = member
+
+    async def close_ticket(self, step, channel_id):
+        owner = self.tickets.pop(channel_id)
+        # The welcome message with the close button
+        welcome = next(message for message in self.world.messages[channel_id] if message["components"])
+        token = self.gateway.click(welcome, owner, "close_button")
+        prompt = await self.wait(self.waiters.expect(("callback", token)))
+        deleted = self.waiters.expect(("delete_channel", channel_id))
+        self.gateway.click(prompt, owner, "confirm_close")
+        await self.wait(deleted)
+
+    async def ping(self, step, index):
+        command = step["command"]
+        channel_id = PING_CHANNELS[command]
+        reply = self.waiters.expect_next(("reply", str(channel_id)))
+        self.gateway.send_message(
+            channel_id, self.fresh_member(), content=f"!{command}",
+            attachments=[self.world.attachment(self.server.base_url)],
+        )
+        await self.wait(reply)
+
+    async def slash(self, step, index):
+        command = step["command"]
+        channel_id = self.world.general["id"]
+        if command == "purge":
+            token = self.gateway.slash(channel_id, self.world.admin, "purge", amount=step["amount"])
+            await self.wait(self.waiters.expect(("delete_original", token)))
+            return
+        target = self.rng.choice(self.world.regular_members())
+        role = self.world.roles[str(self.world.role_id(step.get("role", "Event")))]
+        token = self.gateway.slash(channel_id, self.world.admin, command, user=target, role=role)
+        await self.wait(self.waiters.expect(("followup", token)))
+
+    def chat(self, step, seen=True):
+        # Not measured, it only fills the tickets for the closes after it
+        sent = 0
+        for channel_id, owner in self.tickets.items():
+            for i in range(step["messages"]):
+                author = owner if i % 2 == 0 else self.world.admin
+                attachments = [self.world.attachment(self.server.base_url)] if i % 10 == 9 else ()
+                self.gateway.send_message(
+                    channel_id, author, content=f"message {i} " + "lorem ipsum " * self.rng.randint(1, 20),
+                    attachments=attachments, seen=seen,
+                )
+                sent += 1
+        return sent
+
+    async def outage(self, step):
+        # The bot drops off the gateway while members keep talking, then
+        # connects again with a new session. What was said in between is only
+        # in the channel history, so closing has to crawl for it.
+        sent = self.chat(step, seen=False)
+        ready = asyncio.create_task(self.client.wait_for("ready", timeout=60))
+        self.gateway.connect(session_id=f"loadtest-{self.world.snowflake()}")
+        await ready
+        await self.gateway.drained()
+        # Listeners for the new ready (the ticket log marks its gaps) run
+        # as their own tasks
+        await asyncio.sleep(READY_TIMEOUT)
+        return sent
+
+    def fill(self, step):
+        # Old messages in the purge channel, already there when the bot started
+        for i in range(step["fill"]):
+            author = self.rng.choice(self.world.regular_members())
+            self.world.message(self.world.general["id"], author["user"], content=f"old message {i}")
+
+    # ---------------- Steps ----------------
+
+    async def run_step(self, step):
+        op = step["op"]
+        if op == "chat":
+            sent = self.chat(step)
+            await self.gateway.drained()
+            return {"op": op, "sent": sent}
+        if op == "outage":
+            return {"op": op, "sent": await self.outage(step)}
+        if op == "close_ticket":
+            targets = list(self.tickets)[:step.get("count", len(self.tickets))]
+            operation = self.close_ticket
+        else:
+            if op == "slash" and step.get("fill"):
+                self.fill(step)
+            targets = range(step.get("count", 1))
+            operation = {"open_ticket": self.open_ticket, "ping": self.ping, "slash": self.slash}[op]
+
+        over = step.get("over", 0)
+        latencies = []
+        timeouts = 0
+        errors = collections.Counter()
+        started = time.perf_counter()
+
+        async def one(i, target):
+            nonlocal timeouts
+            await asyncio.sleep(started + over * i / max(len(targets), 1) - time.perf_counter())
+            began = time.perf_counter()
+            try:
+                await operation(step, target)
+            except asyncio.TimeoutError:
+                timeouts += 1
+            except Exception as e:
+                errors[repr(e)] += 1
+            else:
+                latencies.append(time.perf_counter() - began)
+
+        await asyncio.gather(*(one(i, target) for i, target in enumerate(targets)))
+        wall = time.perf_counter() - started
+        return {
+            "op": f"{op} {step['command']}" if "command" in step else op,
+            "count": len(targets), "ok": len(latencies), "timeouts": timeouts, "failed": sum(errors.values()),
+            "wall": wall, "throughput": len(latencies) / wall if wall else 0.0,
+            **{f"p{q}": percentile(latencies, q) for q in (50, 95, 99)},
+            "max": max(latencies, default=None), "errors": dict(errors),
+        }
+
+
+# ---------------- Child process ----------------
+
+async def child(path, profile):
+    with open(path, encoding="utf-8") as f:
+        scenario = json.load(f)
+    # The bot keeps its database, transcripts and archive under the working
+    # directory; everything it writes stays in a fresh one
+    workdir = tempfile.mkdtemp(prefix="loadtest-")
+    os.chdir(workdir)
+    os.environ["MEMORY_PROFILE"] = profile or scenario.get("profile", "default")
+
+    world = World(members=scenario.get("members", 1000))
+    server = FakeDiscord(world, **scenario.get("server", {}))
+    base_url = await server.start()
+
+    from discord.asset import Asset
+    from discord.http import Route
+
+    Route.BASE = f"{base_url}/api/v10"
+    Asset.BASE = base_url
+
+    import bot
+    from utils import metrics
+    from utils.render import shutdown_render_pool
+
+    client = bot.client
+    bot.startup["start"] = time.perf_counter()
+    await bot.load_cogs()
+    bot.startup["cogs"] = time.perf_counter()
+    gateway = None
+    try:
+        async with client:
+            client.jobs.start()
+            client.cooldowns.start_flushing()
+            client.ticket_log.start_flushing()
+            metrics.watch_rate_limits()
+            bot.startup["connect"] = time.perf_counter()
+            await client.login(TOKEN)
+
+            state = client._connection
+            state.guild_ready_timeout = READY_TIMEOUT
+            gateway = server.gateway = Gateway(world, state)
+            gateway.start()
+            gateway.connect()
+            await asyncio.wait_for(client.wait_until_ready(), 60)
+            startup = time.perf_counter() - bot.startup["connect"]
+
+            runner = Runner(client, world, server, gateway)
+            steps = []
+            for step in scenario["steps"]:
+                steps.append(await runner.run_step(step))
+            # Whatever is still queued, e.g. closes retried after a 429
+            await client.jobs.drain()
+            await gateway.drained()
+            await client.cooldowns.close()
+            await client.ticket_log.close()
+            if client.assets is not None:
+                await client.assets.close()
+    finally:
+        if gateway is not None:
+            await gateway.close()
+        await asyncio.to_thread(shutdown_render_pool)
+        await server.close()
+        os.chdir(ROOT)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    requests = sum(count for count, _ in server.requests.values())
+    print(json.dumps({
+        "scenario": scenario.get("name", os.path.basename(path)[:-5]), "description": scenario.get("description", ""),
+        "profile": os.environ["MEMORY_PROFILE"], "members": len(world.members), "startup": startup,
+        "steps": steps, "requests": requests, "events": gateway.events, "event_errors": gateway.errors,
+        "routes": {f"{method} {route}": count for (method, route), (count, _) in server.requests.items()},
+        "rate_limited": {f"{method} {route}": limited for (method, route), (_, limited) in server.requests.items() if limited},
+        "global_rate_limited": server.global_429s, "unknown_routes": dict(server.unknown_routes),
+    }))
+
+
+# ---------------- Report ----------------
+
+def ms(seconds):
+    return "-" if seconds is None else f"{seconds * 1000:.0f}"
+
+
+def report(result):
+    print(f"{result['scenario']} ({result['profile']} profile, {result['members']} members): {result['description']}")
+    print(f"  ready in {result['startup']:.2f}s")
+    print(f"  {'step':<14} {'ops':>5} {'ok':>5} {'timeout':>7} {'failed':>6} {'wall':>7} {'ops/s':>6} "
+          f"{'p50 ms':>7} {'p95 ms':>7} {'p99 ms':>7} {'max ms':>7}")
+    for step in result["steps"]:
+        if "sent" in step:
+            print(f"  {step['op']:<14} {step['sent']:>5} messages")
+            continue
+        print(f"  {step['op']:<14} {step['count']:>5} {step['ok']:>5} {step['timeouts']:>7} {step['failed']:>6} "
+              f"{step['wall']:>6.1f}s {step['throughput']:>6.2f} {ms(step['p50']):>7} {ms(step['p95']):>7} "
+              f"{ms(step['p99']):>7} {ms(step['max']):>7}")
+        for error, count in step["errors"].items():
+            print(f"    {count} failed with {error}")
+    limited = sum(result["rate_limited"].values())
+    print(f"  {result['requests']} REST requests, {limited} hit a 429, {result['global_rate_limited']} global 429s, "
+          f"{result['events']} gateway events")
+    print(f"  {'requests':>10} {'429s':>6}  route")
+    for route, count in sorted(result["routes"].items(), key=lambda item: -item[1])[:ROUTES_SHOWN]:
+        print(f"  {count:>10} {result['rate_limited'].get(route, 0):>6}  {route}")
+    if result["unknown_routes"]:
+        print(f"  unknown routes: {result['unknown_routes']}")
+    if result["event_errors"]:
+        print(f"  {result['event_errors']} gateway events failed to parse")
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.loadtest")
+    parser.add_argument("scenarios", nargs="*", help="names in scenarios/ or paths, all of them by default")
+    parser.add_argument("--profile", help="MEMORY_PROFILE to run with, instead of the scenario's")
+    parser.add_argument("--out", help="also write the results to this JSON file")
+    args = parser.parse_args()
+
+    names = args.scenarios or sorted(name[:-5] for name in os.listdir(SCENARIOS_FOLDER) if name.endswith(".json"))
+    results = []
+    for name in names:
+        path = name if name.endswith(".json") else os.path.join(SCENARIOS_FOLDER, f"{name}.json")
+        command = [sys.executable, "-m", "benchmarks.loadtest", "--child", os.path.abspath(path), args.profile or ""]
+        process = subprocess.run(
+            command, cwd=ROOT, capture_output=True, text=True,
+            env={**os.environ, "PYTHONPATH": os.pathsep.join(filter(None, [ROOT, os.getenv("PYTHONPATH")]))},
+        )
+        if process.returncode != 0:
+            print(f"{name} failed:\n{process.stdout[-3000:]}{process.stderr[-3000:]}")
+            continue
+        result = json.loads(process.stdout.strip().splitlines()[-1])
+        results.append(result)
+        report(result)
+        print()
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "--child":
+        asyncio.run(child(sys.argv[2], sys.argv[3] or None))
+    else:
+        main()
@@ -0,0 +1,159 @@
+import asyncio
+import random
+import time
+import traceback
+
+from benchmarks.loadtest.world import ADMINISTRATOR, EVERYONE
+
+# Plays the gateway side: events go through discord.py's own parsers
+# (ConnectionState.parse_*) in the order they were emitted, each a little
+# after it happened, like they would coming off the websocket. The REST
+# server emits what the bot's own requests change, the runner emits what
+# users do: messages, button clicks, slash commands.
+
+LATENCY = (0.01, 0.04)
+CHUNK_SIZE = 1000
+INTERACTION_VERSION = 1
+ATTACHMENT_SIZE_LIMIT = 8 * 1024 * 1024
+
+
+class Gateway:
+    def __init__(self, world, state, latency=LATENCY, seed=1):
+        self.world = world
+        self.state = state
+        self.latency = latency
+        self.rng = random.Random(seed)
+        self.events = 0
+        self.errors = 0
+        self._queue = asyncio.Queue()
+        self._due = 0.0
+        self._pump = None
+
+    def start(self):
+        # discord.py asks "the websocket" for member chunks
+        self.state._get_websocket = lambda guild_id=None, shard_id=None: self
+        self._pump = asyncio.create_task(self._run())
+
+    async def close(self):
+        if self._pump is not None:
+            self._pump.cancel()
+            await asyncio.gather(self._pump, return_exceptions=True)
+
+    def emit(self, event, data):
+        # Later events never overtake earlier ones, latency only delays them
+        self._due = max(self._due, time.monotonic() + self.rng.uniform(*self.latency))
+        self._queue.put_nowait((self._due, event, data))
+
+    async def _run(self):
+        while True:
+            due, event, data = await self._queue.get()
+            delay = due - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            self.events += 1
+            try:
+                self.state.parsers[event](data)
+            except Exception:
+                self.errors += 1
+                print(f"Gateway: {event} failed to parse")
+                traceback.print_exc()
+
+    async def drained(self):
+        while not self._queue.empty():
+            await asyncio.sleep(0.01)
+
+    # ---------------- Startup ----------------
+
+    def connect(self, session_id="loadtest"):
+        world = self.world
+        self.emit("READY", {
+            "v": 10, "user": world.bot, "session_id": session_id, "resume_gateway_url": "",
+            "guilds": [{"id": str(world.guild_id), "unavailable": True}],
+            "application": {"id": str(world.app_id), "flags": 0},
+        })
+        self.emit("GUILD_CREATE", world.guild_payload())
+
+    async def request_chunks(self, guild_id, query=None, *, limit, user_ids=None, presences=False, nonce=None):
+        members = list(self.world.members.values())
+        if user_ids:
+            wanted = {str(user_id) for user_id in user_ids}
+            members = [member for member in members if member["user"]["id"] in wanted]
+        elif query:
+            members = [member for member in members if member["user"]["username"].startswith(query)]
+        if limit:
+            members = members[:limit]
+        chunks = [members[start:start + CHUNK_SIZE] for start in range(0, len(members), CHUNK_SIZE)] or [[]]
+        for index, chunk in enumerate(chunks):
+            self.emit("GUILD_MEMBERS_CHUNK", {
+                "guild_id": str(guild_id), "members": chunk, "chunk_index": index,
+                "chunk_count": len(chunks), "nonce": nonce,
+            })
+
+    # ---------------- What users do ----------------
+
+    def send_message(self, channel_id, member, content="", attachments=(), seen=True):
+        # A message from a member. Unseen ones went past while the bot was
+        # away: they're in the channel history but no event announces them.
+        message = self.world.message(channel_id, member["user"], content=content, attachments=attachments)
+        if seen:
+            self.emit("MESSAGE_CREATE", message)
+        return message
+
+    def _interaction(self, kind, channel_id, member, data, message=None):
+        world = self.world
+        token = f"interaction-{world.snowflake()}"
+        interaction_id = str(world.snowflake())
+        permissions = ADMINISTRATOR if str(world.role_id("Admin")) in member["roles"] else EVERYONE
+        payload = {
+            "id": interaction_id, "application_id": str(world.app_id), "type": kind, "token": token,
+            "version": INTERACTION_VERSION, "guild_id": str(world.guild_id), "channel_id": str(channel_id),
+            "channel": {"id": str(channel_id), "type": world.channels[str(channel_id)]["type"]},
+            "member": {**member, "permissions": permissions}, "app_permissions": ADMINISTRATOR,
+            "data": data, "locale": "en-US", "guild_locale": "en-US", "entitlements": [],
+            "authorizing_integration_owners": {"0": str(world.guild_id)}, "context": 0,
+            "attachment_size_limit": ATTACHMENT_SIZE_LIMIT,
+        }
+        if message is not None:
+            payload["message"] = message
+        world.interactions[token] = {
+            "id": interaction_id, "type": kind, "channel_id": str(channel_id),
+            "message_id": message["id"] if message is not None else None, "original": None,
+        }
+        self.emit("INTERACTION_CREATE", payload)
+        return token
+
+    def click(self, message, member, custom_id, values=None):
+        # A button, or a select menu when values are given
+        data = {"custom_id": custom_id, "component_type": 3 if values is not None else 2}
+        if values is not None:
+            data["values"] = list(values)
+        return self._interaction(3, message["channel_id"], member, data, message=message)
+
+    def slash(self, channel_id, member, name, **options):
+        # Options are members, roles or plain values; the resolved objects go
+        # along with the command like Discord sends them
+        world = self.world
+        resolved = {"users": {}, "members": {}, "roles": {}}
+        payload_options = []
+        for option, value in options.items():
+            if isinstance(value, dict) and "user" in value:
+                user_id = value["user"]["id"]
+                resolved["users"][user_id] = value["user"]
+                resolved["members"][user_id] = {
+                    **{key: item for key, item in value.items() if key != "user"}, "permissions": EVERYONE,
+                }
+                payload_options.append({"name": option, "type": 6, "value": user_id})
+            elif isinstance(value, dict) and "permissions" in value:
+                resolved["roles"][value["id"]] = value
+                payload_options.append({"name": option, "type": 8, "value": value["id"]})
+            elif isinstance(value, bool):
+                payload_options.append({"name": option, "type": 5, "value": value})
+            elif isinstance(value, int):
+                payload_options.append({"name": option, "type": 4, "value": value})
+            else:
+                payload_options.append({"name": option, "type": 3, "value": value})
+        data = {
+            "id": str(world.snowflake()), "name": name, "type": 1, "options": payload_options,
+            "resolved": {key: value for key, value in resolved.items() if value},
+        }
+        return self._interaction(2, channel_id, member, data)
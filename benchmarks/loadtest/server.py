@@ -0,0 +1,422 @@
+import asyncio
+import collections
+import hashlib
+import json
+import random
+import re
+import time
+
+from aiohttp import web
+
+from benchmarks.loadtest.world import now_iso
+
+# A local stand-in for Discord's REST API, just the routes the bot uses.
+# Every request takes a random round-trip, and the routes are rate limited
+# per bucket the way Discord does it: limit/remaining/reset headers on every
+# response and a 429 with retry_after once a bucket is empty. On top of that
+# there is a global limit per second that no header announces, so bursts can
+# still run into it. Anything that changes the guild is announced on the
+# gateway, like Discord would.
+
+# (method, route) -> (requests, per seconds); the bucket is per top-level
+# resource (channel, guild or interaction token) like Discord's
+RATE_LIMITS = {
+    ("POST", "/channels/{channel_id}/messages"): (5, 5.0),
+    ("PATCH", "/channels/{channel_id}/messages/{message_id}"): (5, 5.0),
+    ("DELETE", "/channels/{channel_id}/messages/{message_id}"): (5, 1.0),
+    ("POST", "/channels/{channel_id}/messages/bulk-delete"): (1, 1.0),
+    ("GET", "/channels/{channel_id}/messages"): (5, 1.0),
+    ("POST", "/guilds/{guild_id}/channels"): (5, 5.0),
+    ("DELETE", "/channels/{channel_id}"): (5, 5.0),
+    ("GET", "/guilds/{guild_id}/members/{user_id}"): (10, 1.0),
+    ("PUT", "/guilds/{guild_id}/members/{user_id}/roles/{role_id}"): (10, 10.0),
+    ("DELETE", "/guilds/{guild_id}/members/{user_id}/roles/{role_id}"): (10, 10.0),
+    ("POST", "/webhooks/{application_id}/{token}"): (5, 2.0),
+    ("PATCH", "/webhooks/{application_id}/{token}/messages/{message_id}"): (5, 2.0),
+}
+DEFAULT_LIMIT = (50, 1.0)
+GLOBAL_LIMIT = 50
+# Interaction responses don't count against the global limit
+GLOBAL_EXEMPT = ("/interactions/",)
+LATENCY = (0.03, 0.09)
+# A 429 without Via didn't come from Discord's API but from Cloudflare, and
+# discord.py gives up on those instead of waiting
+RATE_LIMITED = {"Via": "1.1 google"}
+TINY_PNG = bytes.fromhex(
+    "89504e470d0a1a0a0000000d4948445200000001000000010806000000"
+    "1f15c4890000000d49444154789c6360000002000100e221bc330000000049454e44ae426082"
+)
+
+
+def json_response(payload, status=200, headers=None):
+    # discord.py only decodes bodies labelled exactly application/json, so
+    # no charset like aiohttp's own json_response adds
+    return web.Response(body=json.dumps(payload).encode(), status=status,
+                        headers={**(headers or {}), "Content-Type": "application/json"})
+
+
+class Bucket:
+    def __init__(self, limit, per):
+        self.limit = limit
+        self.per = per
+        self.remaining = limit
+        self.reset_at = 0.0
+
+    def take(self, now):
+        if now >= self.reset_at:
+            self.remaining = self.limit
+            self.reset_at = now + self.per
+        if self.remaining == 0:
+            return False
+        self.remaining -= 1
+        return True
+
+
+class FakeDiscord:
+    def __init__(self, world, latency=LATENCY, rate_limits=None, global_limit=GLOBAL_LIMIT, seed=0):
+        self.world = world
+        self.latency = latency
+        self.limits = dict(RATE_LIMITS)
+        # Overrides from a scenario file are keyed "METHOD /route"
+        for key, (limit, per) in (rate_limits or {}).items():
+            self.limits[tuple(key.split(" ", 1)) if isinstance(key, str) else key] = (limit, per)
+        self.global_limit = global_limit
+        self.rng = random.Random(seed)
+        self.gateway = None
+        self.base_url = None
+        self._buckets = {}
+        self._global_window = (0, 0)
+        self._runner = None
+        # (method, route) -> [requests, 429s]
+        self.requests = collections.defaultdict(lambda: [0, 0])
+        self.global_429s = 0
+        self.unknown_routes = collections.Counter()
+        # Called with (method, route, params, body, status, response) after each request
+        self.observers = []
+        self._routes = []
+        for method, route, handler in (
+            ("GET", "/users/@me", self.get_me),
+            ("GET", "/oauth2/applications/@me", self.get_application),
+            ("PUT", "/applications/{application_id}/commands", self.put_commands),
+            ("PUT", "/applications/{application_id}/guilds/{guild_id}/commands", self.put_commands),
+            ("POST", "/guilds/{guild_id}/channels", self.create_channel),
+            ("GET", "/guilds/{guild_id}/members/{user_id}", self.get_member),
+            ("PUT", "/guilds/{guild_id}/members/{user_id}/roles/{role_id}", self.add_role),
+            ("DELETE", "/guilds/{guild_id}/members/{user_id}/roles/{role_id}", self.remove_role),
+            ("DELETE", "/channels/{channel_id}", self.delete_channel),
+            ("GET", "/channels/{channel_id}/messages", self.get_messages),
+            ("POST", "/channels/{channel_id}/messages", self.create_message),
+            ("POST", "/channels/{channel_id}/messages/bulk-delete", self.bulk_delete),
+            ("PATCH", "/channels/{channel_id}/messages/{message_id}", self.edit_message),
+            ("DELETE", "/channels/{channel_id}/messages/{message_id}", self.delete_message),
+            ("POST", "/interactions/{interaction_id}/{token}/callback", self.interaction_callback),
+            ("POST", "/webhooks/{application_id}/{token}", self.followup),
+            ("GET", "/webhooks/{application_id}/{token}/messages/{message_id}", self.get_webhook_message),
+            ("PATCH", "/webhooks/{application_id}/{token}/messages/{message_id}", self.edit_webhook_message),
+            ("DELETE", "/webhooks/{application_id}/{token}/messages/{message_id}", self.delete_webhook_message),
+        ):
+            pattern = re.compile("^" + re.sub(r"\{(\w+)\}", r"(?P<\1>[^/]+)", route) + "$")
+            self._routes.append((method, route, pattern, handler))
+
+    async def start(self, host="127.0.0.1"):
+        app = web.Application(client_max_size=64 * 1024 * 1024)
+        app.router.add_route("*", "/{tail:.*}", self.handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.base_url = f"http://{host}:{port}"
+        return self.base_url
+
+    async def close(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+
+    def emit(self, event, data):
+        if self.gateway is not None:
+            self.gateway.emit(event, data)
+
+    # ---------------- Dispatch ----------------
+
+    def _match(self, method, path):
+        for route_method, route, pattern, handler in self._routes:
+            if route_method == method and (match := pattern.match(path)):
+                return route, match.groupdict(), handler
+        return None, None, None
+
+    def _rate_limit(self, method, route, params, now):
+        # Returns (429 response or None, headers for a normal response)
+        if not any(part in route for part in GLOBAL_EXEMPT):
+            second, used = self._global_window
+            if int(now) != second:
+                second, used = int(now), 0
+            if used >= self.global_limit:
+                self.global_429s += 1
+                retry_after = second + 1 - now
+                return json_response(
+                    {"message": "You are being rate limited.", "retry_after": retry_after, "global": True},
+                    status=429, headers={**RATE_LIMITED, "Retry-After": f"{retry_after:.3f}",
+                                         "X-RateLimit-Global": "true", "X-RateLimit-Scope": "global"},
+                ), {}
+            self._global_window = (second, used + 1)
+
+        limit, per = self.limits.get((method, route), DEFAULT_LIMIT)
+        major = params.get("channel_id") or params.get("guild_id") or params.get("token") or ""
+        bucket_hash = hashlib.sha1(f"{method} {route}".encode()).hexdigest()[:16]
+        bucket = self._buckets.get((bucket_hash, major))
+        if bucket is None:
+            bucket = self._buckets[(bucket_hash, major)] = Bucket(limit, per)
+        allowed = bucket.take(now)
+        reset_after = max(bucket.reset_at - now, 0.0)
+        headers = {
+            "X-RateLimit-Limit": str(bucket.limit),
+            "X-RateLimit-Remaining": str(bucket.remaining),
+            "X-RateLimit-Reset": f"{time.time() + reset_after:.3f}",
+            "X-RateLimit-Reset-After": f"{reset_after:.3f}",
+            "X-RateLimit-Bucket": bucket_hash,
+        }
+        if allowed:
+            return None, headers
+        self.requests[(method, route)][1] += 1
+        return json_response(
+            {"message": "You are being rate limited.", "retry_after": reset_after, "global": False},
+            status=429, headers={**headers, **RATE_LIMITED, "Retry-After": f"{reset_after:.3f}",
+                                 "X-RateLimit-Scope": "user"},
+        ), headers
+
+    async def handle(self, request):
+        path = request.path
+        if not path.startswith("/api/v10/"):
+            # Avatars, attachments and anything else from the CDN
+            await asyncio.sleep(self.rng.uniform(*self.latency))
+            return web.Response(body=TINY_PNG, content_type="image/png")
+        path = path[len("/api/v10"):]
+        route, params, handler = self._match(request.method, path)
+        if route is None:
+            self.unknown_routes[f"{request.method} {path}"] += 1
+            return json_response({"message": "404: Not Found", "code": 0}, status=404)
+
+        self.requests[(request.method, route)][0] += 1
+        limited, headers = self._rate_limit(request.method, route, params, time.monotonic())
+        await asyncio.sleep(self.rng.uniform(*self.latency))
+        if limited is not None:
+            return limited
+
+        body = await self._body(request)
+        status, payload = await handler(params, body, request.query)
+        for observer in self.observers:
+            observer(request.method, route, params, body, status, payload)
+        if payload is None and status < 300:
+            return web.Response(status=204, headers=headers)
+        return json_response(payload, status=status, headers=headers)
+
+    async def _body(self, request):
+        if not request.can_read_body:
+            return None
+        if request.content_type.startswith("multipart/"):
+            form = await request.post()
+            return json.loads(form.get("payload_json", "{}"))
+        text = await request.text()
+        return json.loads(text) if text else None
+
+    def _not_found(self, message, code):
+        return 404, {"message": message, "code": code}
+
+    # ---------------- Handlers ----------------
+
+    async def get_me(self, params, body, query):
+        return 200, {**self.world.bot, "verified": True, "mfa_enabled": False, "flags": 0}
+
+    async def get_application(self, params, body, query):
+        return 200, {
+            "id": self.world.bot["id"], "name": "loadtest", "description": "", "icon": None,
+            "bot_public": False, "bot_require_code_grant": False, "owner": self.world.admin["user"],
+            "verify_key": "0" * 64, "flags": 0,
+        }
+
+    async def put_commands(self, params, body, query):
+        return 200, [
+            {**command, "id": str(self.world.snowflake()), "application_id": params["application_id"], "version": "1"}
+            for command in body or []
+        ]
+
+    async def create_channel(self, params, body, query):
+        world = self.world
+        channel = world.channel(
+            world.snowflake(), body["name"], type=body.get("type", 0),
+            parent_id=body.get("parent_id"), overwrites=body.get("permission_overwrites", ()),
+        )
+        self.emit("CHANNEL_CREATE", channel)
+        return 201, channel
+
+    async def delete_channel(self, params, body, query):
+        channel = self.world.channels.pop(params["channel_id"], None)
+        if channel is None:
+            return self._not_found("Unknown Channel", 10003)
+        self.world.messages.pop(params["channel_id"], None)
+        self.emit("CHANNEL_DELETE", channel)
+        return 200, channel
+
+    async def get_member(self, params, body, query):
+        member = self.world.members.get(params["user_id"])
+        if member is None:
+            return self._not_found("Unknown Member", 10007)
+        return 200, member
+
+    async def _edit_roles(self, params, add):
+        member = self.world.members.get(params["user_id"])
+        if member is None:
+            return self._not_found("Unknown Member", 10007)
+        roles = member["roles"]
+        if add and params["role_id"] not in roles:
+            roles.append(params["role_id"])
+        elif not add and params["role_id"] in roles:
+            roles.remove(params["role_id"])
+        self.emit("GUILD_MEMBER_UPDATE", {**member, "guild_id": str(self.world.guild_id)})
+        return 204, None
+
+    async def add_role(self, params, body, query):
+        return await self._edit_roles(params, True)
+
+    async def remove_role(self, params, body, query):
+        return await self._edit_roles(params, False)
+
+    async def get_messages(self, params, body, query):
+        messages = self.world.messages.get(params["channel_id"])
+        if messages is None:
+            return self._not_found("Unknown Channel", 10003)
+        limit = int(query.get("limit", 50))
+        if "after" in query:
+            after = int(query["after"])
+            selected = [m for m in messages if int(m["id"]) > after][:limit]
+        else:
+            before = int(query["before"]) if "before" in query else None
+            selected = [m for m in messages if before is None or int(m["id"]) < before][-limit:]
+        # Newest first, always
+        return 200, selected[::-1]
+
+    def _send(self, channel_id, body, author=None, flags=0):
+        body = body or {}
+        message = self.world.message(
+            channel_id, author or self.world.bot, content=body.get("content") or "",
+            embeds=body.get("embeds") or (), components=body.get("components") or (),
+            flags=flags | (body.get("flags") or 0),
+        )
+        if not message["flags"] & 64:
+            self.emit("MESSAGE_CREATE", message)
+        return message
+
+    async def create_message(self, params, body, query):
+        if params["channel_id"] not in self.world.channels:
+            return self._not_found("Unknown Channel", 10003)
+        return 200, self._send(params["channel_id"], body)
+
+    def _edit(self, message, body):
+        for key in ("content", "embeds", "components"):
+            if body and key in body:
+                message[key] = body[key] or ([] if key != "content" else "")
+        message["edited_timestamp"] = now_iso()
+        message["flags"] &= ~128
+        if not message["flags"] & 64:
+            self.emit("MESSAGE_UPDATE", message)
+        return message
+
+    async def edit_message(self, params, body, query):
+        message = self.world.find_message(params["channel_id"], params["message_id"])
+        if message is None:
+            return self._not_found("Unknown Message", 10008)
+        return 200, self._edit(message, body)
+
+    def _delete(self, channel_id, message_id):
+        message = self.world.remove_message(channel_id, message_id)
+        if message is not None and not message["flags"] & 64:
+            self.emit("MESSAGE_DELETE", {"id": message["id"], "channel_id": message["channel_id"],
+                                         "guild_id": message["guild_id"]})
+        return message
+
+    async def delete_message(self, params, body, query):
+        if self._delete(params["channel_id"], params["message_id"]) is None:
+            return self._not_found("Unknown Message", 10008)
+        return 204, None
+
+    async def bulk_delete(self, params, body, query):
+        deleted = [message_id for message_id in body["messages"]
+                   if self.world.remove_message(params["channel_id"], message_id) is not None]
+        if deleted:
+            self.emit("MESSAGE_DELETE_BULK", {"ids": deleted, "channel_id": params["channel_id"],
+                                              "guild_id": str(self.world.guild_id)})
+        return 204, None
+
+    # ---------------- Interactions ----------------
+
+    def _interaction(self, token):
+        return self.world.interactions.get(token)
+
+    async def interaction_callback(self, params, body, query):
+        interaction = self._interaction(params["token"])
+        if interaction is None:
+            return self._not_found("Unknown interaction", 10062)
+        if interaction.get("responded"):
+            return 400, {"message": "Interaction has already been acknowledged.", "code": 40060}
+        interaction["responded"] = True
+        kind = body["type"]
+        data = body.get("data") or {}
+        response = {
+            "id": interaction["id"], "type": interaction["type"], "response_message_id": None,
+            "response_message_loading": kind == 5,
+            "response_message_ephemeral": bool((data.get("flags") or 0) & 64),
+        }
+        resource = {"type": kind}
+        if kind in (4, 5):
+            # 5 is a "thinking" placeholder until the first followup or edit
+            message = self._send(interaction["channel_id"], data, flags=128 if kind == 5 else 0)
+            interaction["original"] = message
+            response["response_message_id"] = message["id"]
+            resource["message"] = message
+        elif kind == 7 and interaction.get("message_id"):
+            message = self.world.find_message(interaction["channel_id"], interaction["message_id"])
+            if message is not None:
+                resource["message"] = self._edit(message, data)
+        return 200, {"interaction": response, "resource": resource}
+
+    async def followup(self, params, body, query):
+        interaction = self._interaction(params["token"])
+        if interaction is None:
+            return self._not_found("Unknown Webhook", 10015)
+        original = interaction.get("original")
+        if original is not None and original["flags"] & 128:
+            # The first followup after a defer fills in the placeholder
+            message = self._edit(original, body)
+        else:
+            message = self._send(interaction["channel_id"], body)
+        return 200, {**message, "webhook_id": self.world.bot["id"]}
+
+    def _webhook_message(self, params):
+        interaction = self._interaction(params["token"])
+        if interaction is None:
+            return None, None
+        if params["message_id"] == "@original":
+            return interaction, interaction.get("original")
+        return interaction, self.world.find_message(interaction["channel_id"], params["message_id"])
+
+    async def get_webhook_message(self, params, body, query):
+        _, message = self._webhook_message(params)
+        if message is None:
+            return self._not_found("Unknown Message", 10008)
+        return 200, message
+
+    async def edit_webhook_message(self, params, body, query):
+        _, message = self._webhook_message(params)
+        if message is None:
+            return self._not_found("Unknown Message", 10008)
+        return 200, self._edit(message, body)
+
+    async def delete_webhook_message(self, params, body, query):
+        interaction, message = self._webhook_message(params)
+        if message is None:
+            return self._not_found("Unknown Message", 10008)
+        self._delete(message["channel_id"], message["id"])
+        if interaction.get("original") is message:
+            interaction["original"] = None
+        return 204, None
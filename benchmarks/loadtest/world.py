@@ -0,0 +1,179 @@
+import datetime
+import itertools
+import json
+import os
+import random
+import time
+
+# The guild the load test runs in, as Discord would store it: plain payload
+# dicts for roles, channels, members and messages. The fake REST server
+# changes it and the gateway injector announces the changes, so both sides
+# always agree on what exists.
+
+DISCORD_EPOCH = 1420070400000
+ADMINISTRATOR = str(1 << 3)
+EVERYONE = str((1 << 10) | (1 << 11) | (1 << 16))
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+GUILD_ID = 1415013619246039082
+TRANSCRIPT_CHANNEL_ID = 1419364607918739616
+# Channels the ping commands are restricted to
+PING_CHANNELS = {"wip": 1282266945315672094, "help": 1123308113756434606, "feedback": 1103042304970850374}
+PING_ROLES = {"wip": "WIP", "help": "Help", "feedback": "Feedback"}
+
+
+def now_iso():
+    return datetime.datetime.now(datetime.timezone.utc).isoformat()
+
+
+class Snowflakes:
+    # Ids that sort by creation time, like Discord's
+    def __init__(self):
+        self._increment = itertools.count()
+
+    def __call__(self):
+        ms = int(time.time() * 1000) - DISCORD_EPOCH
+        return (ms << 22) | (next(self._increment) & 0x3FFFFF)
+
+
+class World:
+    def __init__(self, members=1000, seed=0):
+        self.rng = random.Random(seed)
+        self.snowflake = Snowflakes()
+        self.guild_id = GUILD_ID
+        self.app_id = self.snowflake()
+        self.bot = self.user(self.app_id, "loadtest-bot", bot=True)
+        self.roles = {}
+        self.channels = {}
+        self.members = {}
+        # channel id -> message payloads in id order; ephemeral messages are
+        # kept apart since they aren't part of any channel history
+        self.messages = {}
+        self.ephemeral = {}
+        # interaction token -> {"id", "channel_id", "original"}
+        self.interactions = {}
+
+        self.role(GUILD_ID, "@everyone", permissions=EVERYONE)
+        for name in ("Admin", "WIP", "Help", "Feedback", "VIP+", "Artist", "Event"):
+            self.role(self.snowflake(), name, permissions=ADMINISTRATOR if name == "Admin" else "0")
+        with open(os.path.join(ROOT, "config", "tickets.json"), encoding="utf-8") as f:
+            categories = [entry["discord_category"] for entry in json.load(f).values()]
+        for name in categories:
+            self.channel(self.snowflake(), name, type=4)
+        self.channel(TRANSCRIPT_CHANNEL_ID, "transcripts")
+        for command, channel_id in PING_CHANNELS.items():
+            self.channel(channel_id, f"{command}-pings")
+        self.panel_channel = self.channel(self.snowflake(), "open-a-ticket")
+        self.general = self.channel(self.snowflake(), "general")
+
+        self.members[self.bot["id"]] = self.member(self.bot, [])
+        self.admin = self.add_member("admin", roles=[self.role_id("Admin")])
+        for i in range(members):
+            self.add_member(f"member{i}", roles=self.rng.sample(self.role_ids("Artist", "Event"), self.rng.randint(0, 1)))
+        # The message with the ticket dropdown, as !ticket posts it
+        self.panel = self.message(self.panel_channel["id"], self.bot, content="", embeds=[{"title": "Open a ticket!"}])
+
+    # ---------------- Payloads ----------------
+
+    def user(self, user_id, name, bot=False):
+        return {
+            "id": str(user_id), "username": name, "discriminator": "0", "global_name": name,
+            "avatar": f"{self.rng.getrandbits(128):032x}", "bot": bot,
+        }
+
+    def member(self, user, roles):
+        return {
+            "user": user, "roles": [str(role_id) for role_id in roles], "nick": None, "avatar": None,
+            "joined_at": now_iso(), "premium_since": None, "deaf": False, "mute": False, "flags": 0,
+        }
+
+    def add_member(self, name, roles=()):
+        user = self.user(self.snowflake(), name)
+        self.members[user["id"]] = self.member(user, roles)
+        return self.members[user["id"]]
+
+    def role(self, role_id, name, permissions="0"):
+        self.roles[str(role_id)] = {
+            "id": str(role_id), "name": name, "color": self.rng.getrandbits(24) if role_id != GUILD_ID else 0,
+            "position": len(self.roles), "permissions": permissions, "hoist": False, "managed": False,
+            "mentionable": True, "flags": 0,
+        }
+        return self.roles[str(role_id)]
+
+    def role_id(self, name):
+        return next(int(role["id"]) for role in self.roles.values() if role["name"] == name)
+
+    def role_ids(self, *names):
+        return [self.role_id(name) for name in names]
+
+    def channel(self, channel_id, name, type=0, parent_id=None, overwrites=()):
+        # discord.py sends overwrite ids and permissions as numbers, Discord
+        # always answers with strings
+        overwrites = [
+            {"id": str(overwrite["id"]), "type": overwrite["type"], "allow": str(overwrite.get("allow", 0)),
+             "deny": str(overwrite.get("deny", 0))}
+            for overwrite in overwrites
+        ]
+        self.channels[str(channel_id)] = {
+            "id": str(channel_id), "type": type, "name": name, "guild_id": str(self.guild_id),
+            "position": len(self.channels), "parent_id": str(parent_id) if parent_id else None, "permission_overwrites": overwrites,
+            "nsfw": False, "topic": None, "last_message_id": None, "rate_limit_per_user": 0,
+        }
+        if type == 0:
+            self.messages.setdefault(str(channel_id), [])
+        return self.channels[str(channel_id)]
+
+    def message(self, channel_id, author, content="", embeds=(), components=(), attachments=(), flags=0, store=True):
+        member = self.members.get(author["id"])
+        payload = {
+            "id": str(self.snowflake()), "channel_id": str(channel_id), "guild_id": str(self.guild_id),
+            "author": author, "content": content, "embeds": list(embeds), "components": list(components),
+            "attachments": list(attachments), "timestamp": now_iso(), "edited_timestamp": None,
+            "tts": False, "mention_everyone": False, "mentions": [], "mention_roles": [], "pinned": False,
+            "type": 0, "flags": flags,
+        }
+        if member is not None:
+            payload["member"] = {key: value for key, value in member.items() if key != "user"}
+        if flags & 64:
+            self.ephemeral[payload["id"]] = payload
+        elif store:
+            self.messages.setdefault(str(channel_id), []).append(payload)
+        return payload
+
+    def find_message(self, channel_id, message_id):
+        message_id = str(message_id)
+        for message in self.messages.get(str(channel_id), ()):
+            if message["id"] == message_id:
+                return message
+        return self.ephemeral.get(message_id)
+
+    def remove_message(self, channel_id, message_id):
+        messages = self.messages.get(str(channel_id), [])
+        for i, message in enumerate(messages):
+            if message["id"] == str(message_id):
+                return messages.pop(i)
+        return self.ephemeral.pop(str(message_id), None)
+
+    def attachment(self, base_url, filename="work.png"):
+        attachment_id = self.snowflake()
+        return {
+            "id": str(attachment_id), "filename": filename, "size": 2048, "content_type": "image/png",
+            "url": f"{base_url}/attachments/{attachment_id}/{filename}",
+            "proxy_url": f"{base_url}/attachments/{attachment_id}/{filename}",
+        }
+
+    def guild_payload(self):
+        # GUILD_CREATE; a large guild only sends the bot, the rest is chunked
+        me = self.members[self.bot["id"]]
+        return {
+            "id": str(self.guild_id), "name": "Load test", "icon": None, "owner_id": self.admin["user"]["id"],
+            "large": True, "member_count": len(self.members), "unavailable": False,
+            "roles": list(self.roles.values()), "channels": list(self.channels.values()),
+            "members": [me], "presences": [], "voice_states": [], "threads": [], "emojis": [], "stickers": [],
+            "features": [], "premium_tier": 0, "verification_level": 0, "default_message_notifications": 0,
+            "explicit_content_filter": 0, "mfa_level": 0, "nsfw_level": 0, "preferred_locale": "en-US",
+            "system_channel_flags": 0,
+        }
+
+    def regular_members(self):
+        return [member for member in self.members.values() if not member["user"]["bot"] and member is not self.admin]
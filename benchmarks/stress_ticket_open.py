@@ -0,0 +1,83 @@
+import asyncio
+import collections
+import os
+import sys
+import tempfile
+import time
+
+from benchmarks.bench_ticket_open import legacy_open
+from benchmarks.fakes import FakeBot, FakeCategory, FakeGuild, FakeInteraction, FakeMember
+from cogs import tickets
+from utils import db, registry
+from utils.names import GuildNameIndex
+
+# Fires many simultaneous ticket selections at a fake guild, several per
+# (user, category), and checks that exactly one channel is created per key
+# and that every selection for a key got that channel back. The callback
+# from before single-flight is run the same way for comparison.
+#
+#   python -m benchmarks.stress_ticket_open [users] [clicks_per_key]
+
+CATEGORIES = ("Partnership", "Role Request", "Support")
+
+
+def make_guild():
+    bot = FakeBot()
+    bot.names = GuildNameIndex(bot)
+    # A small latency so the selections actually overlap.
+    guild = FakeGuild(rest_latency=0.02)
+    for name in ("Partnership Tickets", "Role Request Tickets", "Support Tickets"):
+        guild.add_channel(FakeCategory(len(guild.channels) + 1, name, guild))
+    return bot, guild
+
+
+async def fire(open_func, users, clicks):
+    bot, guild = make_guild()
+    members = [FakeMember(1000 + i, f"user{i}") for i in range(users)]
+    selections = [
+        (member, category)
+        for member in members for category in CATEGORIES for _ in range(clicks)
+    ]
+    started = time.perf_counter()
+    results = await asyncio.gather(*(
+        open_func(bot, FakeInteraction(guild, member), category) for member, category in selections
+    ))
+    elapsed = time.perf_counter() - started
+    per_key = collections.Counter(channel.name for channel in guild.created_channels)
+    return selections, results, guild, per_key, elapsed
+
+
+async def pipeline_open(bot, interaction, category):
+    return await tickets.open_ticket(bot, interaction, tickets.TICKET_CATEGORIES[category])
+
+
+async def main():
+    users = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    clicks = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    db.DB_PATH = os.path.join(tempfile.mkdtemp(), "bot.db")
+    registry._registry = None
+    keys = users * len(CATEGORIES)
+
+    _, _, guild, per_key, elapsed = await fire(legacy_open, users, clicks)
+    print(f"{'before':<12} {keys * clicks:>5} selections {elapsed:>6.2f}s  {len(guild.created_channels):>5} channels for {keys} keys "
+          f"({sum(1 for count in per_key.values() if count > 1)} keys duplicated)")
+
+    registry._registry = None
+    db.DB_PATH = os.path.join(tempfile.mkdtemp(), "bot.db")
+    selections, results, guild, per_key, elapsed = await fire(pipeline_open, users, clicks)
+    print(f"{'singleflight':<12} {keys * clicks:>5} selections {elapsed:>6.2f}s  {len(guild.created_channels):>5} channels for {keys} keys "
+          f"({sum(1 for count in per_key.values() if count > 1)} keys duplicated)")
+
+    by_key = collections.defaultdict(set)
+    for (member, category), channel in zip(selections, results):
+        by_key[(member.id, category)].add(channel.id if channel is not None else None)
+    failures = [key for key, channels in by_key.items() if len(channels) != 1 or None in channels]
+    if len(guild.created_channels) != keys or failures or len(tickets.ticket_opens):
+        print(f"FAILED: {len(guild.created_channels)} channels, {len(failures)} keys with mismatched results, "
+              f"{len(tickets.ticket_opens)} flights left over")
+        sys.exit(1)
+    print("ok: one channel per key, every selection got it back")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
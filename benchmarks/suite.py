@@ -0,0 +1,273 @@
+import argparse
+import asyncio
+import datetime
+import gc
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from benchmarks.fakes import (
+    FakeAttachment, FakeBot, FakeCategory, FakeContext, FakeInteraction, FakeMember, FakeSendable,
+    FakeTextChannel, FakeUser, generate_history, make_guild,
+)
+from cogs import tickets
+from cogs.feedback import Feedback
+from cogs.help import Help
+from cogs.wip import WIP
+from utils import archive, db, registry, transcripts
+from utils.cooldowns import CooldownService
+from utils.markdown import MarkdownRenderer
+from utils.names import GuildNameIndex
+from utils.replies import ReplyTracker
+
+# Runs every hot path against a fake guild, without Discord, and stores the
+# throughput and peak memory of each as JSON in benchmarks/results, then
+# compares them with the last run from a different commit.
+#
+#   python -m benchmarks.suite [--scale 0.1] [--only transcript,...] [--baseline file] [--check]
+#
+# Throughput is the best of --repeat runs; the peak comes from one more run
+# under tracemalloc, which slows everything down too much to share a run
+# with the clock. --check exits with 1 when a scenario got more than
+# --threshold slower or bigger than the baseline.
+
+RESULTS_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+THRESHOLD = 0.10
+REPEAT = 3
+
+# Channels the ping commands are restricted to.
+WIP_CHANNEL_ID = 1282266945315672094
+HELP_CHANNEL_ID = 1123308113756434606
+FEEDBACK_CHANNEL_ID = 1103042304970850374
+
+
+def make_bot(guild):
+    bot = FakeBot({tickets.TRANSCRIPT_CHANNEL_ID: FakeSendable()})
+    bot.names = GuildNameIndex(bot)
+    bot.replies = ReplyTracker(bot)
+    bot.cooldowns = CooldownService()
+    return bot
+
+
+# ---------------- Scenarios ----------------
+#
+# Each takes a size and returns the number of operations it performed.
+
+
+async def transcript(size):
+    # One ticket of `size` messages through save_ticket_transcript_html.
+    guild = make_guild(members=200, roles=20, channels=40)
+    # The owner, a staff member and someone who has since left the server.
+    authors = [guild.get_member(member_id) for member_id in list(guild._members)[:2]] + [FakeUser(102, "departed")]
+    channel = FakeTextChannel(
+        10, "support-dudlesfx", guild,
+        lambda: generate_history(size, guild, authors, mentions=0.3, embeds=0.05, attachments=0.1),
+    )
+    await tickets.save_ticket_transcript_html(make_bot(guild), channel)
+    return size
+
+
+async def mentions(size):
+    # Message content rendered by the MarkdownRenderer (what replace_mentions
+    # was), with every mention kind and some deleted ones.
+    guild = make_guild(members=500, roles=40, channels=80)
+    authors = [guild.get_member(member_id) for member_id in list(guild._members)[:20]]
+    messages = list(generate_history(size, guild, authors, mentions=0.8, embeds=0, attachments=0))
+    renderer = MarkdownRenderer(guild)
+    for msg in messages:
+        renderer.render(msg.content)
+    return size
+
+
+async def ping_cooldowns(size):
+    # !wip, !help and !feedback from a pool of users, so most calls hit an
+    # active cooldown and take the "ping again in" path.
+    guild = make_guild(members=0, roles=20, channels=0, role_names=("WIP", "Help", "Feedback"))
+    bot = make_bot(guild)
+    commands = [
+        (WIP(bot), WIP_CHANNEL_ID), (Help(bot), HELP_CHANNEL_ID), (Feedback(bot), FEEDBACK_CHANNEL_ID),
+    ]
+    image = [FakeAttachment(1, "wip.png", "image/png")]
+    users = [FakeMember(10_000 + i, f"user{i}") for i in range(max(size // 20, 1))]
+    for i in range(size):
+        cog, channel_id = commands[i % len(commands)]
+        command = cog.get_commands()[0]
+        await command.callback(cog, FakeContext(guild, channel_id, users[i % len(users)], image))
+    return size
+
+
+async def ticket_open(size):
+    # Full ticket opens (channel, welcome message, confirmation, registry),
+    # every REST call answering instantly so only our own work is measured.
+    guild = make_guild(members=0, roles=5, channels=50)
+    for name in ("Partnership Tickets", "Role Request Tickets", "Support Tickets"):
+        guild.add_channel(FakeCategory(len(guild.channels) + 1, name, guild))
+    bot = make_bot(guild)
+    configs = list(tickets.TICKET_CATEGORIES.values())
+    for i in range(size):
+        interaction = FakeInteraction(guild, FakeMember(20_000 + i, f"opener{i}"))
+        await tickets.open_ticket(bot, interaction, configs[i % len(configs)])
+    return size
+
+
+# name -> (scenario, size at --scale 1, unit)
+SCENARIOS = {
+    "transcript": (transcript, 20_000, "msg"),
+    "mentions": (mentions, 100_000, "msg"),
+    "ping_cooldowns": (ping_cooldowns, 50_000, "cmd"),
+    "ticket_open": (ticket_open, 2_000, "open"),
+}
+
+
+def fresh_state(folder):
+    # Every run starts from an empty database and archive.
+    for name in os.listdir(folder):
+        path = os.path.join(folder, name)
+        if os.path.isfile(path):
+            os.remove(path)
+    db.DB_PATH = os.path.join(folder, "bench.db")
+    transcripts.TRANSCRIPT_FOLDER = folder
+    archive._archive = archive.TranscriptArchive(os.path.join(folder, "archive"))
+    registry._registry = None
+
+
+def run_scenario(func, size, folder, repeat):
+    # Best of `repeat` timed runs, then one run for the memory peak.
+    elapsed = None
+    for _ in range(repeat):
+        fresh_state(folder)
+        gc.collect()
+        started = time.perf_counter()
+        ops = asyncio.run(func(size))
+        took = time.perf_counter() - started
+        elapsed = took if elapsed is None else min(elapsed, took)
+
+    fresh_state(folder)
+    gc.collect()
+    tracemalloc.start()
+    asyncio.run(func(size))
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "size": size,
+        "seconds": round(elapsed, 4),
+        "ops_per_second": round(ops / elapsed, 1),
+        "peak_mib": round(peak / 2**20, 3),
+    }
+
+
+# ---------------- Results ----------------
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def load_results(folder):
+    runs = []
+    if os.path.isdir(folder):
+        for name in sorted(os.listdir(folder)):
+            if name.endswith(".json"):
+                with open(os.path.join(folder, name), encoding="utf-8") as f:
+                    runs.append(json.load(f))
+    return runs
+
+
+def find_baseline(runs, commit, scale):
+    # The newest run of another commit at the same scale; sizes have to
+    # match for the numbers to be comparable.
+    for run in reversed(runs):
+        if run["commit"] != commit and run["scale"] == scale:
+            return run
+    return None
+
+
+def compare(results, baseline, threshold):
+    # Prints the change against the baseline, returns the regressions.
+    regressions = []
+    print(f"\ncompared with {baseline['commit']} ({baseline['created_at']})")
+    for name, result in results.items():
+        before = baseline["scenarios"].get(name)
+        if before is None or before["size"] != result["size"]:
+            continue
+        speed = result["ops_per_second"] / before["ops_per_second"] - 1
+        memory = result["peak_mib"] / before["peak_mib"] - 1 if before["peak_mib"] else 0.0
+        flags = []
+        if speed < -threshold:
+            flags.append("slower")
+        if memory > threshold:
+            flags.append("more memory")
+        if flags:
+            regressions.append(name)
+        print(f"{name:<15} throughput {speed:>+7.1%}  peak {memory:>+7.1%}  {', '.join(flags)}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.suite")
+    parser.add_argument("--scale", type=float, default=1.0, help="multiplies every scenario size")
+    parser.add_argument("--only", default="", help="comma separated scenario names")
+    parser.add_argument("--out", default=RESULTS_FOLDER, help="folder the JSON results go to")
+    parser.add_argument("--baseline", help="results file to compare with, instead of the last other commit")
+    parser.add_argument("--repeat", type=int, default=REPEAT, help="timed runs per scenario, the best one counts")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD)
+    parser.add_argument("--check", action="store_true", help="exit with 1 on a regression")
+    args = parser.parse_args()
+
+    names = [name for name in args.only.split(",") if name] or list(SCENARIOS)
+    unknown = [name for name in names if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenario(s): {', '.join(unknown)}")
+
+    commit = git_commit()
+    results = {}
+    print(f"{'scenario':<15} {'size':>8} {'seconds':>8} {'ops/s':>11} {'peak MiB':>9}")
+    with tempfile.TemporaryDirectory() as folder:
+        for name in names:
+            func, size, unit = SCENARIOS[name]
+            size = max(int(size * args.scale), 1)
+            result = results[name] = run_scenario(func, size, folder, max(args.repeat, 1))
+            print(f"{name:<15} {size:>8} {result['seconds']:>8.2f} {result['ops_per_second']:>9.0f} {unit:<4}"
+                  f"{result['peak_mib']:>8.2f}")
+
+    runs = load_results(args.out)
+    run = {
+        "commit": commit,
+        "created_at": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "scale": args.scale,
+        "repeat": args.repeat,
+        "scenarios": results,
+    }
+    os.makedirs(args.out, exist_ok=True)
+    path = os.path.join(args.out, f"{run['created_at'].replace(':', '')[:17]}-{commit}.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(run, f, indent=2)
+    print(f"\nsaved {os.path.relpath(path)}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+    else:
+        baseline = find_baseline(runs, commit, args.scale)
+    if baseline is None:
+        print("no earlier run of another commit to compare with")
+        return
+    regressions = compare(results, baseline, args.threshold)
+    if regressions and args.check:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,562 @@
+import discord
+from discord.ext import commands
+from dotenv import load_dotenv
+import os
+import asyncio
+import datetime
+import re
+import time
+from flask import Flask, Response, abort, jsonify, redirect, request, send_file
+from threading import Thread
+from typing import Optional
+from cogs.tickets import CloseTicketView, ticket_opens
+from utils import bulkroles, memory, metrics
+from utils.assets import get_asset_store
+from utils.commandsync import sync_changed
+from utils.cooldowns import CooldownService
+from utils.jobs import JobQueue
+from utils.members import guild_members, parse_member_ids, recent_members
+from utils.names import GuildNameIndex
+from utils.purge import Purge, message_filter
+from utils.registry import get_registry
+from utils.render import shutdown_render_pool
+from utils.replies import ReplyTracker
+from utils.ticketlog import TicketLog
+from utils.transcripts import TRANSCRIPT_FOLDER
+from utils.web import asset_headers, find_asset, find_transcript, is_not_modified, search_allowed, search_payload, start_web_server, transcript_headers
+
+
+# ---------------- Load .env ----------------
+
+load_dotenv()
+TOKEN = os.getenv("DISCORD_TOKEN")
+
+# "flask" runs the web server in a thread, "aiohttp" on the bot's event loop
+WEB_SERVER = os.getenv("WEB_SERVER", "flask")
+PORT = int(os.environ.get("PORT", 10000))
+
+# ---------------- Flask ----------------
+
+app = Flask(__name__)
+
+os.makedirs(TRANSCRIPT_FOLDER, exist_ok=True)
+
+@app.route("/transcripts/search")
+def search_transcripts():
+    refused = search_allowed(request.headers)
+    if refused is not None:
+        abort(refused)
+    return jsonify(search_payload(request.args))
+
+@app.route("/transcripts/<ticket_name>")
+def serve_transcript(ticket_name):
+    transcript = find_transcript(ticket_name, request.headers.get("Accept-Encoding", ""))
+    if transcript is None:
+        abort(404, description="Transcript not found")
+
+    headers = transcript_headers(transcript)
+    if is_not_modified(transcript, request.headers.get("If-None-Match")):
+        if transcript.blob is not None:
+            transcript.blob.close()
+        return Response(status=304, headers=headers)
+
+    if transcript.blob is not None:
+        # Streamed a block at a time; closed once the response is done
+        response = Response(transcript.blob.blocks(), mimetype="text/html", headers=headers)
+        response.content_length = transcript.size
+        response.call_on_close(transcript.blob.close)
+        return response
+
+    response = send_file(transcript.path, mimetype="text/html", conditional=False, etag=False)
+    del response.headers["Content-Disposition"]
+    response.headers.update(headers)
+    return response
+
+@app.route("/assets/<key>")
+def serve_asset(key):
+    asset = find_asset(key)
+    if asset is None:
+        abort(404, description="Asset not found")
+    if asset.path is None:
+        return redirect(asset.url)
+    if is_not_modified(asset, request.headers.get("If-None-Match")):
+        return Response(status=304, headers=asset_headers(asset))
+    response = send_file(asset.path, mimetype=asset.content_type, conditional=False, etag=False)
+    del response.headers["Content-Disposition"]
+    response.headers.update(asset_headers(asset))
+    return response
+
+@app.route("/metrics")
+def serve_metrics():
+    return Response(metrics.registry.render(), headers={"Content-Type": metrics.CONTENT_TYPE})
+
+@app.route("/")
+def home():
+    return "Bot is running"
+
+def run_web():
+    app.run(host="0.0.0.0", port=PORT, debug=False, use_reloader=False)
+
+
+# ---------------- Discord bot ----------------
+
+# Intents, member cache, startup chunking and message cache come from
+# MEMORY_PROFILE (utils/memory.py)
+client = commands.Bot(command_prefix="!", help_command=None, **memory.client_options())
+client.jobs = JobQueue(client)
+client.assets = get_asset_store()
+client.cooldowns = CooldownService()
+client.replies = ReplyTracker(client)
+client.names = GuildNameIndex(client)
+client.ticket_log = TicketLog(client)
+
+# ---------------- Metrics ----------------
+
+metrics.registry.gauge(
+    "bot_gateway_latency_seconds", "Heartbeat latency to the Discord gateway.",
+    function=lambda: client.latency,
+)
+metrics.registry.gauge(
+    "bot_tracked_entries", "Entries held by in-memory maps.", ("map",),
+    function=lambda: {
+        ("cooldowns",): len(client.cooldowns),
+        ("reply_index",): len(client.replies),
+        ("name_index",): len(client.names),
+        ("open_tickets",): len(get_registry()),
+        ("ticket_opens_in_flight",): len(ticket_opens),
+        ("asset_cache",): len(client.assets),
+        ("running_jobs",): client.jobs.running(),
+        ("ticket_log_pending",): len(client.ticket_log),
+        ("member_lru",): len(recent_members),
+    },
+)
+
+def observe_command(kind, name, started, failed):
+    if started is not None:
+        metrics.command_latency.observe(time.perf_counter() - started, type=kind, command=name, status="error" if failed else "ok")
+
+@client.before_invoke
+async def start_command_timer(ctx):
+    ctx.command_started = time.perf_counter()
+
+@client.after_invoke
+async def record_command_time(ctx):
+    # Runs whether or not the command raised
+    observe_command("prefix", ctx.command.qualified_name, getattr(ctx, "command_started", None), ctx.command_failed)
+
+async def start_app_command_timer(interaction: discord.Interaction):
+    interaction.extras["started"] = time.perf_counter()
+    return True
+
+client.tree.interaction_check = start_app_command_timer
+
+@client.event
+async def on_app_command_completion(interaction: discord.Interaction, command):
+    observe_command("app", command.qualified_name, interaction.extras.get("started"), False)
+
+@client.tree.error
+async def on_app_command_error(interaction: discord.Interaction, error):
+    name = interaction.command.qualified_name if interaction.command else "unknown"
+    observe_command("app", name, interaction.extras.get("started"), True)
+    # Keep discord.py's default error logging
+    await discord.app_commands.CommandTree.on_error(client.tree, interaction, error)
+
+# ---------------- Load cogs ----------------
+
+COGS_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cogs")
+
+async def load_cogs():
+    for filename in os.listdir(COGS_FOLDER):
+        if filename.endswith(".py"):
+            await client.load_extension(f"cogs.{filename[:-3]}")
+
+
+# ---------------- /shutdown command ----------------
+
+@client.tree.command(
+        name="shutdown", 
+        description="Shuts down the bot.",
+        )
+async def shutdown(interaction: discord.Interaction):
+    if not interaction.user.guild_permissions.administrator:
+        await interaction.response.send_message(
+            "Only users with permissions can toggle this command", ephemeral=True)
+        return
+    await interaction.response.send_message("🛑 Shut down the bot...", ephemeral=False)
+    # let ticket closes that are already queued finish first
+    await client.jobs.drain()
+    await client.close()
+
+# ---------------- Bot event ----------------
+
+GUILD_ID = 1415013619246039082
+
+# perf_counter marks for the startup breakdown printed on the first ready
+startup = {}
+
+@client.event
+async def setup_hook():
+    # Runs once per process after login, unlike on_ready which fires again
+    # on every reconnect
+    startup["login"] = time.perf_counter()
+    client.add_view(CloseTicketView())
+
+    # No guild copies, so commands don't show up twice in the main server
+    guild = discord.Object(id=GUILD_ID)
+    client.tree.clear_commands(guild=guild)
+    try:
+        results = await sync_changed(client.tree, client.application_id, guilds=[guild])
+    except discord.HTTPException as e:
+        # Only the sync is lost; its hash isn't saved, so the next start retries
+        print(f"Command sync failed: {e}")
+    else:
+        for scope, synced in results.items():
+            print(f"Commands {scope}: " + ("unchanged, not synced" if synced is None else f"synced {synced}"))
+    startup["sync"] = time.perf_counter()
+
+@client.event
+async def on_ready():
+    print(f"✅ Logged in as {client.user} (memory profile: {memory.MEMORY_PROFILE})")
+
+    if "ready" not in startup:
+        startup["ready"] = time.perf_counter()
+        print(
+            "Startup: "
+            f"cogs {startup['cogs'] - startup['start']:.2f}s, "
+            f"login {startup['login'] - startup['connect']:.2f}s, "
+            f"command sync {startup['sync'] - startup['login']:.2f}s, "
+            f"gateway + guild chunking {startup['ready'] - startup['sync']:.2f}s, "
+            f"total {startup['ready'] - startup['start']:.2f}s"
+        )
+
+# ----------------------- /role give command  ----------------------- 
+
+@client.tree.command(
+    name="role",
+    description="Adds a role to a member.",
+)
+@discord.app_commands.checks.has_permissions(administrator=True)
+async def addRole(interaction: discord.Interaction, user: discord.Member, role: discord.Role):
+    await interaction.response.defer()
+
+    if role in user.roles:
+        await interaction.followup.send(f"{user.mention} already has the role {role.name}")
+    else:
+        await user.add_roles(role)
+        await interaction.followup.send(f"Added {role.name} to {user.mention}!")
+
+# ----------------------- /psd add command  ----------------------- 
+
+@client.tree.command(
+        name="psd", 
+        description="Adds a PSD to the VIP channels."
+)
+@discord.app_commands.checks.has_permissions(administrator=True)
+async def psd(interaction, link: str, image: discord.Attachment, user: discord.User):
+    embed = discord.Embed(title=link)
+    embed.set_image(url=image.url)
+    embed.set_footer(text=f"Provided by {user}"),
+    await interaction.response.send_message(embed=embed)
+
+# ----------------------- /role remove command  ----------------------- 
+
+@client.tree.command(
+    name="remove",
+    description="Removes a role from a member.",
+)
+@discord.app_commands.checks.has_permissions(administrator=True)
+async def removeRole(interaction: discord.Interaction, user: discord.Member, role: discord.Role):
+    await interaction.response.defer()
+    await user.remove_roles(role)
+    await interaction.followup.send(f"Removed {role.name} from {user.mention}!")
+
+# ------------------ /purge command ----------------------------
+
+class CancelView(discord.ui.View):
+    # Lets the user who started a long command stop it
+    def __init__(self, on_cancel, user, message):
+        super().__init__(timeout=None)
+        self.on_cancel = on_cancel
+        self.user = user
+        self.message = message
+
+    async def interaction_check(self, interaction: discord.Interaction):
+        return interaction.user.id == self.user.id
+
+    @discord.ui.button(label="Cancel", style=discord.ButtonStyle.red)
+    async def cancel(self, interaction: discord.Interaction, button: discord.ui.Button):
+        self.on_cancel()
+        button.disabled = True
+        await interaction.response.edit_message(content=self.message, view=self)
+
+
+def message_id(value):
+    # Accepts a message ID or a message link
+    try:
+        return discord.Object(id=int(value.rstrip("/").rsplit("/", 1)[-1]))
+    except ValueError:
+        return None
+
+
+@client.tree.command(
+    name="purge",
+    description="Clears messages",
+)
+@discord.app_commands.describe(
+    amount="How many matching messages to delete",
+    user="Only messages from this member",
+    contains="Only messages matching this regex",
+    attachments="Only messages with (or without) attachments",
+    bots="Only messages from bots (or from people)",
+    before="Only messages before this message (ID or link)",
+    after="Only messages after this message (ID or link)",
+)
+@discord.app_commands.checks.has_permissions(administrator=True)
+async def purge(
+    interaction: discord.Interaction,
+    amount: int,
+    user: Optional[discord.Member] = None,
+    contains: Optional[str] = None,
+    attachments: Optional[bool] = None,
+    bots: Optional[bool] = None,
+    before: Optional[str] = None,
+    after: Optional[str] = None,
+):
+    try:
+        check = message_filter(author=user, pattern=contains, attachments=attachments, bots=bots)
+    except re.error as e:
+        await interaction.response.send_message(f"Invalid regex: {e}", ephemeral=True)
+        return
+    before_msg = message_id(before) if before else None
+    after_msg = message_id(after) if after else None
+    if (before and before_msg is None) or (after and after_msg is None):
+        await interaction.response.send_message("before/after must be a message ID or link.", ephemeral=True)
+        return
+
+    await interaction.response.defer()
+    # The deferred response is a message in this channel too, and it shows the progress
+    response = await interaction.original_response()
+    job = Purge(interaction.channel, amount, check=check, before=before_msg, after=after_msg, skip=[response.id])
+    view = CancelView(job.cancel, interaction.user, "Cancelling purge...")
+
+    async def progress(job):
+        try:
+            await interaction.edit_original_response(
+                content=f"Purging... {job.deleted} deleted, {job.scanned} scanned ({job.rate:.0f} msg/s)", view=view)
+        except discord.HTTPException:
+            pass
+
+    await progress(job)
+    await job.run(progress)
+    view.stop()
+
+    summary = f"Purged {job.deleted} messages"
+    if job.cancelled:
+        summary += " (cancelled)"
+    if job.failed:
+        summary += f", {job.failed} couldn't be deleted"
+    try:
+        await interaction.delete_original_response()
+    except discord.HTTPException:
+        # The interaction token expires after 15 minutes, long purges outlive it
+        pass
+    await interaction.channel.send(summary, delete_after=4)
+
+# ------------------ /bulkrole and /bulkremove commands ----------------------------
+
+# Interaction tokens last 15 minutes; after that the summary goes to the channel
+BULK_FOLLOWUP_SECONDS = 14 * 60
+# A member ID is ~20 bytes a line, so this is plenty for any guild
+BULK_CSV_MAX_BYTES = 1024 * 1024
+# Runs whose command is still showing their progress
+bulk_role_watchers = set()
+
+
+def bulk_role_summary(action, role_name, progress):
+    verb = "Added" if action == "add" else "Removed"
+    preposition = "to" if action == "add" else "from"
+    summary = f"{verb} {role_name} {preposition} {progress.done} members, {progress.skipped} skipped"
+    if progress.failed:
+        summary += f", {progress.failed} failed"
+    if progress.state == "cancelled":
+        summary += " (cancelled)"
+    return summary
+
+
+async def bulk_roles_job(payload):
+    run_id = payload["run_id"]
+    result = await bulkroles.BulkRoles(client, run_id).run()
+    if run_id in bulk_role_watchers:
+        return
+    # Nobody is watching (restarted, or the interaction expired)
+    run = bulkroles.get_run(run_id)
+    channel = client.get_channel(run["channel_id"])
+    guild = client.get_guild(run["guild_id"])
+    role = guild.get_role(run["role_id"]) if guild else None
+    if channel is not None:
+        name = role.name if role else "the role"
+        await channel.send(f"Bulk role run #{run_id}: " + bulk_role_summary(run["action"], name, result))
+
+
+# One run at a time, they all share the role-edit rate limit
+client.jobs.register("bulk_roles", bulk_roles_job, route="bulk_roles", limit=1)
+
+
+def join_date(value):
+    return datetime.date.fromisoformat(value) if value else None
+
+
+async def bulk_roles(interaction, action, role, has_role, joined_after, joined_before, ids, csv):
+    if not any((has_role, joined_after, joined_before, ids, csv)):
+        await interaction.response.send_message(
+            "Pick who to target: has_role, joined_after/joined_before, ids or a csv.", ephemeral=True)
+        return
+    try:
+        after, before = join_date(joined_after), join_date(joined_before)
+    except ValueError:
+        await interaction.response.send_message("Join dates must look like 2025-01-31.", ephemeral=True)
+        return
+    if not role.is_assignable():
+        await interaction.response.send_message(
+            f"I can't manage {role.name}: it's managed by an integration or above my highest role.", ephemeral=True)
+        return
+    if (has_role or after or before) and not interaction.client.intents.members:
+        await interaction.response.send_message(
+            "has_role and join date filters need the members intent (MEMORY_PROFILE=full or low). "
+            "Use ids or a csv instead.", ephemeral=True)
+        return
+    if csv is not None and csv.size > BULK_CSV_MAX_BYTES:
+        await interaction.response.send_message(
+            f"The csv is too big ({csv.size // 1024} KiB), the limit is {BULK_CSV_MAX_BYTES // 1024} KiB.",
+            ephemeral=True)
+        return
+
+    await interaction.response.defer()
+    member_ids = parse_member_ids(ids or "")
+    if csv is not None:
+        member_ids += parse_member_ids((await csv.read()).decode("utf-8", errors="replace"))
+        member_ids = list(dict.fromkeys(member_ids))
+    if has_role or after or before:
+        listed = set(member_ids)
+        members = [
+            member for member in await guild_members(interaction.guild)
+            if (not listed or member.id in listed)
+            and (has_role is None or member.get_role(has_role.id) is not None)
+            and (after is None or (member.joined_at and member.joined_at.date() >= after))
+            and (before is None or (member.joined_at and member.joined_at.date() <= before))
+        ]
+        member_ids = [member.id for member in members]
+    if not member_ids:
+        await interaction.followup.send("No members match.")
+        return
+
+    run_id = bulkroles.create_run(interaction.guild.id, interaction.channel.id, role.id, action, member_ids)
+    bulk_role_watchers.add(run_id)
+    client.jobs.enqueue("bulk_roles", {"run_id": run_id})
+    view = CancelView(lambda: bulkroles.cancel(run_id), interaction.user, "Cancelling...")
+    verb = "Adding" if action == "add" else "Removing"
+    deadline = time.monotonic() + BULK_FOLLOWUP_SECONDS
+
+    try:
+        while (progress := bulkroles.progress(run_id)).state == "running" and time.monotonic() < deadline:
+            try:
+                await interaction.edit_original_response(
+                    content=f"{verb} {role.name}... {progress.handled}/{progress.total} "
+                            f"({progress.done} changed, {progress.skipped} skipped, {progress.failed} failed, "
+                            f"{progress.rate:.0f} members/s)",
+                    view=view)
+            except discord.HTTPException:
+                pass
+            await asyncio.sleep(bulkroles.PROGRESS_INTERVAL)
+    finally:
+        # No await between this and reading the state, so exactly one of us
+        # and the job posts the summary
+        bulk_role_watchers.discard(run_id)
+    view.stop()
+    progress = bulkroles.progress(run_id)
+    if progress.state == "running":
+        content = f"Bulk role run #{run_id} is still going, the summary will be posted here."
+    else:
+        content = bulk_role_summary(action, role.name, progress)
+    try:
+        await interaction.edit_original_response(content=content, view=None)
+    except discord.HTTPException:
+        pass
+
+
+BULK_ROLE_PARAMETERS = dict(
+    has_role="Members who have this role",
+    joined_after="Members who joined on or after this date (YYYY-MM-DD)",
+    joined_before="Members who joined on or before this date (YYYY-MM-DD)",
+    ids="Member IDs or mentions, separated by anything",
+    csv="A CSV (or any text file) with member IDs",
+)
+
+
+@client.tree.command(
+    name="bulkrole",
+    description="Adds a role to many members.",
+)
+@discord.app_commands.describe(**BULK_ROLE_PARAMETERS)
+@discord.app_commands.checks.has_permissions(administrator=True)
+async def bulkAddRole(
+    interaction: discord.Interaction,
+    role: discord.Role,
+    has_role: Optional[discord.Role] = None,
+    joined_after: Optional[str] = None,
+    joined_before: Optional[str] = None,
+    ids: Optional[str] = None,
+    csv: Optional[discord.Attachment] = None,
+):
+    await bulk_roles(interaction, "add", role, has_role, joined_after, joined_before, ids, csv)
+
+
+@client.tree.command(
+    name="bulkremove",
+    description="Removes a role from many members.",
+)
+@discord.app_commands.describe(**BULK_ROLE_PARAMETERS)
+@discord.app_commands.checks.has_permissions(administrator=True)
+async def bulkRemoveRole(
+    interaction: discord.Interaction,
+    role: discord.Role,
+    has_role: Optional[discord.Role] = None,
+    joined_after: Optional[str] = None,
+    joined_before: Optional[str] = None,
+    ids: Optional[str] = None,
+    csv: Optional[discord.Attachment] = None,
+):
+    await bulk_roles(interaction, "remove", role, has_role, joined_after, joined_before, ids, csv)
+
+# ---------------- Run bot + web ----------------
+
+async def main():
+    async with client:
+        startup["start"] = time.perf_counter()
+        await load_cogs()
+        startup["cogs"] = time.perf_counter()
+        client.jobs.start()
+        client.cooldowns.start_flushing()
+        client.ticket_log.start_flushing()
+        metrics.watch_rate_limits()
+        loop_lag = asyncio.create_task(metrics.watch_loop_lag())
+        runner = None
+        if WEB_SERVER == "aiohttp":
+            runner = await start_web_server("0.0.0.0", PORT)
+        try:
+            startup["connect"] = time.perf_counter()
+            await client.start(TOKEN)
+        finally:
+            loop_lag.cancel()
+            await client.cooldowns.close()
+            await client.ticket_log.close()
+            await client.assets.close()
+            await asyncio.to_thread(shutdown_render_pool)
+            if runner is not None:
+                await runner.cleanup()
+
+def run():
+    if WEB_SERVER == "flask":
+        # daemon, so /shutdown actually ends the process
+        Thread(target=run_web, daemon=True).start()
+    asyncio.run(main())
\ No newline at end of file
@@ -0,0 +1,200 @@
+import discord
+from discord.ext import commands, tasks
+import asyncio
+import datetime
+import os
+from typing import NamedTuple
+from utils import memory
+from utils.jobs import is_retryable
+from utils.members import guild_members
+
+# ---------------- VIP+ for boosters ----------------
+#
+# Members who boost the server get VIP+, and lose it when they stop. Member
+# updates only matter when the boost changed, everything else is dropped
+# before any lookup. A periodic pass diffs boosters against VIP+ holders to
+# catch whatever happened while the bot was offline. Changes go through the
+# job queue in batches, one batch at a time with a pause between edits, and
+# each member is checked again right before their roles are edited.
+#
+# Discord doesn't say how many boosts a member has, only since when they
+# boost, so the old "2+ boosts" rule can't be checked. Who qualifies is set
+# here instead: boosting for at least VIP_MIN_BOOST_DAYS days. VIP+ is only
+# taken away from holders who don't qualify with VIP_REMOVE_ON_UNBOOST=1, so
+# by default roles given by hand are left alone, like the bot always did.
+#
+# Listing members and member updates need the members intent, which the
+# default memory profile doesn't ask for; without it the cog does nothing.
+#
+# Under MEMORY_PROFILE=low the reconcile is the expensive part: there is no
+# member cache to diff, so every pass chunks the whole guild. For 100k
+# members that takes the process from about 1 MB to over 100 MB RSS, and the
+# allocator keeps most of it after the list is dropped. Member updates also
+# only reach the bot for cached members there, so boosts are picked up late.
+# The pass runs once a day by default under low instead of hourly; set
+# VIP_RECONCILE_MINUTES to trade memory for how quickly VIP+ follows a boost,
+# or run with MEMORY_PROFILE=full where updates arrive as they happen.
+
+VIP_ROLE_NAME = os.getenv("VIP_ROLE_NAME", "VIP+")
+VIP_MIN_BOOST_DAYS = float(os.getenv("VIP_MIN_BOOST_DAYS", 0))
+VIP_REMOVE_ON_UNBOOST = os.getenv("VIP_REMOVE_ON_UNBOOST", "0") == "1"
+VIP_RECONCILE_MINUTES = float(os.getenv(
+    "VIP_RECONCILE_MINUTES", 24 * 60 if memory.get_profile().member_cache == "none" else 60
+))
+# Role edits per job, and seconds between two of them
+VIP_BATCH_SIZE = 25
+VIP_EDIT_INTERVAL = float(os.getenv("VIP_EDIT_INTERVAL", 0.5))
+# Members listed by name in the dry-run report
+REPORT_NAMES = 20
+
+
+def is_booster(member):
+    if member.premium_since is None:
+        return False
+    return discord.utils.utcnow() - member.premium_since >= datetime.timedelta(days=VIP_MIN_BOOST_DAYS)
+
+
+def describe_rule():
+    rule = "boosting" if not VIP_MIN_BOOST_DAYS else f"boosting for {VIP_MIN_BOOST_DAYS:g}+ days"
+    if VIP_REMOVE_ON_UNBOOST:
+        return f"{VIP_ROLE_NAME} for members {rule}, removed from everyone else"
+    return f"{VIP_ROLE_NAME} for members {rule}, never removed"
+
+
+class VipPlan(NamedTuple):
+    add: list
+    remove: list
+
+
+async def plan_vip(guild, role):
+    add, remove = [], []
+    for member in await guild_members(guild):
+        if member.bot:
+            continue
+        has_role = role in member.roles
+        if is_booster(member) and not has_role:
+            add.append(member)
+        elif VIP_REMOVE_ON_UNBOOST and not is_booster(member) and has_role:
+            remove.append(member)
+    return VipPlan(add, remove)
+
+
+def report(plan):
+    def names(members):
+        listed = ", ".join(member.mention for member in members[:REPORT_NAMES])
+        more = len(members) - REPORT_NAMES
+        return listed + (f" and {more} more" if more > 0 else "")
+
+    lines = [f"Rule: {describe_rule()}.",
+             f"**{VIP_ROLE_NAME}** would be added to {len(plan.add)} and removed from {len(plan.remove)} members."]
+    if plan.add:
+        lines.append(f"Add: {names(plan.add)}")
+    if plan.remove:
+        lines.append(f"Remove: {names(plan.remove)}")
+    return "\n".join(lines)
+
+
+class Boosters(commands.Cog):
+    def __init__(self, client):
+        self.client = client
+        # One batch at a time keeps role edits well under the rate limit
+        client.jobs.register("sync_vip", self.sync_vip_job, route="member_roles", limit=1)
+        if not client.intents.members:
+            print("VIP sync disabled: the members intent is off (MEMORY_PROFILE=full or low turns it on)")
+            return
+        print(f"VIP sync: {describe_rule()}")
+        self.reconcile_vip.change_interval(minutes=VIP_RECONCILE_MINUTES)
+        self.reconcile_vip.start()
+
+    def cog_unload(self):
+        self.reconcile_vip.cancel()
+
+    def queue(self, guild, member_ids):
+        member_ids = list(member_ids)
+        for start in range(0, len(member_ids), VIP_BATCH_SIZE):
+            self.client.jobs.enqueue("sync_vip", {"guild_id": guild.id, "member_ids": member_ids[start:start + VIP_BATCH_SIZE]})
+
+    async def sync_vip_job(self, payload):
+        guild = self.client.get_guild(payload["guild_id"])
+        if guild is None:
+            return
+        role = self.client.names.role(guild, VIP_ROLE_NAME)
+        if role is None:
+            print(f"Role '{VIP_ROLE_NAME}' doesn't exist in {guild.name}, skipping VIP sync.")
+            return
+        edited = False
+        for member_id in payload["member_ids"]:
+            try:
+                edited = await self.sync_member(guild, role, member_id, edited) or edited
+            except discord.NotFound:
+                continue
+            except discord.HTTPException as e:
+                # Rate limits and outages retry the whole batch later, members
+                # already done are skipped by the check. Anything else (e.g.
+                # VIP+ above the bot's role) only skips this member.
+                if is_retryable(e):
+                    raise
+                print(f"VIP sync failed for member {member_id} in {guild.name}: {e}")
+
+    async def sync_member(self, guild, role, member_id, edited):
+        # Returns whether the member's roles were edited
+        member = guild.get_member(member_id)
+        if member is None:
+            member = await guild.fetch_member(member_id)
+        has_role = role in member.roles
+        if is_booster(member) == has_role or (has_role and not VIP_REMOVE_ON_UNBOOST):
+            return False
+        if edited:
+            await asyncio.sleep(VIP_EDIT_INTERVAL)
+        if has_role:
+            await member.remove_roles(role, reason="No longer boosting")
+        else:
+            await member.add_roles(role, reason="Boosting the server")
+        return True
+
+    @commands.Cog.listener()
+    async def on_member_update(self, before, after):
+        if before.premium_since == after.premium_since:
+            return
+        self.queue(after.guild, [after.id])
+
+    @tasks.loop(minutes=60)
+    async def reconcile_vip(self):
+        for guild in self.client.guilds:
+            role = self.client.names.role(guild, VIP_ROLE_NAME)
+            if role is None:
+                continue
+            try:
+                plan = await plan_vip(guild, role)
+            except (discord.HTTPException, discord.ClientException) as e:
+                print(f"VIP reconcile failed for {guild.name}: {e}")
+                continue
+            if plan.add or plan.remove:
+                print(f"VIP reconcile ({guild.name}): adding {len(plan.add)}, removing {len(plan.remove)}")
+                self.queue(guild, [member.id for member in plan.add + plan.remove])
+
+    @reconcile_vip.before_loop
+    async def before_reconcile_vip(self):
+        await self.client.wait_until_ready()
+
+    @commands.has_permissions(administrator=True)
+    @commands.command(aliases=["vipsync"])
+    async def vip_sync(self, ctx, mode: str = ""):
+        # !vipsync shows what would change, !vipsync apply queues it
+        if not self.client.intents.members:
+            await ctx.send("VIP sync needs the members intent, run the bot with MEMORY_PROFILE=full or low.")
+            return
+        role = self.client.names.role(ctx.guild, VIP_ROLE_NAME)
+        if role is None:
+            await ctx.send(f"Role '{VIP_ROLE_NAME}' doesn't exist!")
+            return
+        plan = await plan_vip(ctx.guild, role)
+        if mode != "apply":
+            await ctx.send(report(plan), allowed_mentions=discord.AllowedMentions.none())
+            return
+        self.queue(ctx.guild, [member.id for member in plan.add + plan.remove])
+        await ctx.send(f"Queued {len(plan.add)} additions and {len(plan.remove)} removals of {VIP_ROLE_NAME}.")
+
+
+async def setup(client):
+    await client.add_cog(Boosters(client))
@@ -0,0 +1,103 @@
+import discord
+import asyncio
+import datetime
+from discord import app_commands
+from discord.ext import commands
+from typing import Optional
+from utils import search
+from utils.ticketconfig import TICKET_CATEGORIES
+from utils.transcripts import transcript_url
+
+PAGE_SIZE = 5
+# Built from config/tickets.json when the cog loads (Discord allows 25 choices)
+CATEGORY_CHOICES = [app_commands.Choice(name=name, value=name) for name in TICKET_CATEGORIES][:25]
+
+# Search results --------------------------------
+
+def results_embed(query, total, hits, page):
+    pages = max((total + PAGE_SIZE - 1) // PAGE_SIZE, 1)
+    embed = discord.Embed(
+        title=f"Transcript search: {query}",
+        description=f"{total} matching messages" if total else "No transcripts matched your search.",
+        color=discord.Color.blue()
+    )
+    for hit in hits:
+        when = datetime.datetime.fromtimestamp(hit.created_at, tz=datetime.timezone.utc)
+        embed.add_field(
+            name=f"{hit.ticket} · {hit.author}",
+            value=f"{hit.snippet}\n{discord.utils.format_dt(when, 'd')} · [Open transcript]({transcript_url(hit.ticket)})"[:1024],
+            inline=False
+        )
+    embed.set_footer(text=f"Page {page + 1}/{pages}")
+    return embed
+
+
+class SearchResultsView(discord.ui.View):
+    def __init__(self, user, query, category, total):
+        super().__init__(timeout=300)
+        self.user = user
+        self.query = query
+        self.category = category
+        self.total = total
+        self.page = 0
+        self.update_buttons()
+
+    def update_buttons(self):
+        self.previous.disabled = self.page == 0
+        self.next.disabled = (self.page + 1) * PAGE_SIZE >= self.total
+
+    async def interaction_check(self, interaction: discord.Interaction):
+        return interaction.user.id == self.user.id
+
+    async def show_page(self, interaction: discord.Interaction):
+        total, hits = await asyncio.to_thread(
+            search.search, self.query, PAGE_SIZE, self.page * PAGE_SIZE, self.category
+        )
+        self.total = total
+        self.update_buttons()
+        await interaction.response.edit_message(embed=results_embed(self.query, total, hits, self.page), view=self)
+
+    @discord.ui.button(label="◀", style=discord.ButtonStyle.gray)
+    async def previous(self, interaction: discord.Interaction, button: discord.ui.Button):
+        self.page -= 1
+        await self.show_page(interaction)
+
+    @discord.ui.button(label="▶", style=discord.ButtonStyle.gray)
+    async def next(self, interaction: discord.Interaction, button: discord.ui.Button):
+        self.page += 1
+        await self.show_page(interaction)
+
+
+# Search cog ------------------------------------
+
+class Search(commands.Cog):
+    def __init__(self, client):
+        self.client = client
+
+    @app_commands.command(
+        name="search",
+        description="Searches closed ticket transcripts."
+    )
+    @app_commands.choices(category=CATEGORY_CHOICES)
+    @app_commands.checks.has_permissions(administrator=True)
+    async def search_transcripts(
+        self,
+        interaction: discord.Interaction,
+        query: str,
+        category: Optional[str] = None
+    ):
+        await interaction.response.defer(ephemeral=True)
+        total, hits = await asyncio.to_thread(search.search, query, PAGE_SIZE, 0, category)
+        view = SearchResultsView(interaction.user, query, category, total)
+        await interaction.followup.send(embed=results_embed(query, total, hits, 0), view=view, ephemeral=True)
+
+    @commands.has_permissions(administrator=True)
+    @commands.command(aliases=["reindex"])
+    async def reindex_transcripts(self, ctx, mode: str = ""):
+        # !reindex indexes transcripts that aren't indexed yet, !reindex all redoes every one
+        indexed = await asyncio.to_thread(search.backfill, None, mode == "all")
+        await ctx.send(f"Indexed {indexed} transcripts.")
+
+
+async def setup(client):
+    await client.add_cog(Search(client))
@@ -1,12 +1,22 @@
 import discord
 from discord import app_commands
-from discord.ext import commands
+from discord.ext import commands, tasks
 import asyncio
-import io
 import os
-import re
+import tempfile
+import time
 from discord.ui import View, Button
-import urllib.parse
+from typing import NamedTuple
+from utils.markdown import MarkdownRenderer
+from utils.members import MISSING, get_member_safe, recent_members
+from utils.registry import get_registry
+from utils import metrics, search
+from utils.archive import get_archive
+from utils.render import Spool, message_record, render_record, render_transcript
+from utils.singleflight import SingleFlight
+from utils.ticketconfig import TICKET_CATEGORIES, TicketCategoryConfig, channel_prefix
+from utils.timings import StageTimings
+from utils.transcripts import TRANSCRIPT_FOLDER, ticket_key, transcript_url
 
 # Close Button ---------------------------------
 
@@ -26,41 +36,157 @@ class CloseButton(discord.ui.View):
 
 # Buttons --------------------------------------
 
-TRANSCRIPT_FOLDER = os.path.join(os.getcwd(), "thumbnailers/transcripts")
 os.makedirs(TRANSCRIPT_FOLDER, exist_ok=True)
 TRANSCRIPT_CHANNEL_ID = 1419364607918739616
+# Days a closed transcript is kept, 0 keeps them forever
+TRANSCRIPT_RETENTION_DAYS = int(os.getenv("TRANSCRIPT_RETENTION_DAYS", 0))
+
+class AuthorInfo(NamedTuple):
+    display_name: str
+    avatar_url: str
+    role_color: str
+
+def top_role_color(member):
+    top_role = None
+    if member:
+        for role in member.roles:
+            if role.color.value != 0 and role.name != "@everyone" and (top_role is None or role.position > top_role.position):
+                top_role = role
+    return f"#{top_role.color.value:06x}" if top_role else "#dcddde"
+
+class AuthorResolver:
+    # Resolves message authors once per transcript run. Members that left the
+    # server are remembered as None so they never cost a second REST call.
+
+    def __init__(self, guild):
+        self.guild = guild
+        self._members = {}
+        self._authors = {}
+
+    async def prime(self, user_ids):
+        missing = []
+        for user_id in set(user_ids):
+            if user_id in self._members:
+                continue
+            member = recent_members.get(self.guild, user_id)
+            if member is MISSING:
+                missing.append(user_id)
+            else:
+                self._members[user_id] = member
+
+        for start in range(0, len(missing), 100):
+            batch = missing[start:start + 100]
+            try:
+                # Not cached in the guild, only in the LRU, so the memory
+                # profile decides what stays around
+                found = await self.guild.query_members(user_ids=batch, cache=False)
+            except (discord.ClientException, asyncio.TimeoutError):
+                # Lookups by id work without the members intent, but the
+                # gateway can fail to answer in time; fall back to fetching
+                # each uncached author once.
+                for user_id in batch:
+                    self._members[user_id] = await get_member_safe(self.guild, user_id)
+                continue
+            for user_id in batch:
+                self._members[user_id] = None
+            for member in found:
+                self._members[member.id] = member
+            for user_id in batch:
+                recent_members.put(self.guild, user_id, self._members[user_id])
+
+    async def resolve(self, user):
+        author = self._authors.get(user.id)
+        if author is None:
+            if user.id not in self._members:
+                await self.prime([user.id])
+            member = self._members[user.id]
+            author = AuthorInfo(
+                display_name=member.display_name if member else user.name,
+                avatar_url=user.display_avatar.url,
+                role_color=top_role_color(member),
+            )
+            self._authors[user.id] = author
+        return author
+
+def render_message(msg, author, markdown, mirror=None):
+    # With a mirror, asset URLs point at our own copies instead of the CDN.
+    return render_record(message_record(msg, author, markdown, mirror), markdown)
+
+# history = waiting on Discord for messages, collect = authors, mentions and
+# asset URLs into the spool, render = HTML, compression and index rows in a
+# render worker, store = packing into the archive, assets = waiting for
+# mirrored downloads, upload = posting the link
+transcript_timings = StageTimings(histogram=metrics.registry.histogram(
+    "bot_transcript_stage_seconds", "Time spent in each stage of saving a transcript.", ("stage",)))
+
+async def save_ticket_transcript_html(bot, channel: discord.TextChannel):
+    transcript_channel = bot.get_channel(TRANSCRIPT_CHANNEL_ID)
+    if transcript_channel is None:
+        print(f"Transcript channel with ID {TRANSCRIPT_CHANNEL_ID} not found.")
+        return
+
+    # Only what needs the guild or the network happens here; each message
+    # becomes a plain record in the spool, so memory stays flat no matter how
+    # long the ticket is, and the page is rendered off the event loop.
+    authors = AuthorResolver(channel.guild)
+    markdown = MarkdownRenderer(channel.guild, members=recent_members)
+    # The ticket owner and staff are in the channel overwrites, so most authors
+    # can be resolved in one batch before the crawl starts.
+    await authors.prime(target.id for target in channel.overwrites if not isinstance(target, discord.Role))
+
+    mirror = bot.assets.mirror() if bot.assets is not None else None
+    # The ticket log only crawls what it didn't capture live
+    if bot.ticket_log is not None:
+        source = bot.ticket_log.messages(channel)
+    else:
+        source = channel.history(limit=None, oldest_first=True)
+
+    key = ticket_key(channel)
+    archive = get_archive()
+    clock = time.perf_counter
+    spent = {"history": 0.0, "collect": 0.0}
+    fd, spool_path = tempfile.mkstemp(dir=archive.staging_folder, prefix=".", suffix=".spool")
+    os.close(fd)
+    try:
+        with Spool(spool_path) as spool:
+            history = source.__aiter__()
+            while True:
+                started = clock()
+                try:
+                    msg = await history.__anext__()
+                except StopAsyncIteration:
+                    break
+                collected = clock()
+                author = await authors.resolve(msg.author)
+                spool.add(message_record(msg, author, markdown, mirror))
+                spent["history"] += collected - started
+                spent["collect"] += clock() - collected
+            spool.close()
+        for stage, seconds in spent.items():
+            transcript_timings.record(stage, seconds)
+
+        path, _ = await transcript_timings.timed("render", render_transcript(
+            spool_path, key, str(channel), archive.staging_folder, markdown.mentions,
+        ))
+    finally:
+        os.unlink(spool_path)
+
+    await transcript_timings.timed("store", asyncio.to_thread(archive.store, key, path))
+    if mirror is not None:
+        # Downloads ran alongside the crawl; wait for stragglers so the
+        # transcript is complete by the time its link is posted.
+        await transcript_timings.timed("assets", mirror.finish())
+
+    embed = discord.Embed(
+        title="Ticket Closed",
+        description=f"```Ticket: {channel.name}```"
+    )
 
-async def get_member_safe(guild, user_id):
-    member = guild.get_member(user_id)
-    if not member:
-        try:
-            member = await guild.fetch_member(user_id)
-        except discord.NotFound:
-            member = None
-    return member
+    view = View()
+    view.add_item(Button(label="📄 Transcript", url=transcript_url(key)))
 
-def replace_mentions(text, msg):
-    guild = msg.guild
 
-    # Channel mentions <#id>
-    text = re.sub(r"<#(\d+)>", lambda m: f'<span class="channel-mention">#{guild.get_channel(int(m[1])).name if guild.get_channel(int(m[1])) else "deleted-channel"}</span>', text)
-    
-    # User mentions <@id> or <@!id>
-    text = re.sub(r"<@!?(\d+)>", lambda m: f'<span class="mention">@{guild.get_member(int(m[1])).display_name if guild.get_member(int(m[1])) else msg.author.name}</span>', text)
-
-    # Role mentions <@&id>
-    def role_replace(m):
-        role = guild.get_role(int(m[1]))
-        if role:
-            r, g, b = role.color.r, role.color.g, role.color.b
-            bg = f"rgb({int(r*0.25)},{int(g*0.25)},{int(b*0.25)})" if role.color.value else "rgba(255,255,255,0.1)"
-            color = f"#{role.color.value:06x}" if role.color.value else "#ffffff"
-            return f'<span class="role-mention" style="background-color:{bg}; color:{color};">@{role.name}</span>'
-        else:
-            return "@deleted-role"
-    text = re.sub(r"<@&(\d+)>", role_replace, text)
-
-    return text
+    await transcript_timings.timed("upload", transcript_channel.send(embed=embed, view=view))
 
 class Buttons(discord.ui.View):
     def __init__(self, bot):
@@ -78,132 +204,12 @@ class Buttons(discord.ui.View):
         )
         await interaction.followup.send(embed=embed, ephemeral=False)
 
-        cog = self.bot.get_cog("Tickets")
-        if cog and interaction.channel.id in cog.ticket_owners:
-            del cog.ticket_owners[interaction.channel.id]
-
-        async def save_ticket_transcript_html(channel: discord.TextChannel):
-            transcript_channel = self.bot.get_channel(TRANSCRIPT_CHANNEL_ID)
-            if transcript_channel is None:
-                print(f"Transcript channel with ID {TRANSCRIPT_CHANNEL_ID} not found.")
-                return
-
-            os.makedirs("thumbnailers/transcripts", exist_ok=True)
-            file_path = os.path.join("thumbnailers/transcripts", f"{channel.name}.html")
-
-            html = f"""<!DOCTYPE html>
-<html lang="en">
-<head>
-<meta charset="UTF-8">
-<title>Transcript - {channel}</title>
-<style>
-body {{ font-family: "gg sans", Arial, sans-serif; background: #2c2f33; color: #dcddde; margin: 4px; padding: 0; }}
-.header {{ background-color: #36393f; color: #fff; font-size: 20px; font-weight: bold; padding: 12px; box-shadow: 0 2px 5px rgba(0,0,0,0.3); }}
-.messages {{ margin: 0; padding: 10px; max-width: 600px; }}
-.message {{ display: flex; margin-bottom: 10px; width: 100%; }}
-.avatar {{ width: 40px; height: 40px; border-radius: 50%; margin-right: 10px; flex-shrink: 0; }}
-.message-content {{ display: flex; flex-direction: column; max-width: 100%; }}
-.author {{ font-weight: bold; }}
-.time {{ font-size: 0.75em; color: #72767d; margin-left: 12px; }}
-.content {{ margin-top: 2px; white-space: pre-wrap; }}
-.embed {{ border-left: 4px solid #4f545c; background: #2f3136; padding: 8px; border-radius: 4px; max-width: 480px; }}
-.attachment {{ margin-top: 5px; margin-left: 50px; }}
-.attachment img, .embed img {{ max-width: 300px; max-height: 300px; display: block; margin-top:5px; border-radius:4px; }}
-.mention, .role-mention, .channel-mention {{ border-radius: 4px; padding: 2px 2px; font-size: 0.95em; font-weight: 500; white-space: nowrap; }}
-.mention {{ background-color: rgba(88, 101, 242, 0.3); color: #A5B5F9; }}
-.role-mention {{ background-color: rgba(255, 255, 255, 0.1); color: inherit; }}
-.channel-mention {{ background-color: rgba(88, 101, 242, 0.3); color: #A5B5F9; }}
-a {{ color: #00b0f4; text-decoration: none; }}
-</style>
-</head>
-<body>
-<div class="header"># {channel}</div>
-<div class="messages">
-"""
-
-            async for msg in channel.history(limit=None, oldest_first=True):
-                is_bot = "bot" if getattr(msg.author, "bot", False) else ""
-                html += f'<div class="message">'
-                html += f'<img src="{msg.author.display_avatar.url}" class="avatar">'
-                html += f'<div class="message-content">'
-
-                member = await get_member_safe(channel.guild, msg.author.id)
-                role_color = "#dcddde"
-
-                if member:
-                    colored_roles = [r for r in member.roles if r.name != "@everyone" and r.color.value != 0]
-                    if colored_roles:
-                        top_role = max(colored_roles, key=lambda r: r.position)
-                        role_color = f"#{top_role.color.value:06x}"
-
-                display_name = member.display_name if member else msg.author.name
-                user_display = f'<span class="author {is_bot}" style="color:{role_color}">{display_name}</span>'
-                time_str = msg.created_at.strftime("%d. %m. %Y %I:%M %p")
-                time_html = f'<span class="time">{time_str}</span>'
-                html += f'<div style="display:flex;align-items:center;">{user_display}{time_html}</div>'
-
-                if msg.content:
-                    content_html = replace_mentions(msg.content, msg)
-                    content_html = content_html.replace("**", "<b>").replace("*", "<i>").replace("__", "<u>")
-                    html += f'<div class="content">{content_html}</div>'
-
-                # --- embeds ---
-                for embed in msg.embeds:
-                    embed_color = f"#{embed.color.value:06x}" if embed.color else "#4f545c"
-                    html += f'<div class="embed" style="border-left:4px solid {embed_color}; background:#2f3136; padding:10px; margin-top:8px; border-radius:4px; max-width:520px;">'
-                    if embed.title:
-                        html += f'<div style="font-weight:600; font-size:16px; margin-bottom:4px;">{embed.title}</div>'
-                    if embed.description:
-                        desc_html = replace_mentions(embed.description, msg)
-                        html += f'<div style="font-size:14px; white-space:pre-wrap; margin-bottom:6px;">{desc_html}</div>'
-                    for field in embed.fields:
-                        field_html = replace_mentions(field.value, msg)
-                        html += f'<div style="margin-top:4px;">'
-                        html += f'<div style="font-weight:600; font-size:14px; margin-bottom:2px;">{field.name}</div>'
-                        html += f'<div style="font-size:14px; white-space:pre-wrap;">{field_html}</div>'
-                        html += '</div>'
-                    if embed.image and embed.image.url:
-                        html += f'<img src="{embed.image.url}" style="max-width:100%; margin-top:6px;">'
-                    if embed.thumbnail and embed.thumbnail.url:
-                        html += f'<img src="{embed.thumbnail.url}" style="max-width:80px; max-height:80px; margin-top:6px;">'
-                    html += '</div>'
-
-                # --- attachments preview ---
-                for attachment in msg.attachments:
-                    if attachment.content_type and attachment.content_type.startswith("image/"):
-                        html += f'<div class="attachment"><a href="{attachment.url}">{attachment.filename}</a><br><img src="{attachment.url}" style="max-width:400px; max-height:400px; margin-top:6px;"></div>'
-                    else:
-                        html += f'<div class="attachment"><a href="{attachment.url}">{attachment.filename}</a></div>'
-
-                html += '</div></div>'
-
-            html += """</div></body></html>"""
-
-            with open(file_path, "w", encoding="utf-8") as f:
-                f.write(html)
-
-            embed = discord.Embed(
-                title="Ticket Closed",
-                description=f"```Ticket: {channel.name}```"
-            )
-
-            safe_name = urllib.parse.quote(channel.name)
-            url = f"https://dscbot.onrender.com/transcripts/{safe_name}.html"
-            view = View()
-            view.add_item(Button(label="📄 Transcript", url=url))
-
+        # Frees the owner to open a new ticket in this category right away
+        get_registry().mark_closing(interaction.channel.id)
 
-            await transcript_channel.send(embed=embed, view=view)
-
-        async def delete_channel_later(channel: discord.TextChannel):
-            await asyncio.sleep(2)
-            try:
-                await save_ticket_transcript_html(channel)
-                await channel.delete()
-            except Exception as e:
-                print(f"Failed to delete channel: {e}")
-
-        asyncio.create_task(delete_channel_later(interaction.channel))
+        # Transcript + deletion run as a persisted job, so a restart mid-close
+        # still finishes it.
+        self.bot.jobs.enqueue("close_ticket", {"channel_id": interaction.channel.id}, delay=2)
 
     @discord.ui.button(label="Cancel", style=discord.ButtonStyle.gray, custom_id="cancel_close")
     async def cancel(self, interaction: discord.Interaction, button: discord.ui.Button):
@@ -213,98 +219,89 @@ a {{ color: #00b0f4; text-decoration: none; }}
 
 # Ticket Categories ----------------------------
 
-class TicketCategory(discord.ui.Select):
-    def __init__(self, bot):
-        self.bot = bot
-        options = [
-            discord.SelectOption(label="Partnership", description="Open this only if your server follows our guidelines.", emoji="🎫"),
-            discord.SelectOption(label="Role Request", description="Open this ticket to apply for an artist rankup.", emoji="⭐"),
-            discord.SelectOption(label="Support", description="Open this ticket if you have any general queries.", emoji="📩")
-        ]
-        super().__init__(placeholder="Select a topic", min_values=1, max_values=1, options=options, custom_id="ticket_category_dropdown")
-
-    async def callback(self, interaction: discord.Interaction):
-        await interaction.response.defer(ephemeral=True)
-        await interaction.message.edit(view=TicketDropdownView(self.bot))
-
-        category = self.values[0]
-        user = interaction.user
-
-        categories = {
-            "Partnership": {
-                "title": "Partnership Ticket",
-                "description": "Thanks {user.name} for contacting the partnership team of **Thumbnailers**!\n"
-                               "Send your server's ad, and the ping you're expecting with any other additional details.\n"
-                               "Our team will respond to you shortly.",
-                "ping": [1136118197725171813, 1102975816062730291],
-                "ping_user": True,
-                "discord_category": "Partnership Tickets",
-                "ticket_opened_category": "Partnership ticket"
-            },
-            "Role Request": {
-                "title": "Role Request Ticket",
-                "description": "Thank you for contacting support.\n"
-                               "Please refer to <#1102968475925876876> and make sure you send the amount of thumbnails required for the rank you're applying for, as and when you open the ticket. "
-                               "Make sure you link 5 minecraft based thumbnails at MINIMUM if you apply for one of the artist roles.",
-                "ping": [1156543738861064192],
-                "ping_user": False,
-                "discord_category": "Role Request Tickets",
-                "ticket_opened_category": "Role Request ticket"
-            },
-            "Support": {
-                "title": "Support Ticket",
-                "description": "Thanks {user.name} for contacting the support team of **Thumbnailers**!\n"
-                               "Please explain your case so we can help you as quickly as possible!",
-                "ping": [1102976554759368818, 1102975816062730291],
-                "ping_user": True,
-                "discord_category": "Support Tickets",
-                "ticket_opened_category": "Support ticket"
-            }
-        }
-
-        channel_name = f"{category.lower().replace(' ', '-')}-{user.name}"
-
-        if category != "Support" and discord.utils.get(interaction.guild.channels, name=channel_name):
-            await interaction.followup.send(f"You already have a ticket in {category} category.", ephemeral=True)
-            return
-
-        overwrites = {
-            interaction.guild.default_role: discord.PermissionOverwrite(view_channel=False),
-            user: discord.PermissionOverwrite(view_channel=True, send_messages=True),
-            interaction.guild.me: discord.PermissionOverwrite(view_channel=True, send_messages=True, read_message_history=True)
-        }
-
-        discord_category_name = categories[category]["discord_category"]
-        category_obj = discord.utils.get(interaction.guild.categories, name=discord_category_name)
+CATEGORY_OPTIONS = [
+    discord.SelectOption(label=config.name, description=config.option_description, emoji=config.emoji)
+    for config in TICKET_CATEGORIES.values()
+]
+
+HIDDEN = discord.PermissionOverwrite(view_channel=False)
+OWNER_ACCESS = discord.PermissionOverwrite(view_channel=True, send_messages=True)
+BOT_ACCESS = discord.PermissionOverwrite(view_channel=True, send_messages=True, read_message_history=True)
+
+# Per-stage latency of opening a ticket; stages that run concurrently overlap
+open_timings = StageTimings(histogram=metrics.registry.histogram(
+    "bot_ticket_open_stage_seconds", "Time spent in each stage of opening a ticket.", ("stage",)))
+
+# Opens racing for the same (guild, user, category), e.g. a double click,
+# share one channel creation
+ticket_opens = SingleFlight()
+
+async def create_ticket_channel(bot, guild, user, config: TicketCategoryConfig):
+    # Returns the new channel, or None if the user already has a ticket in a
+    # one-per-user category
+    registry = get_registry()
+    if config.one_per_user and registry.open_tickets(guild.id, user.id, config.name):
+        return None
+
+    overwrites = {guild.default_role: HIDDEN, user: OWNER_ACCESS, guild.me: BOT_ACCESS}
+    category_obj = bot.names.category(guild, config.discord_category)
+    channel = await open_timings.timed("create_channel", guild.create_text_channel(
+        name=f"{channel_prefix(config.name)}{user.name}",
+        overwrites=overwrites,
+        category=category_obj,
+        reason=f"Ticket opened by {user} for {config.name}"
+    ))
+    registry.open(channel, user.id, config.name)
+    if bot.ticket_log is not None:
+        bot.ticket_log.started(channel.id)
+    return channel
+
+async def open_ticket(bot, interaction: discord.Interaction, config: TicketCategoryConfig):
+    started = time.perf_counter()
+    guild = interaction.guild
+    user = interaction.user
+
+    # Resetting the dropdown doesn't depend on anything else
+    reset = asyncio.create_task(open_timings.timed("reset_dropdown", interaction.message.edit(view=TicketDropdownView(bot))))
+    try:
+        channel, leader = await ticket_opens.run(
+            (guild.id, user.id, config.name),
+            lambda: create_ticket_channel(bot, guild, user, config)
+        )
+        if channel is None:
+            await interaction.followup.send(f"You already have a ticket in {config.name} category.", ephemeral=True)
+            return None
 
-        if category_obj is None:
-            channel = await interaction.guild.create_text_channel(
-                name=channel_name,
-                overwrites=overwrites,
-                reason=f"Ticket opened by {user} for {category}"
-            )
-        else:
-            channel = await interaction.guild.create_text_channel(
-                name=channel_name,
-                overwrites=overwrites,
-                category=category_obj,
-                reason=f"Ticket opened by {user} for {category}"
-            )
+        confirmation = interaction.followup.send(f"Your {config.opened_label} has been opened {channel.mention} ✅", ephemeral=True)
+        if not leader:
+            # Joined an open already in flight, the welcome message is the leader's
+            await open_timings.timed("confirmation", confirmation)
+            return channel
 
-        config = categories[category]
         embed = discord.Embed(
-            title=config["title"],
-            description=config["description"].format(user=user),
+            title=config.title,
+            description=config.description.format(user=user),
             color=discord.Color.blue()
         )
+        content = f"{user.mention} {config.ping_roles}" if config.ping_user else config.ping_roles
+        await asyncio.gather(
+            open_timings.timed("welcome_message", channel.send(content=content, embed=embed, view=CloseButton(bot))),
+            open_timings.timed("confirmation", confirmation),
+        )
+        return channel
+    finally:
+        await asyncio.gather(reset, return_exceptions=True)
+        open_timings.record("total", time.perf_counter() - started)
 
-        view = CloseButton(self.bot)
-        ping_roles = " ".join(f"<@&{rid}>" for rid in config["ping"])
 
-        content = f"{user.mention} {ping_roles}" if config.get("ping_user", True) else ping_roles
+class TicketCategory(discord.ui.Select):
+    def __init__(self, bot):
+        self.bot = bot
+        super().__init__(placeholder="Select a topic", min_values=1, max_values=1, options=list(CATEGORY_OPTIONS), custom_id="ticket_category_dropdown")
 
-        await channel.send(content=content, embed=embed, view=view)
-        await interaction.followup.send(f"Your {categories[category]['ticket_opened_category']} has been opened {channel.mention} ✅", ephemeral=True)
+    async def callback(self, interaction: discord.Interaction):
+        await interaction.response.defer(ephemeral=True)
+        await open_ticket(self.bot, interaction, TICKET_CATEGORIES[self.values[0]])
 
 
 # ---------------- Persistent TicketView ----------------
@@ -342,8 +339,7 @@ class CloseTicketView(discord.ui.View):
 # ---------------- Helper Function ----------------
 
 def is_ticket_channel(channel: discord.abc.GuildChannel):
-    ticket_prefixes = ["partnership-", "support-", "role-request-"]
-    return any(channel.name.startswith(prefix) for prefix in ticket_prefixes)
+    return channel.id in get_registry()
 
 
 class TicketDropdownView(discord.ui.View):
@@ -359,11 +355,67 @@ GUILD_ID = 1415013619246039082
 class Tickets(commands.Cog):
     def __init__(self, client):
         self.client = client
-        self.ticket_owners = {}  
+        # Loads every open ticket into memory
+        self.registry = get_registry()
         client.add_view(CloseButton(client))
         client.add_view(Buttons(client))
         client.add_view(TicketDropdownView(client))
         self.client.tree.add_command(self.closerequest, guild=discord.Object(id=GUILD_ID))
+        self.archive_maintenance.start()
+        # Closing may still crawl history for what the ticket log missed, so
+        # only a couple at a time
+        client.jobs.register("close_ticket", self.close_ticket_job, route="channel_history", limit=2)
+
+    def cog_unload(self):
+        self.archive_maintenance.cancel()
+
+    async def close_ticket_job(self, payload):
+        channel = self.client.get_channel(payload["channel_id"])
+        if channel is None:
+            # Already deleted, e.g. the job was retried after the delete went through
+            self.registry.close(payload["channel_id"])
+            await self.client.ticket_log.discard(payload["channel_id"])
+            return
+        await save_ticket_transcript_html(self.client, channel)
+        await channel.delete()
+        self.registry.close(channel.id)
+        await self.client.ticket_log.discard(channel.id)
+
+    @commands.Cog.listener()
+    async def on_ready(self):
+        # Catches tickets deleted or opened while the bot was offline
+        for guild in self.client.guilds:
+            closed, adopted = self.registry.reconcile(guild)
+            if closed or adopted:
+                print(f"Ticket registry ({guild.name}): closed {closed}, adopted {adopted}")
+        pruned = await self.client.ticket_log.prune({ticket.channel_id for ticket in self.registry.tickets()})
+        if pruned:
+            print(f"Ticket log: dropped {pruned} closed tickets")
+
+    @commands.Cog.listener()
+    async def on_guild_channel_delete(self, channel):
+        # Covers Accept & Close and tickets deleted by hand
+        if self.registry.close(channel.id):
+            await self.client.ticket_log.discard(channel.id)
+
+    # Packs loose transcripts into the archive, compacts it and applies retention
+    @tasks.loop(hours=24)
+    async def archive_maintenance(self):
+        archive = get_archive()
+        try:
+            # Index loose transcripts while they are still readable as files
+            await asyncio.to_thread(search.backfill, TRANSCRIPT_FOLDER)
+            # Only what made it into the index leaves the folder, the rest is
+            # tried again next time
+            indexed = await asyncio.to_thread(search.indexed_tickets)
+            imported = await asyncio.to_thread(archive.import_folder, TRANSCRIPT_FOLDER, indexed.__contains__)
+            kept, dropped = await asyncio.to_thread(archive.compact, TRANSCRIPT_RETENTION_DAYS)
+            if TRANSCRIPT_RETENTION_DAYS:
+                await asyncio.to_thread(search.expire, time.time() - TRANSCRIPT_RETENTION_DAYS * 86400)
+        except Exception as e:
+            print(f"Transcript archive maintenance failed: {e}")
+            return
+        print(f"Transcript archive: imported {imported}, kept {kept}, dropped {dropped}")
     
     @commands.has_permissions(administrator=True)
     @commands.command(aliases=["ticket"])
@@ -382,6 +434,20 @@ class Tickets(commands.Cog):
         )
         await ctx.send(embed=embed, view=TicketDropdownView(self.client))
 
+    @commands.has_permissions(administrator=True)
+    @commands.command(aliases=["ticketstats"])
+    async def ticket_stats(self, ctx):
+        # Recent ticket open latency per stage
+        summary = open_timings.summary()
+        if not summary:
+            await ctx.send("No tickets opened since the last restart.")
+            return
+        lines = [
+            f"`{stage:<16}` p50 {p50 * 1000:.0f} ms · p95 {p95 * 1000:.0f} ms · max {worst * 1000:.0f} ms ({samples})"
+            for stage, (samples, p50, p95, worst) in summary.items()
+        ]
+        await ctx.send("\n".join(lines))
+
     # ----------------- /closerequest -----------------
     @app_commands.command(
         name="closerequest",
@@ -0,0 +1,409 @@
+import hashlib
+import mmap
+import os
+import struct
+import threading
+import time
+from typing import NamedTuple
+
+from utils import db
+
+# ---------------- Transcript archive ----------------
+#
+# Closed transcripts are packed into append-only segment files instead of one
+# file per ticket. Blobs are content-addressed, so identical pages (or
+# identical compressed siblings) are stored once.
+#
+# index.bin    fixed-size records sorted by (key hash, encoding), memory-mapped
+#              and binary searched, so a lookup never touches the filesystem
+# journal.bin  records appended since the last compaction, replayed into a
+#              dict on startup
+# segment-NNNNNN.dat  the blobs themselves
+#
+# compact() folds the journal into the sorted index, drops transcripts past
+# their retention and rewrites the live blobs into fresh segments.
+
+ARCHIVE_FOLDER = os.path.join(db.DATA_FOLDER, "archive")
+SEGMENT_SIZE = 64 * 1024 * 1024
+COPY_BLOCK_SIZE = 64 * 1024
+
+# key hash, encoding, segment, offset, length, content digest, closed at
+RECORD = struct.Struct("<16sBIQI16sd")
+SORT_KEY_SIZE = 17
+
+ENCODING_IDS = {None: 0, "gzip": 1, "br": 2}
+SUFFIXES = {None: "", "gzip": ".gz", "br": ".br"}
+
+
+class Record(NamedTuple):
+    key_hash: bytes
+    encoding: int
+    segment: int
+    offset: int
+    length: int
+    digest: bytes
+    closed_at: float
+
+
+class ArchivedTranscript:
+    # A blob in a segment, read through a file descriptor of its own, so a
+    # compaction that swaps the segments meanwhile doesn't affect it. Read it
+    # in blocks (blocks()) or whole (read()); either way close() it after.
+
+    def __init__(self, fd, offset, length, encoding, etag, last_modified):
+        self._fd = fd
+        self.offset = offset
+        self.length = length
+        self.encoding = encoding
+        self.etag = etag
+        self.last_modified = last_modified
+
+    def blocks(self, size=COPY_BLOCK_SIZE):
+        position, end = self.offset, self.offset + self.length
+        while position < end:
+            block = os.pread(self._fd, min(size, end - position), position)
+            if not block:
+                return
+            position += len(block)
+            yield block
+
+    def read(self):
+        return b"".join(self.blocks())
+
+    def close(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+
+def key_hash(key):
+    return hashlib.sha256(key.encode("utf-8")).digest()[:16]
+
+
+class TranscriptArchive:
+    def __init__(self, folder=None):
+        self.folder = folder or ARCHIVE_FOLDER
+        # Transcripts are written here before being packed into a segment.
+        self.staging_folder = os.path.join(self.folder, "staging")
+        os.makedirs(self.staging_folder, exist_ok=True)
+        self._lock = threading.Lock()
+        self._fds = {}
+        self._blobs = None
+        self._index = None
+        self._index_count = 0
+        self._journal = {}
+        self._load()
+
+    # ---------------- loading ----------------
+
+    def _path(self, name):
+        return os.path.join(self.folder, name)
+
+    def _segment_path(self, segment):
+        return self._path(f"segment-{segment:06d}.dat")
+
+    def _segments(self):
+        return sorted(
+            int(name[8:14]) for name in os.listdir(self.folder)
+            if name.startswith("segment-") and name.endswith(".dat")
+        )
+
+    def _load(self):
+        if self._index is not None:
+            self._index.close()
+            self._index = None
+        self._index_count = 0
+        index_path = self._path("index.bin")
+        if os.path.exists(index_path) and os.path.getsize(index_path) >= RECORD.size:
+            with open(index_path, "rb") as f:
+                self._index = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self._index_count = len(self._index) // RECORD.size
+
+        self._journal = {}
+        journal_path = self._path("journal.bin")
+        if os.path.exists(journal_path):
+            with open(journal_path, "rb") as f:
+                data = f.read()
+            # A torn record from a crash mid-append is simply ignored.
+            for start in range(0, len(data) - RECORD.size + 1, RECORD.size):
+                record = Record(*RECORD.unpack_from(data, start))
+                self._journal[(record.key_hash, record.encoding)] = record
+
+        segments = self._segments()
+        self._active_segment = segments[-1] if segments else 1
+        self._blobs = None
+
+    def _indexed(self, position):
+        return Record(*RECORD.unpack_from(self._index, position * RECORD.size))
+
+    def _search_index(self, sort_key):
+        lo, hi = 0, self._index_count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            start = mid * RECORD.size
+            if self._index[start:start + SORT_KEY_SIZE] < sort_key:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < self._index_count:
+            start = lo * RECORD.size
+            if self._index[start:start + SORT_KEY_SIZE] == sort_key:
+                return self._indexed(lo)
+        return None
+
+    def _records(self):
+        # Every live record, journal entries winning over the sorted index.
+        for position in range(self._index_count):
+            record = self._indexed(position)
+            if (record.key_hash, record.encoding) not in self._journal:
+                yield record
+        yield from self._journal.values()
+
+    # ---------------- reading ----------------
+
+    def _open(self, record):
+        # A descriptor for the caller to close; the cached one is only closed
+        # by compaction, a dup survives that.
+        fd = self._fds.get(record.segment)
+        if fd is None:
+            fd = self._fds[record.segment] = os.open(self._segment_path(record.segment), os.O_RDONLY)
+        return os.dup(fd)
+
+    def _lookup(self, hashed, encoding):
+        encoding_id = ENCODING_IDS[encoding]
+        record = self._journal.get((hashed, encoding_id))
+        if record is None and self._index is not None:
+            record = self._search_index(hashed + bytes([encoding_id]))
+        return record
+
+    def find(self, key, accepted=()):
+        # Best representation the client accepts, or None if the key is
+        # unknown. Nothing is read yet, the blob is streamed by the caller.
+        hashed = key_hash(key)
+        with self._lock:
+            for encoding in ("br", "gzip", None):
+                if encoding is not None and encoding not in accepted:
+                    continue
+                record = self._lookup(hashed, encoding)
+                if record is not None:
+                    return ArchivedTranscript(
+                        self._open(record), record.offset, record.length,
+                        encoding, f'"{record.digest.hex()}"', record.closed_at,
+                    )
+        return None
+
+    def __contains__(self, key):
+        with self._lock:
+            return self._lookup(key_hash(key), None) is not None
+
+    # ---------------- writing ----------------
+
+    def _blob_locations(self):
+        # Only needed when storing, so it is built on the first store.
+        if self._blobs is None:
+            self._blobs = {record.digest: (record.segment, record.offset, record.length) for record in self._records()}
+        return self._blobs
+
+    def _append_blob(self, path):
+        # Hashes the file first and only copies it if the content is new. Both
+        # passes stream, so large transcripts are never held in memory.
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(COPY_BLOCK_SIZE), b""):
+                digest.update(block)
+        digest = digest.digest()[:16]
+        length = os.path.getsize(path)
+
+        location = self._blob_locations().get(digest)
+        if location is None:
+            segment_path = self._segment_path(self._active_segment)
+            if os.path.exists(segment_path) and os.path.getsize(segment_path) + length > SEGMENT_SIZE:
+                self._active_segment += 1
+                segment_path = self._segment_path(self._active_segment)
+            with open(path, "rb") as src, open(segment_path, "ab") as out:
+                offset = out.tell()
+                for block in iter(lambda: src.read(COPY_BLOCK_SIZE), b""):
+                    out.write(block)
+                out.flush()
+                os.fsync(out.fileno())
+            location = (self._active_segment, offset, length)
+            self._blobs[digest] = location
+        return digest, location
+
+    def store(self, key, html_path, closed_at=None, remove=True):
+        # Packs a finished transcript and its .gz/.br siblings into the archive.
+        closed_at = closed_at or time.time()
+        hashed = key_hash(key)
+        records = []
+        with self._lock:
+            for encoding, suffix in SUFFIXES.items():
+                path = html_path + suffix
+                if not os.path.exists(path):
+                    continue
+                digest, (segment, offset, length) = self._append_blob(path)
+                records.append(Record(hashed, ENCODING_IDS[encoding], segment, offset, length, digest, closed_at))
+
+            with open(self._path("journal.bin"), "ab") as f:
+                f.write(b"".join(RECORD.pack(*record) for record in records))
+                f.flush()
+                os.fsync(f.fileno())
+            for record in records:
+                self._journal[(record.key_hash, record.encoding)] = record
+
+        if remove:
+            for encoding, suffix in SUFFIXES.items():
+                if os.path.exists(html_path + suffix):
+                    os.unlink(html_path + suffix)
+        return len(records)
+
+    def import_folder(self, folder, ready=None):
+        # Moves loose <name>.html transcripts (from before the archive existed)
+        # into the archive under their file name. Names ready() turns down
+        # stay where they are.
+        imported = 0
+        for file_name in sorted(os.listdir(folder)):
+            if not file_name.endswith(".html") or file_name.startswith("."):
+                continue
+            if ready is not None and not ready(file_name[:-5]):
+                continue
+            path = os.path.join(folder, file_name)
+            self.store(file_name[:-5], path, closed_at=os.path.getmtime(path))
+            imported += 1
+        return imported
+
+    # ---------------- compaction ----------------
+
+    def compact(self, retention_days=0):
+        # Rewrites the archive without expired transcripts or unreferenced
+        # blobs. Returns (transcripts kept, transcripts dropped).
+        #
+        # The copy runs without the lock: segments are append-only and the
+        # old ones stay until the swap, so lookups and stores carry on
+        # meanwhile. The lock is only held to pick up what was stored during
+        # the copy and to swap the index.
+        cutoff = time.time() - retention_days * 86400 if retention_days else None
+        with self._lock:
+            live = list(self._records())
+            snapshot = dict(self._journal)
+        dropped = {r.key_hash for r in live if cutoff is not None and r.closed_at < cutoff}
+        live = [r for r in live if r.key_hash not in dropped]
+
+        writer = _CompactionWriter(self)
+        try:
+            new_records = {(r.key_hash, r.encoding): writer.copy(r) for r in live}
+            with self._lock:
+                # Stored while the copy ran
+                for key, record in self._journal.items():
+                    if snapshot.get(key) != record:
+                        new_records[key] = writer.copy(record)
+                writer.close()
+
+                old_segments = self._segments()
+                first = (old_segments[-1] + 1) if old_segments else 1
+                for number in writer.segments:
+                    os.replace(writer.path(number), self._segment_path(first + number))
+                new_records = sorted(
+                    (record._replace(segment=first + record.segment) for record in new_records.values()),
+                    key=lambda r: (r.key_hash, r.encoding),
+                )
+
+                tmp_index = self._path("index.bin.tmp")
+                with open(tmp_index, "wb") as f:
+                    f.write(b"".join(RECORD.pack(*record) for record in new_records))
+                    f.flush()
+                    os.fsync(f.fileno())
+
+                for fd in self._fds.values():
+                    os.close(fd)
+                self._fds.clear()
+                if self._index is not None:
+                    self._index.close()
+                    self._index = None
+
+                os.replace(tmp_index, self._path("index.bin"))
+                open(self._path("journal.bin"), "wb").close()
+                for old in old_segments:
+                    os.unlink(self._segment_path(old))
+                self._load()
+        finally:
+            writer.abort()
+
+        kept = len({record.key_hash for record in new_records})
+        return kept, len(dropped)
+
+
+class _CompactionWriter:
+    # Copies blobs into numbered temporary segments, once per digest, with
+    # its own file descriptors so it never shares state with lookups.
+    def __init__(self, archive):
+        self.archive = archive
+        self.segments = []
+        self._copied = {}
+        self._fds = {}
+        self._out = None
+        self._written = 0
+
+    def path(self, number):
+        return self.archive._path(f"compact-{number:06d}.tmp")
+
+    def _read(self, record):
+        fd = self._fds.get(record.segment)
+        if fd is None:
+            fd = self._fds[record.segment] = os.open(self.archive._segment_path(record.segment), os.O_RDONLY)
+        return os.pread(fd, record.length, record.offset)
+
+    def _finish_segment(self):
+        self._out.flush()
+        os.fsync(self._out.fileno())
+        self._out.close()
+        self._out = None
+
+    def copy(self, record):
+        # The record pointing into the new segments; segment numbers are
+        # relative until the swap
+        location = self._copied.get(record.digest)
+        if location is None:
+            data = self._read(record)
+            if self._out is None or self._written + len(data) > SEGMENT_SIZE:
+                if self._out is not None:
+                    self._finish_segment()
+                number = len(self.segments)
+                self.segments.append(number)
+                self._out = open(self.path(number), "wb")
+                self._written = 0
+            location = self._copied[record.digest] = (self.segments[-1], self._written, len(data))
+            self._out.write(data)
+            self._written += len(data)
+        return record._replace(segment=location[0], offset=location[1], length=location[2])
+
+    def close(self):
+        if self._out is not None:
+            self._finish_segment()
+        for fd in self._fds.values():
+            os.close(fd)
+        self._fds.clear()
+
+    def abort(self):
+        # After a failure the temporary segments are dropped, after a swap
+        # there's nothing left to drop
+        self.close()
+        for number in self.segments:
+            if os.path.exists(self.path(number)):
+                os.unlink(self.path(number))
+
+
+_archive = None
+
+
+def get_archive():
+    global _archive
+    if _archive is None:
+        _archive = TranscriptArchive()
+    return _archive
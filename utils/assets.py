@@ -0,0 +1,235 @@
+import asyncio
+import hashlib
+import os
+import re
+import tempfile
+import threading
+import time
+import urllib.parse
+
+import aiohttp
+
+from utils import db
+
+# ---------------- Transcript asset mirror ----------------
+#
+# Avatars, attachments and embed images in transcripts point at Discord's CDN,
+# and those links expire. While a transcript is rendered every referenced
+# asset gets a stable /assets/<key> URL, where the key is derived from the
+# source URL, and is downloaded in the background. The files themselves are
+# stored by content hash, so the same avatar is on disk once no matter how
+# many tickets it appears in.
+
+ASSET_FOLDER = os.path.join(db.DATA_FOLDER, "assets")
+ASSET_URL_PREFIX = "/assets"
+ASSET_CONCURRENCY = int(os.getenv("ASSET_CONCURRENCY", 8))
+ASSET_MAX_BYTES = int(os.getenv("ASSET_MAX_BYTES", 8 * 1024 * 1024))
+CHUNK_SIZE = 64 * 1024
+# Unknown and failed keys are remembered this long, so requests for them
+# don't each hit the database; a fetch that succeeds clears the entry.
+MISS_TTL = 60
+MISS_CACHE_SIZE = 10_000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS assets (
+    key TEXT PRIMARY KEY,
+    url TEXT NOT NULL,
+    digest TEXT,
+    content_type TEXT,
+    size INTEGER,
+    fetched_at REAL NOT NULL
+);
+"""
+
+KEY_RE = re.compile(r"[0-9a-f]{32}(\.[a-z0-9]{1,8})?")
+
+# Only Discord's own CDN is mirrored, anything else linked in a ticket stays
+# a link to where it came from. Mirrored files are served from our origin, so
+# only media types a browser won't run as a page are served as themselves
+# (no SVG, it can carry scripts); everything else is a download.
+MIRRORED_HOSTS = {"cdn.discordapp.com", "media.discordapp.net"}
+DOWNLOAD_CONTENT_TYPE = "application/octet-stream"
+
+
+def is_mirrored(url):
+    parts = urllib.parse.urlsplit(url)
+    return parts.scheme in ("http", "https") and (parts.hostname or "").lower() in MIRRORED_HOSTS
+
+
+def safe_content_type(content_type):
+    content_type = (content_type or "").split(";")[0].strip().lower()
+    if content_type.startswith(("image/", "video/")) and content_type != "image/svg+xml":
+        return content_type
+    return DOWNLOAD_CONTENT_TYPE
+
+
+class AssetTooLarge(Exception):
+    pass
+
+
+def asset_key(url):
+    # Signed CDN query strings change between fetches of the same file, so
+    # on Discord's CDN only host and path identify an asset. Elsewhere the
+    # query can be what picks the file.
+    parts = urllib.parse.urlsplit(url)
+    ext = os.path.splitext(parts.path)[1].lower()
+    if not re.fullmatch(r"\.[a-z0-9]{1,8}", ext):
+        ext = ""
+    source = f"{parts.netloc}{parts.path}"
+    if not is_mirrored(url) and parts.query:
+        source += f"?{parts.query}"
+    return hashlib.sha256(source.encode("utf-8")).hexdigest()[:32] + ext
+
+
+class AssetStore:
+    def __init__(self, folder=None, concurrency=ASSET_CONCURRENCY, max_bytes=ASSET_MAX_BYTES):
+        self.folder = folder or ASSET_FOLDER
+        self.concurrency = concurrency
+        self.max_bytes = max_bytes
+        self._session = None
+        self._known = {}
+        # key -> (expires at, row or None)
+        self._misses = {}
+        # Lookups come from the event loop and the web server's threads
+        self._local = threading.local()
+        conn = db.connect()
+        conn.executescript(SCHEMA)
+        conn.close()
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = db.connect()
+        return conn
+
+    def __len__(self):
+        return len(self._known)
+
+    def blob_path(self, digest):
+        return os.path.join(self.folder, digest[:2], digest)
+
+    def session(self):
+        # One pooled session for every transcript, created on first use so it
+        # belongs to the running loop.
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                timeout=aiohttp.ClientTimeout(total=60),
+                connector=aiohttp.TCPConnector(limit=self.concurrency),
+            )
+        return self._session
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+
+    def lookup(self, key):
+        # (url, digest, content_type) or None. Mirrored assets are cached for
+        # good, unknown and failed ones for MISS_TTL in case a later fetch
+        # succeeds (in another process, say).
+        cached = self._known.get(key)
+        if cached is not None:
+            return cached
+        now = time.monotonic()
+        miss = self._misses.get(key)
+        if miss is not None and miss[0] > now:
+            return miss[1]
+        row = self._connection().execute("SELECT url, digest, content_type FROM assets WHERE key = ?", (key,)).fetchone()
+        found = (row["url"], row["digest"], row["content_type"]) if row is not None else None
+        if found is not None and found[1] is not None:
+            self._known[key] = found
+        else:
+            if len(self._misses) >= MISS_CACHE_SIZE:
+                self._misses = {k: v for k, v in self._misses.items() if v[0] > now}
+                if len(self._misses) >= MISS_CACHE_SIZE:
+                    self._misses = {}
+            self._misses[key] = (now + MISS_TTL, found)
+        return found
+
+    def _record(self, key, url, digest, content_type, size):
+        conn = self._connection()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO assets (key, url, digest, content_type, size, fetched_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (key, url, digest, content_type, size, time.time()),
+            )
+        self._misses.pop(key, None)
+        if digest is not None:
+            self._known[key] = (url, digest, content_type)
+
+    async def fetch(self, key, url):
+        os.makedirs(self.folder, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.folder, prefix=".", suffix=".tmp")
+        digest = hashlib.sha256()
+        size = 0
+        try:
+            with os.fdopen(fd, "wb") as f:
+                async with self.session().get(url) as response:
+                    response.raise_for_status()
+                    if response.content_length and response.content_length > self.max_bytes:
+                        raise AssetTooLarge(url)
+                    async for chunk in response.content.iter_chunked(CHUNK_SIZE):
+                        size += len(chunk)
+                        if size > self.max_bytes:
+                            raise AssetTooLarge(url)
+                        digest.update(chunk)
+                        f.write(chunk)
+                    content_type = safe_content_type(response.content_type)
+        except (aiohttp.ClientError, asyncio.TimeoutError, AssetTooLarge):
+            os.unlink(tmp_path)
+            # Remember the source so the web server can still redirect to it.
+            await asyncio.to_thread(self._record, key, url, None, None, None)
+            return False
+
+        digest = digest.hexdigest()
+        path = self.blob_path(digest)
+        if os.path.exists(path):
+            os.unlink(tmp_path)
+        else:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.chmod(tmp_path, 0o644)
+            os.replace(tmp_path, path)
+        await asyncio.to_thread(self._record, key, url, digest, content_type, size)
+        return True
+
+    def mirror(self):
+        return AssetMirror(self)
+
+
+class AssetMirror:
+    # Scoped to one transcript: hands out local URLs immediately and keeps at
+    # most `concurrency` downloads in flight.
+
+    def __init__(self, store):
+        self.store = store
+        self._semaphore = asyncio.Semaphore(store.concurrency)
+        self._tasks = {}
+
+    def url(self, url):
+        if not url or not is_mirrored(url):
+            return url
+        key = asset_key(url)
+        if key not in self._tasks:
+            found = self.store.lookup(key)
+            self._tasks[key] = None if found and found[1] else asyncio.create_task(self._fetch(key, url))
+        return f"{ASSET_URL_PREFIX}/{key}"
+
+    async def _fetch(self, key, url):
+        async with self._semaphore:
+            return await self.store.fetch(key, url)
+
+    async def finish(self):
+        # Returns (assets referenced, downloaded now, failed).
+        tasks = [task for task in self._tasks.values() if task is not None]
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+        downloaded = sum(1 for result in results if result is True)
+        return len(self._tasks), downloaded, len(results) - downloaded
+
+
+_store = None
+
+
+def get_asset_store():
+    global _store
+    if _store is None:
+        _store = AssetStore()
+    return _store
@@ -0,0 +1,262 @@
+import asyncio
+import os
+import time
+from typing import NamedTuple
+
+import discord
+
+from utils import db
+from utils.jobs import is_retryable
+
+# ---------------- Bulk roles ----------------
+#
+# Adds a role to (or removes it from) a list of members. A run and its
+# targets are stored in SQLite before anything is edited, and each target is
+# marked once it's handled, so a restart carries on with the members that are
+# still pending instead of starting over. Members the cache says are already
+# in the wanted state are skipped without a request. A few workers keep the
+# role-edit bucket busy; discord.py's rate limiter paces them.
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS bulk_role_runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    guild_id INTEGER NOT NULL,
+    channel_id INTEGER NOT NULL,
+    role_id INTEGER NOT NULL,
+    action TEXT NOT NULL,
+    state TEXT NOT NULL DEFAULT 'running',
+    created_at REAL NOT NULL,
+    finished_at REAL
+);
+CREATE TABLE IF NOT EXISTS bulk_role_targets (
+    run_id INTEGER NOT NULL,
+    member_id INTEGER NOT NULL,
+    state TEXT NOT NULL DEFAULT 'pending',
+    PRIMARY KEY (run_id, member_id)
+) WITHOUT ROWID;
+"""
+
+BULK_ROLE_CONCURRENCY = int(os.getenv("BULK_ROLE_CONCURRENCY", 4))
+# Handled targets written back at a time; at most this many are redone after a crash
+FLUSH_SIZE = 50
+# Tries per member on 429/5xx that got past discord.py's own retries
+MAX_TRIES = 3
+RETRY_DELAY = 2.0
+PROGRESS_INTERVAL = 2.0
+
+_conn = None
+
+
+def connection():
+    global _conn
+    if _conn is None:
+        _conn = db.connect()
+        _conn.executescript(SCHEMA)
+    return _conn
+
+
+def create_run(guild_id, channel_id, role_id, action, member_ids):
+    conn = connection()
+    with conn:
+        run_id = conn.execute(
+            "INSERT INTO bulk_role_runs (guild_id, channel_id, role_id, action, created_at) VALUES (?, ?, ?, ?, ?)",
+            (guild_id, channel_id, role_id, action, time.time()),
+        ).lastrowid
+        conn.executemany(
+            "INSERT OR IGNORE INTO bulk_role_targets (run_id, member_id) VALUES (?, ?)",
+            ((run_id, member_id) for member_id in member_ids),
+        )
+    return run_id
+
+
+def get_run(run_id):
+    return connection().execute("SELECT * FROM bulk_role_runs WHERE id = ?", (run_id,)).fetchone()
+
+
+class Progress(NamedTuple):
+    total: int
+    done: int
+    skipped: int
+    failed: int
+    state: str
+    rate: float
+
+    @property
+    def handled(self):
+        return self.done + self.skipped + self.failed
+
+
+# Engines of the runs going on right now, by run id
+_active = {}
+
+
+def progress(run_id):
+    engine = _active.get(run_id)
+    if engine is not None:
+        return engine.progress()
+    run = get_run(run_id)
+    counts = dict(connection().execute(
+        "SELECT state, count(*) FROM bulk_role_targets WHERE run_id = ? GROUP BY state", (run_id,)
+    ).fetchall())
+    return Progress(
+        total=sum(counts.values()),
+        done=counts.get("done", 0),
+        skipped=counts.get("skipped", 0),
+        failed=counts.get("failed", 0),
+        state=run["state"] if run else "missing",
+        rate=0.0,
+    )
+
+
+def cancel(run_id):
+    engine = _active.get(run_id)
+    if engine is not None:
+        engine.cancel()
+        return
+    # Still waiting in the job queue
+    conn = connection()
+    with conn:
+        conn.execute(
+            "UPDATE bulk_role_runs SET state = 'cancelled', finished_at = ? WHERE id = ? AND state = 'running'",
+            (time.time(), run_id),
+        )
+
+
+class BulkRoles:
+    def __init__(self, bot, run_id, concurrency=BULK_ROLE_CONCURRENCY):
+        self.bot = bot
+        self.run_id = run_id
+        self.concurrency = concurrency
+        self.run_row = get_run(run_id)
+        self.add = self.run_row["action"] == "add"
+        self.counts = {"done": 0, "skipped": 0, "failed": 0}
+        self.total = 0
+        self.started = None
+        self.finished = None
+        self._handled_now = 0
+        self._results = []
+        self._cancelled = asyncio.Event()
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    def cancel(self):
+        self._cancelled.set()
+
+    def progress(self):
+        elapsed = (self.finished or time.perf_counter()) - (self.started or time.perf_counter())
+        return Progress(
+            total=self.total,
+            done=self.counts["done"],
+            skipped=self.counts["skipped"],
+            failed=self.counts["failed"],
+            state="cancelled" if self.cancelled else self.run_row["state"],
+            # Members handled by this process, so a resumed run doesn't look faster than it is
+            rate=self._handled_now / elapsed if elapsed > 0 else 0.0,
+        )
+
+    def _load(self):
+        # Counts include whatever a run handled before a restart
+        rows = connection().execute(
+            "SELECT member_id, state FROM bulk_role_targets WHERE run_id = ?", (self.run_id,)
+        ).fetchall()
+        pending = []
+        for member_id, state in rows:
+            if state == "pending":
+                pending.append(member_id)
+            else:
+                self.counts[state] += 1
+        self.total = len(rows)
+        return pending
+
+    def _record(self, member_id, state):
+        self.counts[state] += 1
+        self._handled_now += 1
+        self._results.append((state, self.run_id, member_id))
+        if len(self._results) >= FLUSH_SIZE:
+            self.flush()
+
+    def flush(self):
+        if not self._results:
+            return
+        results, self._results = self._results, []
+        conn = connection()
+        with conn:
+            conn.executemany("UPDATE bulk_role_targets SET state = ? WHERE run_id = ? AND member_id = ?", results)
+
+    def _finish(self, state):
+        self.flush()
+        self.run_row = dict(self.run_row, state=state)
+        conn = connection()
+        with conn:
+            conn.execute(
+                "UPDATE bulk_role_runs SET state = ?, finished_at = ? WHERE id = ?",
+                (state, time.time(), self.run_id),
+            )
+
+    async def _edit(self, guild, role, member_id):
+        member = guild.get_member(member_id)
+        if member is not None and (member.get_role(role.id) is not None) == self.add:
+            return "skipped"
+        edit = self.bot.http.add_role if self.add else self.bot.http.remove_role
+        reason = f"Bulk role run #{self.run_id}"
+        for attempt in range(1, MAX_TRIES + 1):
+            try:
+                await edit(guild.id, member_id, role.id, reason=reason)
+                return "done"
+            except discord.NotFound:
+                # Left the server
+                return "skipped"
+            except discord.HTTPException as e:
+                if not is_retryable(e) or attempt == MAX_TRIES:
+                    print(f"Bulk role run #{self.run_id}: couldn't edit {member_id}: {e}")
+                    return "failed"
+                await asyncio.sleep(RETRY_DELAY * attempt)
+
+    async def _worker(self, guild, role, queue):
+        while not self.cancelled:
+            try:
+                member_id = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            self._record(member_id, await self._edit(guild, role, member_id))
+
+    async def run(self, progress=None):
+        # `progress` is awaited with this engine at most every
+        # PROGRESS_INTERVAL seconds while it runs. Returns the final Progress.
+        if self.run_row["state"] != "running":
+            return self.progress()
+        guild = self.bot.get_guild(self.run_row["guild_id"])
+        role = guild.get_role(self.run_row["role_id"]) if guild else None
+        if role is None:
+            print(f"Bulk role run #{self.run_id}: guild or role is gone, cancelling.")
+            self._finish("cancelled")
+            return self.progress()
+
+        queue = asyncio.Queue()
+        for member_id in self._load():
+            queue.put_nowait(member_id)
+        _active[self.run_id] = self
+        self.started = time.perf_counter()
+        work = asyncio.gather(*(self._worker(guild, role, queue) for _ in range(self.concurrency)))
+        try:
+            while True:
+                try:
+                    await asyncio.wait_for(asyncio.shield(work), PROGRESS_INTERVAL)
+                    break
+                except asyncio.TimeoutError:
+                    self.flush()
+                    if progress is not None:
+                        await progress(self)
+        except BaseException:
+            # Shutting down: keep what's done, the rest stays pending
+            work.cancel()
+            await asyncio.gather(work, return_exceptions=True)
+            self.flush()
+            raise
+        finally:
+            self.finished = time.perf_counter()
+            _active.pop(self.run_id, None)
+        self._finish("cancelled" if self.cancelled else "done")
+        return self.progress()
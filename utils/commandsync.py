@@ -0,0 +1,52 @@
+import hashlib
+import json
+import time
+
+from utils import db
+
+# ---------------- Command tree sync ----------------
+#
+# Syncing the command tree is rate limited and slow, and the tree only
+# changes when the code does. Each scope (global, or one guild) is
+# serialized the same way discord.py sends it, hashed, and only synced when
+# the hash differs from the one stored after its last successful sync.
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS command_sync (
+    scope TEXT PRIMARY KEY,
+    hash TEXT NOT NULL,
+    synced_at REAL NOT NULL
+);
+"""
+
+
+def tree_hash(tree, guild=None):
+    payload = [command.to_dict(tree) for command in tree.get_commands(guild=guild)]
+    payload.sort(key=lambda command: (command.get("type", 1), command["name"]))
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, separators=(",", ":")).encode("utf-8")).hexdigest()
+
+
+async def sync_changed(tree, application_id, guilds=(), force=False):
+    # Syncs the global tree and each of `guilds` whose commands changed.
+    # Returns {scope: number of commands synced, or None if skipped}.
+    conn = db.connect()
+    conn.executescript(SCHEMA)
+    try:
+        results = {}
+        for guild in (None, *guilds):
+            scope = f"{application_id}:{'global' if guild is None else f'guild:{guild.id}'}"
+            digest = tree_hash(tree, guild)
+            row = conn.execute("SELECT hash FROM command_sync WHERE scope = ?", (scope,)).fetchone()
+            if row is not None and row["hash"] == digest and not force:
+                results[scope] = None
+                continue
+            synced = await tree.sync(guild=guild)
+            with conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO command_sync (scope, hash, synced_at) VALUES (?, ?, ?)",
+                    (scope, digest, time.time()),
+                )
+            results[scope] = len(synced)
+        return results
+    finally:
+        conn.close()
@@ -0,0 +1,150 @@
+import asyncio
+import heapq
+import os
+import time
+
+from utils import db
+
+# ---------------- Cooldowns ----------------
+#
+# One place for every per-user cooldown (the WIP/Help/Feedback pings, ...).
+# Active cooldowns live in a dict per scope, so checking one is a single
+# lookup. A heap ordered by expiry drops them again once they run out, so
+# memory follows the users currently on cooldown rather than everyone who
+# ever used a command. Changes are written to SQLite in the background, so a
+# restart doesn't reset a 2-hour cooldown.
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS cooldowns (
+    scope TEXT NOT NULL,
+    user_id INTEGER NOT NULL,
+    expires_at REAL NOT NULL,
+    PRIMARY KEY (scope, user_id)
+) WITHOUT ROWID;
+"""
+
+COOLDOWN_FLUSH_SECONDS = float(os.getenv("COOLDOWN_FLUSH_SECONDS", 30))
+
+
+class CooldownService:
+    def __init__(self, persist=True, flush_interval=COOLDOWN_FLUSH_SECONDS):
+        self.persist = persist
+        self.flush_interval = flush_interval
+        self._scopes = {}
+        self._heap = []
+        self._dirty = {}
+        self._task = None
+        if persist:
+            self._load()
+
+    def _connect(self):
+        conn = db.connect()
+        conn.executescript(SCHEMA)
+        return conn
+
+    def _load(self):
+        conn = self._connect()
+        try:
+            with conn:
+                now = time.time()
+                conn.execute("DELETE FROM cooldowns WHERE expires_at <= ?", (now,))
+                rows = conn.execute("SELECT scope, user_id, expires_at FROM cooldowns").fetchall()
+        finally:
+            conn.close()
+        for scope, user_id, expires_at in rows:
+            self._scopes.setdefault(scope, {})[user_id] = expires_at
+            self._heap.append((expires_at, scope, user_id))
+        heapq.heapify(self._heap)
+
+    def __len__(self):
+        return sum(len(users) for users in self._scopes.values())
+
+    def _evict(self, now):
+        # Heap entries go stale when a cooldown is replaced or cleared; they
+        # are skipped unless they still match what the scope holds.
+        heap = self._heap
+        while heap and heap[0][0] <= now:
+            expires_at, scope, user_id = heapq.heappop(heap)
+            users = self._scopes.get(scope)
+            if users is not None and users.get(user_id) == expires_at:
+                del users[user_id]
+
+    def remaining(self, scope, user_id, now=None):
+        # Seconds left on the cooldown, 0 if the user is free to go.
+        now = time.time() if now is None else now
+        expires_at = self._scopes.get(scope, {}).get(user_id)
+        if expires_at is None or expires_at <= now:
+            return 0
+        return expires_at - now
+
+    def start(self, scope, user_id, seconds, now=None):
+        now = time.time() if now is None else now
+        self._evict(now)
+        expires_at = now + seconds
+        self._scopes.setdefault(scope, {})[user_id] = expires_at
+        heapq.heappush(self._heap, (expires_at, scope, user_id))
+        if self.persist:
+            self._dirty[(scope, user_id)] = expires_at
+
+    def acquire(self, scope, user_id, seconds, now=None):
+        # Check and start in one go. Returns 0 when the cooldown was started,
+        # otherwise the seconds left on the running one.
+        now = time.time() if now is None else now
+        left = self.remaining(scope, user_id, now)
+        if not left:
+            self.start(scope, user_id, seconds, now)
+        return left
+
+    def clear(self, scope, user_id):
+        users = self._scopes.get(scope)
+        if users is not None and users.pop(user_id, None) is not None and self.persist:
+            self._dirty[(scope, user_id)] = 0
+
+    # ---------------- write-behind ----------------
+
+    def flush(self, dirty=None):
+        # The flush loop swaps the dirty set out on the event loop and only
+        # hands the copy to the writer thread.
+        if dirty is None:
+            dirty, self._dirty = self._dirty, {}
+        if not dirty:
+            return 0
+        now = time.time()
+        conn = self._connect()
+        try:
+            with conn:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO cooldowns (scope, user_id, expires_at) VALUES (?, ?, ?)",
+                    [(scope, user_id, expires_at) for (scope, user_id), expires_at in dirty.items() if expires_at > now],
+                )
+                # Cleared cooldowns are marked with 0.
+                conn.executemany(
+                    "DELETE FROM cooldowns WHERE scope = ? AND user_id = ?",
+                    [key for key, expires_at in dirty.items() if not expires_at],
+                )
+                conn.execute("DELETE FROM cooldowns WHERE expires_at <= ?", (now,))
+        finally:
+            conn.close()
+        return len(dirty)
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            self._evict(time.time())
+            dirty, self._dirty = self._dirty, {}
+            try:
+                await asyncio.to_thread(self.flush, dirty)
+            except Exception as e:
+                print(f"Couldn't save cooldowns: {e}")
+
+    def start_flushing(self):
+        if self.persist and self._task is None:
+            self._task = asyncio.create_task(self._flush_loop())
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        if self.persist:
+            self.flush()
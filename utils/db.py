@@ -0,0 +1,20 @@
+import os
+import sqlite3
+
+# ---------------- Local SQLite storage ----------------
+
+DATA_FOLDER = os.path.join(os.getcwd(), "data")
+DB_PATH = os.path.join(DATA_FOLDER, "bot.db")
+
+
+def connect(path=None, check_same_thread=True):
+    # One connection per caller/thread; WAL lets the web server read while the
+    # bot is writing. check_same_thread=False is for a connection that is
+    # handed to worker threads one call at a time (asyncio.to_thread).
+    path = path or DB_PATH
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    conn = sqlite3.connect(path, timeout=10, check_same_thread=check_same_thread)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
@@ -0,0 +1,193 @@
+import asyncio
+import json
+import os
+import random
+import time
+
+import discord
+
+from utils import db, metrics
+
+# ---------------- Background jobs ----------------
+#
+# Work that outlives an interaction (closing a ticket, ...) goes through here
+# instead of a bare asyncio.create_task. Jobs are stored in SQLite before they
+# run, so a restart picks up whatever was pending or in flight.
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    state TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    run_after REAL NOT NULL,
+    created_at REAL NOT NULL,
+    last_error TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_due ON jobs (state, run_after);
+"""
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", 4))
+MAX_ATTEMPTS = 5
+BACKOFF_BASE = 5
+BACKOFF_MAX = 300
+IDLE_POLL = 30
+
+
+job_duration = metrics.registry.histogram(
+    "bot_job_duration_seconds", "Time a background job took, per attempt.", ("kind", "status")
+)
+
+
+def is_retryable(error):
+    return isinstance(error, discord.HTTPException) and (error.status == 429 or error.status >= 500)
+
+
+class JobQueue:
+    def __init__(self, bot, workers=JOB_WORKERS):
+        self.bot = bot
+        self.workers = workers
+        self._handlers = {}
+        # route -> concurrency cap, and how many of its jobs are claimed
+        self._routes = {}
+        self._busy = {}
+        self._running = set()
+        self._tasks = []
+        self._wakeup = asyncio.Event()
+        self._conn = db.connect()
+        self._conn.executescript(SCHEMA)
+
+    def register(self, kind, handler, route="default", limit=None):
+        # Jobs on the same route share one concurrency cap, e.g. everything
+        # that crawls channel history.
+        self._handlers[kind] = (handler, route)
+        if route not in self._routes or limit is not None:
+            self._routes[route] = limit or self.workers
+        self._busy.setdefault(route, 0)
+
+    def enqueue(self, kind, payload, delay=0):
+        now = time.time()
+        with self._conn:
+            cursor = self._conn.execute(
+                "INSERT INTO jobs (kind, payload, run_after, created_at) VALUES (?, ?, ?, ?)",
+                (kind, json.dumps(payload), now + delay, now),
+            )
+        self._wakeup.set()
+        return cursor.lastrowid
+
+    def pending(self):
+        return self._conn.execute("SELECT count(*) FROM jobs WHERE state IN ('pending', 'running')").fetchone()[0]
+
+    def running(self):
+        return len(self._running)
+
+    def start(self):
+        # Anything still marked running was interrupted by a restart.
+        with self._conn:
+            self._conn.execute("UPDATE jobs SET state = 'pending' WHERE state = 'running'")
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    def _kinds(self, available=False):
+        # SQL filter for jobs this process has handlers for; jobs of a kind
+        # whose cog isn't loaded just wait in the table. With available, only
+        # kinds whose route has a free slot.
+        kinds = [
+            kind for kind, (_, route) in self._handlers.items()
+            if not available or self._busy[route] < self._routes[route]
+        ]
+        return ", ".join("?" for _ in kinds), kinds
+
+    def _claim(self):
+        # The select and update run without an await in between, so two
+        # workers on the loop can never claim the same job. Jobs whose route
+        # is full stay pending instead of holding a worker while they wait.
+        placeholders, kinds = self._kinds(available=True)
+        if not kinds:
+            return None, None
+        row = self._conn.execute(
+            f"SELECT * FROM jobs WHERE state = 'pending' AND kind IN ({placeholders}) AND run_after <= ? "
+            "ORDER BY run_after, id LIMIT 1",
+            (*kinds, time.time()),
+        ).fetchone()
+        if row is not None:
+            with self._conn:
+                self._conn.execute("UPDATE jobs SET state = 'running' WHERE id = ?", (row["id"],))
+            self._busy[self._handlers[row["kind"]][1]] += 1
+            return row, None
+        next_due = self._conn.execute(
+            f"SELECT min(run_after) FROM jobs WHERE state = 'pending' AND kind IN ({placeholders})", kinds
+        ).fetchone()[0]
+        return None, next_due
+
+    async def _worker(self):
+        await self.bot.wait_until_ready()
+        while True:
+            job, next_due = self._claim()
+            if job is None:
+                timeout = IDLE_POLL if next_due is None else max(min(next_due - time.time(), IDLE_POLL), 0)
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            self._running.add(job["id"])
+            try:
+                await self._run(job)
+            finally:
+                self._running.discard(job["id"])
+                self._busy[self._handlers[job["kind"]][1]] -= 1
+                # Jobs waiting on this route can be claimed now
+                self._wakeup.set()
+
+    async def _run(self, job):
+        handler, _ = self._handlers[job["kind"]]
+        attempts = job["attempts"] + 1
+        started = time.perf_counter()
+        try:
+            await handler(json.loads(job["payload"]))
+        except asyncio.CancelledError:
+            # Shutting down mid-job: leave it for the next start.
+            with self._conn:
+                self._conn.execute("UPDATE jobs SET state = 'pending' WHERE id = ?", (job["id"],))
+            raise
+        except Exception as e:
+            if is_retryable(e) and attempts < MAX_ATTEMPTS:
+                delay = min(BACKOFF_BASE * 2 ** (attempts - 1), BACKOFF_MAX) * random.uniform(0.8, 1.2)
+                state = "pending"
+            else:
+                delay = 0
+                state = "failed"
+                print(f"Job {job['id']} ({job['kind']}) failed: {e}")
+            job_duration.observe(time.perf_counter() - started, kind=job["kind"], status="retry" if state == "pending" else "failed")
+            with self._conn:
+                self._conn.execute(
+                    "UPDATE jobs SET state = ?, attempts = ?, run_after = ?, last_error = ? WHERE id = ?",
+                    (state, attempts, time.time() + delay, repr(e), job["id"]),
+                )
+            return
+        job_duration.observe(time.perf_counter() - started, kind=job["kind"], status="ok")
+        with self._conn:
+            self._conn.execute("DELETE FROM jobs WHERE id = ?", (job["id"],))
+
+    async def drain(self, timeout=60):
+        # Lets running jobs and jobs that come due within `timeout` finish,
+        # then stops the workers. Anything left stays in the table for the
+        # next start.
+        deadline = time.time() + timeout
+        placeholders, kinds = self._kinds()
+        while time.time() < deadline:
+            due = 0
+            if kinds:
+                due = self._conn.execute(
+                    f"SELECT count(*) FROM jobs WHERE state = 'pending' AND kind IN ({placeholders}) AND run_after <= ?",
+                    (*kinds, deadline),
+                ).fetchone()[0]
+            if not due and not self._running:
+                break
+            await asyncio.sleep(0.2)
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
@@ -0,0 +1,115 @@
+import html
+import re
+
+# ---------------- Discord markdown -> HTML ----------------
+
+# One alternation for every token a transcript cares about, so each string is
+# scanned once. It runs over already escaped text, which is why mentions are
+# matched as &lt;...&gt;. Code comes first so nothing inside it is treated as
+# markup.
+TOKEN_RE = re.compile(
+    r"```(?:[\w+-]*\n)?(?P<codeblock>.+?)```"
+    r"|`(?P<code>[^`]+)`"
+    r"|&lt;#(?P<channel>\d+)&gt;"
+    r"|&lt;@&amp;(?P<role>\d+)&gt;"
+    r"|&lt;@!?(?P<user>\d+)&gt;"
+    r"|\*\*\*(?P<bold_italic>.+?)\*\*\*"
+    r"|\*\*(?P<bold>.+?)\*\*"
+    r"|__(?P<underline>.+?)__"
+    r"|~~(?P<strike>.+?)~~"
+    r"|\|\|(?P<spoiler>.+?)\|\|"
+    r"|\*(?P<italic>[^*\s](?:[^*]*?[^*\s])?)\*"
+    r"|\b_(?P<italic_underscore>[^_\s](?:[^_]*?[^_\s])?)_\b",
+    re.DOTALL,
+)
+
+# Mentions in raw message text, for resolving them ahead of rendering.
+MENTION_RE = re.compile(r"<#(?P<channel>\d+)>|<@&(?P<role>\d+)>|<@!?(?P<user>\d+)>")
+
+TAGS = {
+    "bold_italic": ("<b><i>", "</i></b>"),
+    "bold": ("<b>", "</b>"),
+    "underline": ("<u>", "</u>"),
+    "strike": ("<s>", "</s>"),
+    "spoiler": ('<span class="spoiler">', "</span>"),
+    "italic": ("<i>", "</i>"),
+    "italic_underscore": ("<i>", "</i>"),
+}
+
+
+def escape(text):
+    return html.escape(text, quote=False)
+
+
+class MarkdownRenderer:
+    # Renders message text for one transcript. Mention lookups are memoized by
+    # their raw token, so a role pinged on every message is resolved once.
+    #
+    # Without a guild (in a render worker) mentions come from `mentions`, the
+    # table another renderer filled with collect(). `members` looks up users
+    # the guild doesn't cache (utils.members.recent_members).
+
+    def __init__(self, guild=None, mentions=None, members=None):
+        self.guild = guild
+        self.members = members
+        self._mentions = dict(mentions or {})
+
+    @property
+    def mentions(self):
+        return self._mentions
+
+    def render(self, text):
+        return TOKEN_RE.sub(self._render_token, escape(text))
+
+    def collect(self, text):
+        # Resolves the mentions in `text` now, without rendering it.
+        for match in MENTION_RE.finditer(text):
+            token = escape(match[0])
+            if token not in self._mentions:
+                self._mentions[token] = self._resolve(match.lastgroup, int(match[match.lastgroup]), token)
+
+    def _render_token(self, match):
+        kind = match.lastgroup
+        value = match[kind]
+
+        if kind == "codeblock":
+            return f"<pre><code>{value}</code></pre>"
+        if kind == "code":
+            return f"<code>{value}</code>"
+        if kind in TAGS:
+            open_tag, close_tag = TAGS[kind]
+            return f"{open_tag}{TOKEN_RE.sub(self._render_token, value)}{close_tag}"
+
+        token = match[0]
+        rendered = self._mentions.get(token)
+        if rendered is None:
+            rendered = self._mentions[token] = self._resolve(kind, int(value), token)
+        return rendered
+
+    def _resolve(self, kind, value, token):
+        if self.guild is None:
+            return token
+        if kind == "channel":
+            return self._channel_mention(value)
+        if kind == "role":
+            return self._role_mention(value)
+        return self._user_mention(value)
+
+    def _channel_mention(self, channel_id):
+        channel = self.guild.get_channel(channel_id)
+        name = escape(channel.name) if channel else "deleted-channel"
+        return f'<span class="channel-mention">#{name}</span>'
+
+    def _user_mention(self, user_id):
+        member = self.members.cached(self.guild, user_id) if self.members else self.guild.get_member(user_id)
+        name = escape(member.display_name) if member else "unknown-user"
+        return f'<span class="mention">@{name}</span>'
+
+    def _role_mention(self, role_id):
+        role = self.guild.get_role(role_id)
+        if role is None:
+            return "@deleted-role"
+        r, g, b = role.color.r, role.color.g, role.color.b
+        bg = f"rgb({int(r*0.25)},{int(g*0.25)},{int(b*0.25)})" if role.color.value else "rgba(255,255,255,0.1)"
+        color = f"#{role.color.value:06x}" if role.color.value else "#ffffff"
+        return f'<span class="role-mention" style="background-color:{bg}; color:{color};">@{escape(role.name)}</span>'
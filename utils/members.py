@@ -0,0 +1,92 @@
+import os
+import re
+import time
+from collections import OrderedDict
+
+import discord
+
+# ---------------- Members ----------------
+#
+# Looking up one member, listing all of them and picking out members for the
+# commands that work on many at once (VIP+ reconciliation, bulk roles).
+
+# A raw ID or a mention, 17-20 digits
+MEMBER_ID_RE = re.compile(r"(?<!\d)\d{17,20}(?!\d)")
+
+# Members fetched over REST, for when the guild cache doesn't keep them (the
+# low memory profile). Entries expire so role colours don't go stale.
+MEMBER_LRU_SIZE = int(os.getenv("MEMBER_LRU_SIZE", 512))
+MEMBER_LRU_SECONDS = float(os.getenv("MEMBER_LRU_SECONDS", 300))
+
+MISSING = object()
+
+
+class MemberLRU:
+    def __init__(self, size=MEMBER_LRU_SIZE, ttl=MEMBER_LRU_SECONDS):
+        self.size = size
+        self.ttl = ttl
+        # (guild id, user id) -> (expires at, member or None if they left)
+        self._entries = OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, guild, user_id):
+        # The member, None for someone who isn't in the guild, MISSING when
+        # neither the guild cache nor the LRU knows.
+        member = guild.get_member(user_id)
+        if member is not None:
+            return member
+        key = (guild.id, user_id)
+        entry = self._entries.get(key)
+        if entry is None:
+            return MISSING
+        if entry[0] < time.monotonic():
+            del self._entries[key]
+            return MISSING
+        self._entries.move_to_end(key)
+        return entry[1]
+
+    def cached(self, guild, user_id):
+        member = self.get(guild, user_id)
+        return None if member is MISSING else member
+
+    def put(self, guild, user_id, member):
+        if self.size <= 0:
+            return
+        key = (guild.id, user_id)
+        self._entries[key] = (time.monotonic() + self.ttl, member)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.size:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+
+
+recent_members = MemberLRU()
+
+
+async def get_member_safe(guild, user_id):
+    member = recent_members.get(guild, user_id)
+    if member is MISSING:
+        try:
+            member = await guild.fetch_member(user_id)
+        except discord.NotFound:
+            member = None
+        recent_members.put(guild, user_id, member)
+    return member
+
+
+async def guild_members(guild):
+    if guild.chunked:
+        return list(guild.members)
+    # Without a full member cache, ask the gateway for everyone and keep
+    # them only as long as the caller does
+    return await guild.chunk(cache=False)
+
+
+def parse_member_ids(text):
+    # IDs in pasted text or a CSV export, in order and without repeats.
+    # Anything that isn't an ID (headers, names, dates) is ignored.
+    return list(dict.fromkeys(int(match) for match in MEMBER_ID_RE.findall(text)))
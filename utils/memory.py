@@ -0,0 +1,67 @@
+import os
+from typing import NamedTuple, Optional
+
+import discord
+
+# ---------------- Memory profile ----------------
+#
+# How much of the guild the bot keeps in memory. The code only needs a member
+# now and then: ticket authors and their role colours, boosters, bulk role
+# filters. A big guild fully cached costs far more than that.
+#
+#   default  what the bot always ran with: no members intent, so no member
+#            events or member lists (VIP+ sync and bulk role filters need
+#            one of the others), 1000 cached messages
+#   full     members intent, every member cached, chunked at startup
+#   low      members intent, no member cache and no startup chunking. Single
+#            members are fetched when needed and kept in a small LRU (see
+#            utils/members.py), full lists are chunked on demand and dropped
+#            again. No message cache, the ticket log works off raw events.
+#
+# With no member cache discord.py only sends on_member_update for members it
+# knows, so VIP+ changes are picked up by the periodic reconcile instead, which
+# runs daily under low since it chunks the whole guild (see cogs/boosters.py).
+
+MEMORY_PROFILE = os.getenv("MEMORY_PROFILE", "default")
+
+
+class MemoryProfile(NamedTuple):
+    members_intent: bool
+    # "library" keeps discord.py's default for the intents
+    member_cache: str
+    chunk_at_startup: bool
+    max_messages: Optional[int]
+
+
+PROFILES = {
+    "default": MemoryProfile(members_intent=False, member_cache="library", chunk_at_startup=False, max_messages=1000),
+    "full": MemoryProfile(members_intent=True, member_cache="all", chunk_at_startup=True, max_messages=1000),
+    "low": MemoryProfile(members_intent=True, member_cache="none", chunk_at_startup=False, max_messages=None),
+}
+
+
+def get_profile(name=None):
+    name = name or MEMORY_PROFILE
+    if name not in PROFILES:
+        raise ValueError(f"MEMORY_PROFILE must be one of {', '.join(PROFILES)}, not {name!r}")
+    return PROFILES[name]
+
+
+def client_options(name=None):
+    # Keyword arguments for commands.Bot
+    profile = get_profile(name)
+    intents = discord.Intents.default()
+    intents.message_content = True
+    intents.members = profile.members_intent
+    if profile.member_cache == "all":
+        member_cache_flags = discord.MemberCacheFlags.all()
+    elif profile.member_cache == "none":
+        member_cache_flags = discord.MemberCacheFlags.none()
+    else:
+        member_cache_flags = discord.MemberCacheFlags.from_intents(intents)
+    return {
+        "intents": intents,
+        "member_cache_flags": member_cache_flags,
+        "chunk_guilds_at_startup": profile.chunk_at_startup,
+        "max_messages": profile.max_messages,
+    }
@@ -0,0 +1,116 @@
+import discord
+
+# ---------------- Guild name index ----------------
+#
+# Roles, channels and categories looked up by name without scanning the
+# guild every time. Each guild gets a name -> id map per kind, built on first
+# use and kept current from the role/channel gateway events. Ids are resolved
+# through the guild's own cache, so an entry is never a stale object.
+#
+# Like discord.utils.get, a name used twice resolves to one of them.
+
+KINDS = {
+    "roles": (lambda guild: guild.roles, lambda guild, id: guild.get_role(id)),
+    "channels": (lambda guild: guild.channels, lambda guild, id: guild.get_channel(id)),
+    "categories": (lambda guild: guild.categories, lambda guild, id: guild.get_channel(id)),
+}
+
+
+class GuildNameIndex:
+    def __init__(self, bot):
+        self.bot = bot
+        # (guild id, kind) -> {name: id}
+        self._maps = {}
+        for listener in (
+            self.on_guild_role_create, self.on_guild_role_update, self.on_guild_role_delete,
+            self.on_guild_channel_create, self.on_guild_channel_update, self.on_guild_channel_delete,
+            self.on_guild_remove, self.on_ready,
+        ):
+            bot.add_listener(listener)
+
+    def __len__(self):
+        return len(self._maps)
+
+    def _build(self, guild, kind):
+        entities, _ = KINDS[kind]
+        names = {}
+        for entity in entities(guild):
+            names.setdefault(entity.name, entity.id)
+        self._maps[(guild.id, kind)] = names
+        return names
+
+    def _find(self, guild, kind, name):
+        names = self._maps.get((guild.id, kind))
+        if names is None:
+            names = self._build(guild, kind)
+        entity_id = names.get(name)
+        if entity_id is None:
+            return None
+        entity = KINDS[kind][1](guild, entity_id)
+        if entity is None or entity.name != name:
+            # An event was missed (e.g. while disconnected); rebuild once.
+            entity_id = self._build(guild, kind).get(name)
+            entity = KINDS[kind][1](guild, entity_id) if entity_id is not None else None
+        return entity
+
+    def role(self, guild, name):
+        return self._find(guild, "roles", name)
+
+    def channel(self, guild, name):
+        return self._find(guild, "channels", name)
+
+    def category(self, guild, name):
+        return self._find(guild, "categories", name)
+
+    # ---------------- keeping it current ----------------
+
+    def _kinds(self, entity):
+        if isinstance(entity, discord.Role):
+            return ("roles",)
+        if isinstance(entity, discord.CategoryChannel):
+            return ("channels", "categories")
+        return ("channels",)
+
+    def _added(self, entity):
+        for kind in self._kinds(entity):
+            names = self._maps.get((entity.guild.id, kind))
+            if names is not None:
+                names.setdefault(entity.name, entity.id)
+
+    def _removed(self, entity, name):
+        for kind in self._kinds(entity):
+            names = self._maps.get((entity.guild.id, kind))
+            if names is not None and names.get(name) == entity.id:
+                # Another entity may share the name, so the map is rebuilt
+                # on the next lookup instead of just dropping the key.
+                del self._maps[(entity.guild.id, kind)]
+
+    async def on_guild_role_create(self, role):
+        self._added(role)
+
+    async def on_guild_role_update(self, before, after):
+        if before.name != after.name:
+            self._removed(before, before.name)
+            self._added(after)
+
+    async def on_guild_role_delete(self, role):
+        self._removed(role, role.name)
+
+    async def on_guild_channel_create(self, channel):
+        self._added(channel)
+
+    async def on_guild_channel_update(self, before, after):
+        if before.name != after.name:
+            self._removed(before, before.name)
+            self._added(after)
+
+    async def on_guild_channel_delete(self, channel):
+        self._removed(channel, channel.name)
+
+    async def on_guild_remove(self, guild):
+        for kind in KINDS:
+            self._maps.pop((guild.id, kind), None)
+
+    async def on_ready(self):
+        # The caches are rebuilt on a fresh connection.
+        self._maps.clear()
@@ -0,0 +1,157 @@
+import asyncio
+import datetime
+import os
+import re
+import time
+
+import discord
+
+# ---------------- Purge engine ----------------
+#
+# Streams a channel's history, picks the messages that match the filters and
+# deletes them while the scan is still going. Messages younger than 14 days
+# go out in bulk-delete batches of up to 100; older ones can only be deleted
+# one at a time, so they get their own worker and never hold the batches up.
+# discord.py's rate limiter paces both.
+
+BULK_MAX_AGE = datetime.timedelta(days=14) - datetime.timedelta(minutes=5)
+BULK_SIZE = 100
+PURGE_SCAN_LIMIT = int(os.getenv("PURGE_SCAN_LIMIT", 10_000))
+PROGRESS_INTERVAL = 2.0
+
+
+def message_filter(author=None, pattern=None, attachments=None, bots=None):
+    # Builds the predicate for one purge; None means "don't filter on it".
+    regex = re.compile(pattern, re.IGNORECASE) if pattern else None
+
+    def check(message):
+        if author is not None and message.author.id != author.id:
+            return False
+        if bots is not None and message.author.bot != bots:
+            return False
+        if attachments is not None and bool(message.attachments) != attachments:
+            return False
+        if regex is not None and not regex.search(message.content or ""):
+            return False
+        return True
+
+    return check
+
+
+class Purge:
+    def __init__(self, channel, amount, check=None, before=None, after=None, skip=(), scan_limit=PURGE_SCAN_LIMIT):
+        self.channel = channel
+        self.amount = amount
+        self.check = check
+        self.before = before
+        self.after = after
+        # Message ids that must survive, e.g. the progress message itself
+        self.skip = set(skip)
+        self.scan_limit = scan_limit
+        self.scanned = 0
+        self.matched = 0
+        self.bulk_deleted = 0
+        self.single_deleted = 0
+        self.failed = 0
+        self.started = None
+        self.finished = None
+        self._cancelled = asyncio.Event()
+
+    @property
+    def deleted(self):
+        return self.bulk_deleted + self.single_deleted
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    @property
+    def rate(self):
+        elapsed = (self.finished or time.perf_counter()) - (self.started or time.perf_counter())
+        return self.deleted / elapsed if elapsed > 0 else 0.0
+
+    def cancel(self):
+        self._cancelled.set()
+
+    async def _scan(self, bulk, single):
+        bulk_cutoff = discord.utils.utcnow() - BULK_MAX_AGE
+        batch = []
+        try:
+            async for message in self.channel.history(limit=self.scan_limit, before=self.before, after=self.after):
+                if self.cancelled:
+                    break
+                self.scanned += 1
+                if message.id in self.skip:
+                    continue
+                if self.check is not None and not self.check(message):
+                    continue
+                self.matched += 1
+                if message.created_at > bulk_cutoff:
+                    batch.append(message)
+                    if len(batch) == BULK_SIZE:
+                        await bulk.put(batch)
+                        batch = []
+                else:
+                    await single.put(message)
+                if self.matched >= self.amount:
+                    break
+            if batch:
+                await bulk.put(batch)
+        finally:
+            await bulk.put(None)
+            await single.put(None)
+
+    async def _bulk_worker(self, bulk):
+        while (batch := await bulk.get()) is not None:
+            if self.cancelled:
+                continue
+            try:
+                if len(batch) == 1:
+                    await batch[0].delete()
+                else:
+                    await self.channel.delete_messages(batch)
+                self.bulk_deleted += len(batch)
+            except discord.NotFound:
+                # Someone else deleted one of them first; bulk delete is all
+                # or nothing, so the rest go the slow way.
+                for message in batch:
+                    await self._delete_one(message)
+            except discord.HTTPException:
+                self.failed += len(batch)
+
+    async def _delete_one(self, message):
+        try:
+            await message.delete()
+            self.single_deleted += 1
+        except discord.NotFound:
+            pass
+        except discord.HTTPException:
+            self.failed += 1
+
+    async def _single_worker(self, single):
+        while (message := await single.get()) is not None:
+            if not self.cancelled:
+                await self._delete_one(message)
+
+    async def run(self, progress=None):
+        # `progress` is awaited with this Purge at most every PROGRESS_INTERVAL
+        # seconds while it runs.
+        self.started = time.perf_counter()
+        # Bounded, so the scan never runs far ahead of the deletes.
+        bulk = asyncio.Queue(maxsize=4)
+        single = asyncio.Queue(maxsize=BULK_SIZE)
+        work = asyncio.gather(self._scan(bulk, single), self._bulk_worker(bulk), self._single_worker(single))
+        try:
+            while True:
+                try:
+                    await asyncio.wait_for(asyncio.shield(work), PROGRESS_INTERVAL)
+                    break
+                except asyncio.TimeoutError:
+                    if progress is not None:
+                        await progress(self)
+        except BaseException:
+            work.cancel()
+            raise
+        finally:
+            self.finished = time.perf_counter()
+        return self
@@ -0,0 +1,159 @@
+import time
+from typing import NamedTuple, Optional
+
+import discord
+
+from utils import db
+from utils.search import ticket_category
+
+# ---------------- Ticket registry ----------------
+#
+# Which channels are tickets, who opened them and in which category. Rows
+# are keyed by channel id, so renaming a ticket channel changes nothing.
+# Open tickets are loaded into memory on start, every check is a dict
+# lookup; SQLite only sees the writes.
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tickets (
+    channel_id INTEGER PRIMARY KEY,
+    guild_id INTEGER NOT NULL,
+    owner_id INTEGER NOT NULL,
+    category TEXT NOT NULL,
+    state TEXT NOT NULL DEFAULT 'open',
+    opened_at REAL NOT NULL,
+    closed_at REAL
+);
+CREATE INDEX IF NOT EXISTS tickets_owner ON tickets (guild_id, owner_id, category, state);
+CREATE INDEX IF NOT EXISTS tickets_category ON tickets (category, state);
+CREATE INDEX IF NOT EXISTS tickets_state ON tickets (state);
+"""
+
+# "open" tickets count against the one-per-category limit, "closing" ones
+# are still ticket channels but are on their way out.
+LIVE_STATES = ("open", "closing")
+
+
+class Ticket(NamedTuple):
+    channel_id: int
+    guild_id: int
+    owner_id: int
+    category: str
+    state: str
+    opened_at: float
+
+
+class TicketRegistry:
+    def __init__(self):
+        self._conn = db.connect()
+        self._conn.executescript(SCHEMA)
+        self._tickets = {}
+        # (guild id, owner id, category) -> channel ids of open tickets
+        self._owners = {}
+        rows = self._conn.execute(
+            "SELECT channel_id, guild_id, owner_id, category, state, opened_at FROM tickets WHERE state IN (?, ?)",
+            LIVE_STATES,
+        ).fetchall()
+        for row in rows:
+            self._remember(Ticket(*row))
+
+    def __len__(self):
+        return len(self._tickets)
+
+    def __contains__(self, channel_id):
+        return channel_id in self._tickets
+
+    def _remember(self, ticket):
+        self._tickets[ticket.channel_id] = ticket
+        if ticket.state == "open":
+            self._owners.setdefault((ticket.guild_id, ticket.owner_id, ticket.category), set()).add(ticket.channel_id)
+
+    def _forget_owner(self, ticket):
+        key = (ticket.guild_id, ticket.owner_id, ticket.category)
+        channels = self._owners.get(key)
+        if channels is not None:
+            channels.discard(ticket.channel_id)
+            if not channels:
+                del self._owners[key]
+
+    def tickets(self):
+        return list(self._tickets.values())
+
+    def get(self, channel_id) -> Optional[Ticket]:
+        return self._tickets.get(channel_id)
+
+    def owner(self, channel_id):
+        ticket = self._tickets.get(channel_id)
+        return ticket.owner_id if ticket is not None else None
+
+    def open_tickets(self, guild_id, owner_id, category):
+        return self._owners.get((guild_id, owner_id, category), set())
+
+    def open(self, channel, owner_id, category):
+        ticket = Ticket(channel.id, channel.guild.id, owner_id, category, "open", time.time())
+        with self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO tickets (channel_id, guild_id, owner_id, category, state, opened_at) VALUES (?, ?, ?, ?, ?, ?)",
+                ticket,
+            )
+        self._remember(ticket)
+        return ticket
+
+    def mark_closing(self, channel_id):
+        ticket = self._tickets.get(channel_id)
+        if ticket is None or ticket.state == "closing":
+            return
+        with self._conn:
+            self._conn.execute("UPDATE tickets SET state = 'closing' WHERE channel_id = ?", (channel_id,))
+        self._forget_owner(ticket)
+        self._tickets[channel_id] = ticket._replace(state="closing")
+
+    def close(self, channel_id):
+        ticket = self._tickets.pop(channel_id, None)
+        if ticket is None:
+            return False
+        with self._conn:
+            self._conn.execute(
+                "UPDATE tickets SET state = 'closed', closed_at = ? WHERE channel_id = ?", (time.time(), channel_id)
+            )
+        self._forget_owner(ticket)
+        return True
+
+    # ---------------- reconciliation ----------------
+
+    def reconcile(self, guild):
+        # Closes tickets whose channel is gone and adopts ticket channels the
+        # registry doesn't know yet (opened before it existed, or while a
+        # write failed). Returns (closed, adopted).
+        closed = 0
+        for ticket in [t for t in self._tickets.values() if t.guild_id == guild.id]:
+            if guild.get_channel(ticket.channel_id) is None:
+                closed += self.close(ticket.channel_id)
+
+        adopted = 0
+        for channel in guild.text_channels:
+            if channel.id in self._tickets:
+                continue
+            category = ticket_category(channel.name)
+            if category is None:
+                continue
+            # The opener is the only member overwrite besides the bot.
+            # Uncached members come back as discord.Object.
+            owners = [
+                target.id for target in channel.overwrites
+                if not isinstance(target, discord.Role) and target.id != guild.me.id and not getattr(target, "bot", False)
+            ]
+            if len(owners) != 1:
+                continue
+            self.open(channel, owners[0], category)
+            adopted += 1
+        return closed, adopted
+
+
+_registry = None
+
+
+def get_registry():
+    global _registry
+    if _registry is None:
+        _registry = TicketRegistry()
+    return _registry
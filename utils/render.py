@@ -0,0 +1,236 @@
+import asyncio
+import html
+import multiprocessing
+import os
+import pickle
+from concurrent.futures import ProcessPoolExecutor
+from typing import NamedTuple, Optional
+
+from utils import db
+from utils.markdown import MarkdownRenderer, escape
+from utils.search import TranscriptIndexer
+from utils.transcripts import PAGE_FOOTER, TranscriptWriter, page_header
+
+# ---------------- Transcript rendering ----------------
+#
+# Rendering a big ticket is pure CPU: markdown, escaping, string building,
+# compression and the index rows. The event loop only collects plain records
+# (authors resolved, mentions looked up, asset URLs mirrored) into a spool
+# file; the page is rendered and written from that spool in a worker process,
+# so heartbeats and interactions keep flowing while it runs.
+#
+# TRANSCRIPT_RENDER_WORKERS sets the number of worker processes; 0 renders
+# on the event loop like before.
+
+TRANSCRIPT_RENDER_WORKERS = int(os.getenv("TRANSCRIPT_RENDER_WORKERS", 2))
+# Records pickled into the spool at a time
+SPOOL_CHUNK = 100
+
+
+class FieldRecord(NamedTuple):
+    name: str
+    value: str
+
+
+class EmbedRecord(NamedTuple):
+    color: Optional[int]
+    title: Optional[str]
+    description: Optional[str]
+    fields: list
+    image_url: Optional[str]
+    thumbnail_url: Optional[str]
+
+
+class AttachmentRecord(NamedTuple):
+    filename: str
+    url: str
+    content_type: Optional[str]
+
+
+class MessageRecord(NamedTuple):
+    # Everything a rendered message needs, nothing that needs the guild.
+    # The attribute names follow discord.Message where the search index
+    # reads them (content, embeds, attachments, created_at).
+    author_name: str
+    avatar_url: str
+    role_color: str
+    bot: bool
+    created_at: object
+    content: str
+    embeds: list
+    attachments: list
+
+
+def message_record(msg, author, markdown, mirror=None):
+    # Runs on the event loop. Mentions are resolved into `markdown` and asset
+    # URLs point at our own copies when there is a mirror.
+    asset = mirror.url if mirror else (lambda url: url)
+    avatar_url = asset(author.avatar_url)
+    if msg.content:
+        markdown.collect(msg.content)
+    embeds = []
+    for embed in msg.embeds:
+        if embed.description:
+            markdown.collect(embed.description)
+        fields = [FieldRecord(field.name, field.value) for field in embed.fields]
+        for field in fields:
+            markdown.collect(field.value)
+        embeds.append(EmbedRecord(
+            color=embed.color.value if embed.color else None,
+            title=embed.title,
+            description=embed.description,
+            fields=fields,
+            image_url=asset(embed.image.url) if embed.image and embed.image.url else None,
+            thumbnail_url=asset(embed.thumbnail.url) if embed.thumbnail and embed.thumbnail.url else None,
+        ))
+    attachments = [AttachmentRecord(a.filename, asset(a.url), a.content_type) for a in msg.attachments]
+    return MessageRecord(
+        author_name=author.display_name,
+        avatar_url=avatar_url,
+        role_color=author.role_color,
+        bot=bool(getattr(msg.author, "bot", False)),
+        created_at=msg.created_at,
+        content=msg.content,
+        embeds=embeds,
+        attachments=attachments,
+    )
+
+
+def url_attr(url):
+    # URLs go into src/href attributes, a quote in one must not end it
+    return html.escape(url, quote=True)
+
+
+def render_record(record, markdown):
+    parts = []
+    is_bot = "bot" if record.bot else ""
+    parts.append('<div class="message">')
+    parts.append(f'<img src="{url_attr(record.avatar_url)}" class="avatar">')
+    parts.append('<div class="message-content">')
+
+    user_display = f'<span class="author {is_bot}" style="color:{record.role_color}">{escape(record.author_name)}</span>'
+    time_str = record.created_at.strftime("%d. %m. %Y %I:%M %p")
+    time_html = f'<span class="time">{time_str}</span>'
+    parts.append(f'<div style="display:flex;align-items:center;">{user_display}{time_html}</div>')
+
+    if record.content:
+        content_html = markdown.render(record.content)
+        parts.append(f'<div class="content">{content_html}</div>')
+
+    # --- embeds ---
+    for embed in record.embeds:
+        embed_color = f"#{embed.color:06x}" if embed.color is not None else "#4f545c"
+        parts.append(f'<div class="embed" style="border-left:4px solid {embed_color}; background:#2f3136; padding:10px; margin-top:8px; border-radius:4px; max-width:520px;">')
+        if embed.title:
+            parts.append(f'<div style="font-weight:600; font-size:16px; margin-bottom:4px;">{escape(embed.title)}</div>')
+        if embed.description:
+            desc_html = markdown.render(embed.description)
+            parts.append(f'<div style="font-size:14px; white-space:pre-wrap; margin-bottom:6px;">{desc_html}</div>')
+        for field in embed.fields:
+            field_html = markdown.render(field.value)
+            parts.append('<div style="margin-top:4px;">')
+            parts.append(f'<div style="font-weight:600; font-size:14px; margin-bottom:2px;">{escape(field.name)}</div>')
+            parts.append(f'<div style="font-size:14px; white-space:pre-wrap;">{field_html}</div>')
+            parts.append('</div>')
+        if embed.image_url:
+            parts.append(f'<img src="{url_attr(embed.image_url)}" style="max-width:100%; margin-top:6px;">')
+        if embed.thumbnail_url:
+            parts.append(f'<img src="{url_attr(embed.thumbnail_url)}" style="max-width:80px; max-height:80px; margin-top:6px;">')
+        parts.append('</div>')
+
+    # --- attachments preview ---
+    for attachment in record.attachments:
+        url = url_attr(attachment.url)
+        if attachment.content_type and attachment.content_type.startswith("image/"):
+            parts.append(f'<div class="attachment"><a href="{url}">{escape(attachment.filename)}</a><br><img src="{url}" style="max-width:400px; max-height:400px; margin-top:6px;"></div>')
+        else:
+            parts.append(f'<div class="attachment"><a href="{url}">{escape(attachment.filename)}</a></div>')
+
+    parts.append('</div></div>')
+    return "".join(parts)
+
+
+# ---------------- Spool ----------------
+
+class Spool:
+    # Records of one transcript, pickled in chunks to a temp file.
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "wb")
+        self._chunk = []
+
+    def add(self, record):
+        self._chunk.append(record)
+        if len(self._chunk) >= SPOOL_CHUNK:
+            self._dump()
+
+    def _dump(self):
+        pickle.dump(self._chunk, self._file, protocol=pickle.HIGHEST_PROTOCOL)
+        self._chunk = []
+
+    def close(self):
+        if self._chunk:
+            self._dump()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._file.close()
+        return False
+
+
+def read_spool(path):
+    with open(path, "rb") as f:
+        while True:
+            try:
+                chunk = pickle.load(f)
+            except EOFError:
+                return
+            yield from chunk
+
+
+def render_spool(spool_path, key, title, folder, mentions, db_path):
+    # Runs in a worker process: renders and writes the transcript and its
+    # index rows. Returns (transcript path, indexed messages).
+    db.DB_PATH = db_path
+    markdown = MarkdownRenderer(mentions=mentions)
+    with TranscriptWriter(key, folder=folder) as writer, TranscriptIndexer(key) as indexer:
+        writer.write(page_header(title))
+        for record in read_spool(spool_path):
+            writer.write(render_record(record, markdown))
+            indexer.add_message(record.author_name, record)
+        writer.write(PAGE_FOOTER)
+    return writer.path, indexer.count
+
+
+# ---------------- Worker pool ----------------
+
+_pool = None
+
+
+def get_render_pool():
+    # None when rendering runs on the event loop
+    global _pool
+    if _pool is None and TRANSCRIPT_RENDER_WORKERS > 0:
+        # Spawned, not forked: the bot process runs threads (the web server,
+        # asset downloads) that a fork would copy mid-flight.
+        _pool = ProcessPoolExecutor(TRANSCRIPT_RENDER_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+    return _pool
+
+
+def shutdown_render_pool():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=True, cancel_futures=True)
+        _pool = None
+
+
+async def render_transcript(spool_path, key, title, folder, mentions):
+    args = (spool_path, key, title, folder, mentions, db.DB_PATH)
+    pool = get_render_pool()
+    if pool is None:
+        return render_spool(*args)
+    return await asyncio.get_running_loop().run_in_executor(pool, render_spool, *args)
@@ -0,0 +1,94 @@
+import os
+import time
+from collections import OrderedDict
+
+import discord
+
+# ---------------- Reply tracking ----------------
+#
+# Some bot replies only make sense next to the command that caused them
+# ("You can ping WIP again in ..."). A cog hands those pairs to track() and
+# the reply is deleted together with the command. One raw delete listener
+# serves every cog, and the index is bounded: entries expire after
+# REPLY_TTL seconds and the oldest go first once REPLY_MAX_ENTRIES is hit.
+
+REPLY_TTL = float(os.getenv("REPLY_TTL", 86400))
+REPLY_MAX_ENTRIES = int(os.getenv("REPLY_MAX_ENTRIES", 10_000))
+
+
+class ReplyTracker:
+    def __init__(self, bot, ttl=REPLY_TTL, max_entries=REPLY_MAX_ENTRIES):
+        self.bot = bot
+        self.ttl = ttl
+        self.max_entries = max_entries
+        # trigger message id -> (expires at, channel id, reply message id).
+        # Every entry gets the same TTL, so insertion order is expiry order.
+        self._replies = OrderedDict()
+        bot.add_listener(self.on_raw_message_delete)
+        bot.add_listener(self.on_raw_bulk_message_delete)
+
+    def __len__(self):
+        return len(self._replies)
+
+    def _evict(self, now):
+        replies = self._replies
+        while replies and (len(replies) > self.max_entries or next(iter(replies.values()))[0] <= now):
+            replies.popitem(last=False)
+
+    def track(self, trigger, reply):
+        now = time.time()
+        self._replies[trigger.id] = (now + self.ttl, reply.channel.id, reply.id)
+        self._replies.move_to_end(trigger.id)
+        self._evict(now)
+
+    def forget(self, trigger_id):
+        self._replies.pop(trigger_id, None)
+
+    def _take(self, message_ids):
+        # Replies whose trigger is among the deleted messages, still in time.
+        now = time.time()
+        replies = self._replies
+        if not replies:
+            return []
+        if len(message_ids) > len(replies):
+            found = [message_id for message_id in replies if message_id in message_ids]
+        else:
+            found = [message_id for message_id in message_ids if message_id in replies]
+        taken = []
+        for message_id in found:
+            expires_at, channel_id, reply_id = replies.pop(message_id)
+            if expires_at > now:
+                taken.append((channel_id, reply_id))
+        return taken
+
+    async def _delete(self, replies):
+        for channel_id, reply_id in replies:
+            try:
+                await self.bot.get_partial_messageable(channel_id).get_partial_message(reply_id).delete()
+            except discord.HTTPException:
+                pass
+
+    async def on_raw_message_delete(self, payload):
+        if payload.message_id not in self._replies:
+            return
+        await self._delete(self._take((payload.message_id,)))
+
+    async def on_raw_bulk_message_delete(self, payload):
+        replies = self._take(payload.message_ids)
+        if not replies:
+            return
+        # A purge can take out many commands at once, their replies usually
+        # sit in the same channel and go in one bulk delete.
+        by_channel = {}
+        for channel_id, reply_id in replies:
+            by_channel.setdefault(channel_id, []).append(reply_id)
+        for channel_id, reply_ids in by_channel.items():
+            channel = self.bot.get_channel(channel_id)
+            if channel is None or len(reply_ids) == 1:
+                await self._delete([(channel_id, reply_id) for reply_id in reply_ids])
+                continue
+            for start in range(0, len(reply_ids), 100):
+                try:
+                    await channel.delete_messages([discord.Object(id=reply_id) for reply_id in reply_ids[start:start + 100]])
+                except discord.HTTPException:
+                    pass
@@ -0,0 +1,303 @@
+import codecs
+import datetime
+import os
+import time
+from html.parser import HTMLParser
+from typing import NamedTuple
+
+from utils import db, transcripts
+from utils.archive import get_archive
+from utils.ticketconfig import TICKET_CATEGORIES, channel_prefix
+
+# ---------------- Transcript search index ----------------
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS indexed_transcripts (
+    ticket TEXT PRIMARY KEY,
+    category TEXT,
+    message_count INTEGER NOT NULL,
+    closed_at REAL NOT NULL
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS transcript_messages USING fts5(
+    content,
+    author,
+    ticket UNINDEXED,
+    category UNINDEXED,
+    created_at UNINDEXED,
+    tokenize = 'unicode61 remove_diacritics 2'
+);
+"""
+
+# Longest first, so a category whose prefix starts with another's still wins
+CATEGORY_PREFIXES = {
+    channel_prefix(name): name
+    for name in sorted(TICKET_CATEGORIES, key=lambda name: len(channel_prefix(name)), reverse=True)
+}
+
+BATCH_SIZE = 500
+
+
+class SearchHit(NamedTuple):
+    ticket: str
+    category: str
+    author: str
+    created_at: float
+    snippet: str
+
+
+def ticket_category(ticket):
+    for prefix, category in CATEGORY_PREFIXES.items():
+        if ticket.startswith(prefix):
+            return category
+    return None
+
+
+def connect():
+    conn = db.connect()
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def message_text(msg):
+    # Everything a reader would see in the transcript, minus the markup.
+    parts = [msg.content] if msg.content else []
+    for embed in msg.embeds:
+        parts.extend(part for part in (embed.title, embed.description) if part)
+        for field in embed.fields:
+            parts.append(f"{field.name}\n{field.value}")
+    parts.extend(attachment.filename for attachment in msg.attachments)
+    return "\n".join(parts)
+
+
+class TranscriptIndexer:
+    # Fills the index while a transcript is being written. The ticket's old
+    # rows are replaced in the same transaction, so a reopened ticket never
+    # shows up twice and a failed close keeps the previous entries.
+    #
+    # Rows are staged in a temp table of this connection until the end, so
+    # the database is only write-locked for the final swap, not while a long
+    # transcript renders (several can render at once).
+
+    def __init__(self, ticket, category=None, closed_at=None):
+        self.ticket = ticket
+        self.category = category or ticket_category(ticket)
+        self.closed_at = closed_at
+        self.count = 0
+        self._batch = []
+
+    def __enter__(self):
+        self._conn = connect()
+        self._conn.execute(
+            "CREATE TEMP TABLE staged_messages (content TEXT, author TEXT, ticket TEXT, category TEXT, created_at REAL)"
+        )
+        return self
+
+    def add(self, author, text, created_at):
+        if not text:
+            return
+        self._batch.append((text, author, self.ticket, self.category, created_at))
+        if len(self._batch) >= BATCH_SIZE:
+            self._flush()
+
+    def add_message(self, author, msg):
+        self.add(author, message_text(msg), msg.created_at.timestamp())
+
+    def _flush(self):
+        self._conn.executemany(
+            "INSERT INTO temp.staged_messages (content, author, ticket, category, created_at) VALUES (?, ?, ?, ?, ?)",
+            self._batch,
+        )
+        self.count += len(self._batch)
+        self._batch.clear()
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            if exc_type is None:
+                self._flush()
+                self._conn.commit()
+                self._conn.execute("BEGIN IMMEDIATE")
+                self._conn.execute("DELETE FROM transcript_messages WHERE ticket = ?", (self.ticket,))
+                self._conn.execute(
+                    "INSERT INTO transcript_messages (content, author, ticket, category, created_at) "
+                    "SELECT content, author, ticket, category, created_at FROM temp.staged_messages"
+                )
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO indexed_transcripts (ticket, category, message_count, closed_at) VALUES (?, ?, ?, ?)",
+                    (self.ticket, self.category, self.count, self.closed_at or time.time()),
+                )
+                self._conn.commit()
+            else:
+                self._conn.rollback()
+        finally:
+            self._conn.close()
+        return False
+
+
+def search(query, limit=20, offset=0, category=None, highlight=("**", "**")):
+    # Returns (total, hits). Plain words are quoted so user input can't be
+    # parsed as FTS5 syntax; a trailing * still works as a prefix search.
+    match = fts_query(query)
+    if not match:
+        return 0, []
+
+    where = "transcript_messages MATCH ?"
+    params = [match]
+    if category:
+        where += " AND category = ?"
+        params.append(category)
+
+    conn = connect()
+    try:
+        total = conn.execute(f"SELECT count(*) FROM transcript_messages WHERE {where}", params).fetchone()[0]
+        rows = conn.execute(
+            f"""SELECT ticket, category, author, created_at,
+                       snippet(transcript_messages, 0, ?, ?, '…', 16) AS snippet
+                FROM transcript_messages WHERE {where}
+                ORDER BY rank LIMIT ? OFFSET ?""",
+            [*highlight, *params, limit, offset],
+        ).fetchall()
+    finally:
+        conn.close()
+    return total, [SearchHit(row["ticket"], row["category"], row["author"], row["created_at"], row["snippet"]) for row in rows]
+
+
+def expire(cutoff):
+    # Drops every transcript closed before `cutoff` (a unix timestamp).
+    conn = connect()
+    try:
+        with conn:
+            conn.execute(
+                "DELETE FROM transcript_messages WHERE ticket IN (SELECT ticket FROM indexed_transcripts WHERE closed_at < ?)",
+                (cutoff,),
+            )
+            removed = conn.execute("DELETE FROM indexed_transcripts WHERE closed_at < ?", (cutoff,)).rowcount
+    finally:
+        conn.close()
+    return removed
+
+
+def fts_query(query):
+    terms = []
+    for word in query.split():
+        prefix = word.endswith("*")
+        word = word.rstrip("*").replace('"', '""')
+        if word:
+            terms.append(f'"{word}"*' if prefix else f'"{word}"')
+    return " ".join(terms)
+
+
+# ---------------- Backfill from existing HTML ----------------
+
+class TranscriptParser(HTMLParser):
+    # Pulls author, time and text back out of a rendered transcript. Embed text
+    # is folded into the message content, the same way message_text() does it.
+
+    FIELDS = {"author": "author", "time": "time", "content": "content", "embed": "content"}
+    VOID_TAGS = {"img", "br", "hr", "meta", "link", "input"}
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.messages = []
+        self._current = None
+        self._field = None
+        self._depth = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self.VOID_TAGS:
+            return
+        if self._field is not None:
+            self._depth += 1
+            if tag == "div":
+                self._current[self._field].append("\n")
+            return
+        classes = (dict(attrs).get("class") or "").split()
+        if "message" in classes:
+            self._current = {"author": [], "time": [], "content": []}
+            self.messages.append(self._current)
+        elif self._current is not None:
+            for css_class, field in self.FIELDS.items():
+                if css_class in classes:
+                    self._field = field
+                    self._depth = 1
+                    if self._current[field]:
+                        self._current[field].append("\n")
+                    break
+
+    def handle_endtag(self, tag):
+        if self._field is not None and tag not in self.VOID_TAGS:
+            self._depth -= 1
+            if self._depth == 0:
+                self._field = None
+
+    def handle_data(self, data):
+        if self._field is not None:
+            self._current[self._field].append(data)
+
+
+def parse_time(value):
+    try:
+        parsed = datetime.datetime.strptime(value.strip(), "%d. %m. %Y %I:%M %p")
+    except ValueError:
+        return 0.0
+    return parsed.replace(tzinfo=datetime.timezone.utc).timestamp()
+
+
+def indexed_tickets():
+    conn = connect()
+    try:
+        return {row["ticket"] for row in conn.execute("SELECT ticket FROM indexed_transcripts")}
+    finally:
+        conn.close()
+
+
+def decode_blocks(blocks):
+    # A multi-byte character can straddle two blocks
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    for block in blocks:
+        yield decoder.decode(block)
+    yield decoder.decode(b"", final=True)
+
+
+def index_html(ticket, blocks, closed_at):
+    parser = TranscriptParser()
+    for block in blocks:
+        parser.feed(block)
+    parser.close()
+    with TranscriptIndexer(ticket, closed_at=closed_at) as indexer:
+        for message in parser.messages:
+            indexer.add("".join(message["author"]), "".join(message["content"]).strip(), parse_time("".join(message["time"])))
+
+
+def backfill(folder=None, force=False):
+    # Indexes transcripts written before the index existed. Returns the number
+    # of transcripts that were (re)indexed. Loose files are only moved into
+    # the archive once indexed, so with force the archived ones are redone
+    # from the archive (it stores hashed keys, the index has the names).
+    folder = folder or transcripts.TRANSCRIPT_FOLDER
+    known = indexed_tickets()
+
+    indexed = 0
+    loose = set()
+    for file_name in sorted(os.listdir(folder)):
+        if not file_name.endswith(".html") or file_name.startswith("."):
+            continue
+        ticket = file_name[:-5]
+        loose.add(ticket)
+        if ticket in known and not force:
+            continue
+
+        path = os.path.join(folder, file_name)
+        with open(path, encoding="utf-8") as f:
+            index_html(ticket, iter(lambda: f.read(1024 * 1024), ""), os.path.getmtime(path))
+        indexed += 1
+
+    if force:
+        archive = get_archive()
+        for ticket in sorted(known - loose):
+            archived = archive.find(ticket)
+            if archived is None:
+                continue
+            with archived:
+                index_html(ticket, decode_blocks(archived.blocks()), archived.last_modified)
+            indexed += 1
+    return indexed
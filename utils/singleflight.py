@@ -0,0 +1,26 @@
+import asyncio
+
+# ---------------- Single-flight ----------------
+#
+# Coalesces concurrent calls for the same key: the first caller runs the
+# work, everyone who asks while it is in flight waits for and gets the same
+# result (or exception). Once it finishes the key is free again.
+
+
+class SingleFlight:
+    def __init__(self):
+        self._flights = {}
+
+    def __len__(self):
+        return len(self._flights)
+
+    async def run(self, key, factory):
+        # Returns (result, leader); leader is True for the call that did the work.
+        task = self._flights.get(key)
+        leader = task is None
+        if leader:
+            task = asyncio.ensure_future(factory())
+            self._flights[key] = task
+            task.add_done_callback(lambda _: self._flights.pop(key, None))
+        # A cancelled caller must not cancel the work the others wait on.
+        return await asyncio.shield(task), leader
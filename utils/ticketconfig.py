@@ -0,0 +1,52 @@
+import json
+import os
+from typing import NamedTuple
+
+# ---------------- Ticket categories ----------------
+#
+# config/tickets.json is the one list of ticket categories: the panel, the
+# channel names, the search index and /search all read it from here.
+
+TICKET_CONFIG = os.getenv("TICKET_CONFIG", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "config", "tickets.json"))
+
+
+class TicketCategoryConfig(NamedTuple):
+    name: str
+    option_description: str
+    emoji: str
+    title: str
+    description: str
+    ping_roles: str
+    ping_user: bool
+    discord_category: str
+    opened_label: str
+    one_per_user: bool
+
+
+def load_ticket_categories(path=TICKET_CONFIG):
+    # Read once at import; the role pings are rendered to mentions up front
+    with open(path, encoding="utf-8") as f:
+        raw = json.load(f)
+    return {
+        name: TicketCategoryConfig(
+            name=name,
+            option_description=entry["option_description"],
+            emoji=entry["emoji"],
+            title=entry["title"],
+            description=entry["description"],
+            ping_roles=" ".join(f"<@&{rid}>" for rid in entry["ping"]),
+            ping_user=entry.get("ping_user", True),
+            discord_category=entry["discord_category"],
+            opened_label=entry["ticket_opened_category"],
+            one_per_user=entry.get("one_per_user", True),
+        )
+        for name, entry in raw.items()
+    }
+
+
+def channel_prefix(name):
+    # Ticket channels are named "<category>-<user>", e.g. role-request-bob
+    return f"{name.lower().replace(' ', '-')}-"
+
+
+TICKET_CATEGORIES = load_ticket_categories()
@@ -0,0 +1,338 @@
+import asyncio
+import datetime
+import json
+import os
+from typing import NamedTuple
+
+import discord
+
+from utils import db
+from utils.registry import get_registry
+
+# ---------------- Ticket message log ----------------
+#
+# Ticket channels are recorded while they are open: every message, edit and
+# delete the gateway sends for a registered ticket is appended to
+# ticket_events, so closing a ticket renders from local rows instead of
+# crawling the whole channel history.
+#
+# Whatever the bot can't have seen is recorded as a gap and crawled at close
+# time: the time it was offline (a gap after the last captured message,
+# written on every ready) and tickets it didn't open itself (no "start" row,
+# so the whole history). Deletes that happened while offline can't be
+# known, those messages stay in the transcript.
+#
+# Rows are buffered and written in the background like the cooldowns; a
+# ticket's rows are deleted once its channel is gone. SQLite only ever runs
+# in a worker thread, never on the event loop.
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS ticket_events (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    channel_id INTEGER NOT NULL,
+    message_id INTEGER NOT NULL,
+    kind TEXT NOT NULL,
+    payload TEXT
+);
+CREATE INDEX IF NOT EXISTS ticket_events_messages ON ticket_events (channel_id, message_id, seq);
+"""
+
+TICKET_LOG_FLUSH_SECONDS = float(os.getenv("TICKET_LOG_FLUSH_SECONDS", 2))
+# Rows read from SQLite per fetch while replaying a ticket.
+REPLAY_BATCH = 500
+
+
+class LoggedAvatar(NamedTuple):
+    url: str
+
+
+class LoggedAuthor(NamedTuple):
+    id: int
+    name: str
+    bot: bool
+    display_avatar: LoggedAvatar
+
+
+class LoggedAttachment(NamedTuple):
+    filename: str
+    url: str
+    content_type: str
+
+
+class LoggedMessage(NamedTuple):
+    # Carries what the transcript reads from a discord.Message.
+    id: int
+    author: LoggedAuthor
+    content: str
+    created_at: datetime.datetime
+    embeds: list
+    attachments: list
+
+
+def snapshot(message):
+    return json.dumps({
+        "author": [message.author.id, message.author.name, message.author.bot, message.author.display_avatar.url],
+        "content": message.content,
+        "created_at": message.created_at.timestamp(),
+        "embeds": [embed.to_dict() for embed in message.embeds],
+        "attachments": [[a.filename, a.url, a.content_type] for a in message.attachments],
+    }, separators=(",", ":"))
+
+
+def restore(message_id, payload):
+    data = json.loads(payload)
+    author_id, name, bot, avatar = data["author"]
+    return LoggedMessage(
+        id=message_id,
+        author=LoggedAuthor(author_id, name, bot, LoggedAvatar(avatar)),
+        content=data["content"],
+        created_at=datetime.datetime.fromtimestamp(data["created_at"], datetime.timezone.utc),
+        embeds=[discord.Embed.from_dict(embed) for embed in data["embeds"]],
+        attachments=[LoggedAttachment(*attachment) for attachment in data["attachments"]],
+    )
+
+
+class TicketLog:
+    def __init__(self, bot, flush_interval=TICKET_LOG_FLUSH_SECONDS):
+        self.bot = bot
+        self.flush_interval = flush_interval
+        # (channel id, message id, kind, payload) rows waiting to be written
+        self._pending = []
+        self._task = None
+        # Held while rows are being written, so a replay or a delete never
+        # runs next to a half-done background flush
+        self._lock = asyncio.Lock()
+        conn = self._connect()
+        conn.close()
+        for listener in (
+            self.on_message, self.on_raw_message_edit, self.on_raw_message_delete,
+            self.on_raw_bulk_message_delete, self.on_ready,
+        ):
+            bot.add_listener(listener)
+
+    def _connect(self, check_same_thread=True):
+        conn = db.connect(check_same_thread=check_same_thread)
+        conn.executescript(SCHEMA)
+        return conn
+
+    def __len__(self):
+        return len(self._pending)
+
+    # ---------------- capture ----------------
+
+    def started(self, channel_id):
+        # The bot opened this ticket, so it has seen every message since.
+        self._pending.append((channel_id, channel_id, "start", None))
+
+    async def on_message(self, message):
+        if message.channel.id in get_registry():
+            self._pending.append((message.channel.id, message.id, "message", snapshot(message)))
+
+    async def on_raw_message_edit(self, payload):
+        if payload.channel_id in get_registry():
+            self._pending.append((payload.channel_id, payload.message_id, "edit", snapshot(payload.message)))
+
+    async def on_raw_message_delete(self, payload):
+        if payload.channel_id in get_registry():
+            self._pending.append((payload.channel_id, payload.message_id, "delete", None))
+
+    async def on_raw_bulk_message_delete(self, payload):
+        if payload.channel_id in get_registry():
+            self._pending.extend((payload.channel_id, message_id, "delete", None) for message_id in payload.message_ids)
+
+    async def on_ready(self):
+        # Anything sent while the bot was away was missed, for every ticket
+        # that is still open.
+        async with self._lock:
+            pending, self._pending = self._pending, []
+            channel_ids = [ticket.channel_id for ticket in get_registry().tickets()]
+            await asyncio.to_thread(self._mark_gaps, pending, channel_ids)
+
+    def _mark_gaps(self, pending, channel_ids):
+        conn = self._connect()
+        try:
+            self.flush(pending, conn=conn)
+            gaps = []
+            for channel_id in channel_ids:
+                row = conn.execute(
+                    "SELECT MAX(message_id) FROM ticket_events WHERE channel_id = ? AND kind IN ('message', 'edit')",
+                    (channel_id,),
+                ).fetchone()
+                gaps.append((channel_id, row[0] or channel_id, "gap", None))
+            self.flush(gaps, conn=conn)
+        finally:
+            conn.close()
+
+    # ---------------- write-behind ----------------
+
+    def flush(self, pending=None, conn=None):
+        if pending is None:
+            pending, self._pending = self._pending, []
+        if not pending:
+            return 0
+        own = conn is None
+        conn = conn or self._connect()
+        try:
+            with conn:
+                conn.executemany(
+                    "INSERT INTO ticket_events (channel_id, message_id, kind, payload) VALUES (?, ?, ?, ?)", pending
+                )
+        finally:
+            if own:
+                conn.close()
+        return len(pending)
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            async with self._lock:
+                pending, self._pending = self._pending, []
+                try:
+                    await asyncio.to_thread(self.flush, pending)
+                except Exception as e:
+                    # Put them back, the next round tries again
+                    self._pending[:0] = pending
+                    print(f"Ticket log flush failed: {e}")
+
+    def start_flushing(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._flush_loop())
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        async with self._lock:
+            pending, self._pending = self._pending, []
+            await asyncio.to_thread(self.flush, pending)
+
+    async def discard(self, channel_id):
+        async with self._lock:
+            self._pending = [row for row in self._pending if row[0] != channel_id]
+            await asyncio.to_thread(self._delete, [channel_id])
+
+    def _delete(self, channel_ids):
+        conn = self._connect()
+        try:
+            with conn:
+                conn.executemany("DELETE FROM ticket_events WHERE channel_id = ?", [(channel_id,) for channel_id in channel_ids])
+        finally:
+            conn.close()
+
+    async def prune(self, open_channel_ids):
+        # Drops the rows of tickets that were closed without a transcript,
+        # e.g. deleted while the bot was offline.
+        async with self._lock:
+            return await asyncio.to_thread(self._prune, open_channel_ids)
+
+    def _prune(self, open_channel_ids):
+        conn = self._connect()
+        try:
+            channels = [row[0] for row in conn.execute("SELECT DISTINCT channel_id FROM ticket_events")]
+        finally:
+            conn.close()
+        stale = [channel_id for channel_id in channels if channel_id not in open_channel_ids]
+        self._delete(stale)
+        return len(stale)
+
+    # ---------------- replay ----------------
+
+    def _gaps(self, conn, channel_id):
+        # (after, before) message id ranges the log doesn't cover; before is
+        # None when the range runs up to now.
+        gaps = set()
+        start = conn.execute(
+            "SELECT 1 FROM ticket_events WHERE channel_id = ? AND kind = 'start' LIMIT 1", (channel_id,)
+        ).fetchone()
+        if start is None:
+            gaps.add((channel_id, 0))
+        for seq, after in conn.execute(
+            "SELECT seq, message_id FROM ticket_events WHERE channel_id = ? AND kind = 'gap'", (channel_id,)
+        ).fetchall():
+            gaps.add((after, seq))
+        ranges = set()
+        for after, seq in gaps:
+            # The first message captured after the gap closes it.
+            row = conn.execute(
+                "SELECT MIN(message_id) FROM ticket_events WHERE channel_id = ? AND kind = 'message' AND seq > ? AND message_id > ?",
+                (channel_id, seq, after),
+            ).fetchone()
+            ranges.add((after, row[0]))
+        # Ranges can overlap (a gap's start may come from an edit of an older
+        # message), so they are merged into disjoint ones.
+        merged = []
+        for after, before in sorted(ranges, key=lambda gap: gap[0]):
+            if merged and (merged[-1][1] is None or after < merged[-1][1]):
+                end = merged[-1][1]
+                merged[-1] = (merged[-1][0], None if end is None or before is None else max(end, before))
+            else:
+                merged.append((after, before))
+        return merged
+
+    async def _crawl(self, channel, ranges):
+        # The history of each range, oldest first. The ranges are sorted and
+        # disjoint, so the ids keep increasing; one is never yielded twice.
+        last = 0
+        for after, before in ranges:
+            async for message in channel.history(
+                limit=None, oldest_first=True, after=discord.Object(max(after, last)),
+                before=discord.Object(before) if before is not None else None,
+            ):
+                if message.id > last:
+                    last = message.id
+                    yield message
+
+    async def _replay(self, conn, channel_id):
+        # The latest state of every captured message, oldest first. Rows are
+        # fetched in batches on a worker thread, a long ticket is never loaded
+        # all at once.
+        cursor = await asyncio.to_thread(
+            conn.execute,
+            "SELECT message_id, kind, payload FROM ticket_events WHERE channel_id = ? AND kind IN ('message', 'edit', 'delete') "
+            "ORDER BY message_id, seq",
+            (channel_id,),
+        )
+        last = None
+        while rows := await asyncio.to_thread(cursor.fetchmany, REPLAY_BATCH):
+            for row in rows:
+                # A message's last event is its current state
+                if last is not None and row[0] != last[0] and last[1] != "delete":
+                    yield restore(last[0], last[2])
+                last = row
+        if last is not None and last[1] != "delete":
+            yield restore(last[0], last[2])
+
+    async def messages(self, channel):
+        # Every message of the ticket, oldest first: the gaps are crawled
+        # from history, the rest comes from the log.
+        async with self._lock:
+            pending, self._pending = self._pending, []
+            await asyncio.to_thread(self.flush, pending)
+        # Only one worker thread uses it at a time
+        conn = self._connect(check_same_thread=False)
+        crawled = logged = None
+        try:
+            ranges = await asyncio.to_thread(self._gaps, conn, channel.id)
+            # Both come out in id order and are merged as they go, so neither
+            # side is ever held in memory as a whole.
+            crawled = self._crawl(channel, ranges)
+            logged = self._replay(conn, channel.id)
+            next_crawled = await anext(crawled, None)
+            next_logged = await anext(logged, None)
+            while next_crawled is not None or next_logged is not None:
+                if next_logged is None or (next_crawled is not None and next_crawled.id <= next_logged.id):
+                    # Crawled messages win over logged ones with the same id,
+                    # they are the current version.
+                    if next_logged is not None and next_logged.id == next_crawled.id:
+                        next_logged = await anext(logged, None)
+                    yield next_crawled
+                    next_crawled = await anext(crawled, None)
+                else:
+                    yield next_logged
+                    next_logged = await anext(logged, None)
+        finally:
+            for source in (crawled, logged):
+                if source is not None:
+                    await source.aclose()
+            conn.close()
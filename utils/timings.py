@@ -0,0 +1,47 @@
+import time
+from collections import deque
+
+# ---------------- Stage timings ----------------
+#
+# Rolling per-stage latencies for multi-step flows (opening a ticket, ...).
+# Stages may overlap when they run concurrently, each one is timed on its
+# own. With a histogram (utils.metrics) every sample is exported too.
+
+WINDOW = 500
+
+
+class StageTimings:
+    def __init__(self, window=WINDOW, histogram=None):
+        self.window = window
+        self.histogram = histogram
+        self._samples = {}
+        self.counts = {}
+
+    def record(self, stage, seconds):
+        samples = self._samples.get(stage)
+        if samples is None:
+            samples = self._samples[stage] = deque(maxlen=self.window)
+        samples.append(seconds)
+        self.counts[stage] = self.counts.get(stage, 0) + 1
+        if self.histogram is not None:
+            self.histogram.observe(seconds, stage=stage)
+
+    async def timed(self, stage, awaitable):
+        started = time.perf_counter()
+        try:
+            return await awaitable
+        finally:
+            self.record(stage, time.perf_counter() - started)
+
+    def summary(self):
+        # stage -> (samples, p50, p95, max) in seconds, over the last `window`
+        result = {}
+        for stage, samples in self._samples.items():
+            ordered = sorted(samples)
+            result[stage] = (
+                len(ordered),
+                ordered[len(ordered) // 2],
+                ordered[min(int(len(ordered) * 0.95), len(ordered) - 1)],
+                ordered[-1],
+            )
+        return result
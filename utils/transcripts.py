@@ -0,0 +1,146 @@
+import gzip
+import os
+import tempfile
+import urllib.parse
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# ---------------- Transcript files ----------------
+
+TRANSCRIPT_FOLDER = os.path.join(os.getcwd(), "thumbnailers/transcripts")
+TRANSCRIPT_BASE_URL = "https://dscbot.onrender.com/transcripts"
+
+# Chunks are flushed to disk once this much text is buffered, so the full page
+# never has to sit in memory.
+WRITE_BUFFER_SIZE = 64 * 1024
+BROTLI_QUALITY = 9
+
+
+def ticket_key(channel):
+    # Channel names repeat when a user opens the same kind of ticket again,
+    # the channel ID makes every closed ticket its own transcript.
+    return f"{channel.name}-{channel.id}"
+
+
+def transcript_url(name):
+    return f"{TRANSCRIPT_BASE_URL}/{urllib.parse.quote(name)}.html"
+
+
+def page_header(title):
+    return f"""<!DOCTYPE html>
+<html lang="en">
+<head>
+<meta charset="UTF-8">
+<title>Transcript - {title}</title>
+<style>
+body {{ font-family: "gg sans", Arial, sans-serif; background: #2c2f33; color: #dcddde; margin: 4px; padding: 0; }}
+.header {{ background-color: #36393f; color: #fff; font-size: 20px; font-weight: bold; padding: 12px; box-shadow: 0 2px 5px rgba(0,0,0,0.3); }}
+.messages {{ margin: 0; padding: 10px; max-width: 600px; }}
+.message {{ display: flex; margin-bottom: 10px; width: 100%; }}
+.avatar {{ width: 40px; height: 40px; border-radius: 50%; margin-right: 10px; flex-shrink: 0; }}
+.message-content {{ display: flex; flex-direction: column; max-width: 100%; }}
+.author {{ font-weight: bold; }}
+.time {{ font-size: 0.75em; color: #72767d; margin-left: 12px; }}
+.content {{ margin-top: 2px; white-space: pre-wrap; }}
+.embed {{ border-left: 4px solid #4f545c; background: #2f3136; padding: 8px; border-radius: 4px; max-width: 480px; }}
+.attachment {{ margin-top: 5px; margin-left: 50px; }}
+.attachment img, .embed img {{ max-width: 300px; max-height: 300px; display: block; margin-top:5px; border-radius:4px; }}
+.mention, .role-mention, .channel-mention {{ border-radius: 4px; padding: 2px 2px; font-size: 0.95em; font-weight: 500; white-space: nowrap; }}
+.mention {{ background-color: rgba(88, 101, 242, 0.3); color: #A5B5F9; }}
+.role-mention {{ background-color: rgba(255, 255, 255, 0.1); color: inherit; }}
+.channel-mention {{ background-color: rgba(88, 101, 242, 0.3); color: #A5B5F9; }}
+code {{ font-family: Consolas, "Courier New", monospace; background: #202225; padding: 1px 3px; border-radius: 3px; }}
+pre code {{ display: block; padding: 6px; white-space: pre-wrap; }}
+.spoiler {{ background-color: #202225; color: transparent; border-radius: 3px; }}
+.spoiler:hover {{ color: inherit; }}
+a {{ color: #00b0f4; text-decoration: none; }}
+</style>
+</head>
+<body>
+<div class="header"># {title}</div>
+<div class="messages">
+"""
+
+
+PAGE_FOOTER = "</div></body></html>"
+
+
+class TranscriptWriter:
+    # Streams a transcript into hidden temp files next to the final one and
+    # renames them into place on success, so a half-written page is never
+    # served and a failed close leaves the previous transcript untouched.
+    # The gzip and brotli siblings are compressed from the same chunks, which
+    # lets the web server hand them out without compressing per request.
+
+    def __init__(self, name, folder=None, compress=True):
+        self.folder = folder or TRANSCRIPT_FOLDER
+        self.path = os.path.join(self.folder, f"{name}.html")
+        self.compress = compress
+        self._pending = []
+        self._pending_size = 0
+        self._files = []
+
+    def _open_temp(self, suffix):
+        fd, tmp_path = tempfile.mkstemp(dir=self.folder, prefix=".", suffix=f"{suffix}.tmp")
+        file = os.fdopen(fd, "wb")
+        self._files.append((file, tmp_path, self.path + suffix))
+        return file
+
+    def __enter__(self):
+        os.makedirs(self.folder, exist_ok=True)
+        self._html = self._open_temp("")
+        self._gzip = None
+        self._brotli = None
+        if self.compress:
+            self._gzip = gzip.GzipFile(fileobj=self._open_temp(".gz"), mode="wb", compresslevel=9, mtime=0)
+            if brotli is not None:
+                self._brotli = (self._open_temp(".br"), brotli.Compressor(mode=brotli.MODE_TEXT, quality=BROTLI_QUALITY))
+        return self
+
+    def write(self, chunk):
+        self._pending.append(chunk)
+        self._pending_size += len(chunk)
+        if self._pending_size >= WRITE_BUFFER_SIZE:
+            self._flush()
+
+    def _flush(self):
+        data = "".join(self._pending).encode("utf-8")
+        self._pending.clear()
+        self._pending_size = 0
+        self._html.write(data)
+        if self._gzip is not None:
+            self._gzip.write(data)
+        if self._brotli is not None:
+            file, compressor = self._brotli
+            file.write(compressor.process(data))
+
+    def _close(self):
+        if self._gzip is not None:
+            self._gzip.close()
+        if self._brotli is not None:
+            file, compressor = self._brotli
+            file.write(compressor.finish())
+        for file, _, _ in self._files:
+            file.close()
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            if exc_type is None:
+                self._flush()
+        finally:
+            self._close()
+
+        if exc_type is not None:
+            for _, tmp_path, _ in self._files:
+                os.unlink(tmp_path)
+            return False
+
+        # The page goes in first: a compressed sibling older than its page is
+        # ignored by the web server, so readers never get mismatched content.
+        for _, tmp_path, final_path in self._files:
+            os.chmod(tmp_path, 0o644)
+            os.replace(tmp_path, final_path)
+        return False
@@ -0,0 +1,287 @@
+import asyncio
+import hashlib
+import hmac
+import os
+from email.utils import formatdate
+from typing import NamedTuple, Optional
+
+from aiohttp import web
+
+from utils import metrics, search, transcripts
+from utils.archive import ArchivedTranscript, get_archive
+from utils.assets import DOWNLOAD_CONTENT_TYPE, KEY_RE, get_asset_store, safe_content_type
+
+# ---------------- Transcript serving ----------------
+
+# Preferred first. Each one is only used if the client accepts it and the
+# sibling file was written together with the page.
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+# Archived transcripts are keyed by ticket and never change, neither do
+# mirrored assets. Loose files from before the archive can still be
+# overwritten, the ETag catches that.
+ARCHIVE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+CACHE_CONTROL = "public, max-age=604800"
+
+SEARCH_PAGE_SIZE = 20
+# Search results list every ticket with its transcript link, so the endpoint
+# is for staff tools only: they send this in an X-Search-Token header. Unset,
+# the endpoint is off.
+SEARCH_TOKEN = os.getenv("SEARCH_TOKEN")
+
+_digests = {}
+
+
+class TranscriptFile(NamedTuple):
+    path: Optional[str]
+    encoding: Optional[str]
+    etag: str
+    last_modified: float
+    size: int
+    # Set instead of `path` when the transcript comes from the archive; the
+    # frontend streams it and closes it.
+    blob: Optional[ArchivedTranscript] = None
+
+
+def accepted_encodings(header):
+    accepted = set()
+    for item in (header or "").split(","):
+        coding, _, params = item.strip().partition(";")
+        coding = coding.strip().lower()
+        q = params.strip()
+        if q.startswith("q="):
+            try:
+                if float(q[2:]) <= 0:
+                    continue
+            except ValueError:
+                continue
+        if coding:
+            accepted.add(coding)
+    if "*" in accepted:
+        accepted.update(encoding for encoding, _ in ENCODINGS)
+    return accepted
+
+
+def content_digest(path, stat):
+    # Hashing a transcript is only needed once per version of the file.
+    key = (stat.st_mtime_ns, stat.st_size)
+    cached = _digests.get(path)
+    if cached and cached[0] == key:
+        return cached[1]
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    result = digest.hexdigest()[:32]
+    _digests[path] = (key, result)
+    return result
+
+
+def find_transcript(ticket_name, accept_encoding="", folder=None):
+    # Links are posted as /transcripts/<name>.html, but the bare name works too.
+    name = ticket_name[:-5] if ticket_name.endswith(".html") else ticket_name
+    if not name or name.startswith(".") or os.path.basename(name) != name:
+        return None
+
+    accepted = accepted_encodings(accept_encoding)
+    archived = get_archive().find(name, accepted)
+    if archived is not None:
+        return TranscriptFile(None, archived.encoding, archived.etag, archived.last_modified, archived.length, archived)
+
+    path = os.path.join(folder or transcripts.TRANSCRIPT_FOLDER, f"{name}.html")
+    try:
+        stat = os.stat(path)
+    except (FileNotFoundError, NotADirectoryError):
+        return None
+    digest = content_digest(path, stat)
+
+    for encoding, suffix in ENCODINGS:
+        if encoding not in accepted:
+            continue
+        try:
+            sibling = os.stat(path + suffix)
+        except FileNotFoundError:
+            continue
+        if sibling.st_mtime_ns < stat.st_mtime_ns:
+            continue
+        return TranscriptFile(path + suffix, encoding, f'"{digest}-{encoding}"', stat.st_mtime, sibling.st_size)
+
+    return TranscriptFile(path, None, f'"{digest}"', stat.st_mtime, stat.st_size)
+
+
+def is_not_modified(transcript, if_none_match):
+    if not if_none_match:
+        return False
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag == "*" or tag.removeprefix("W/") == transcript.etag:
+            return True
+    return False
+
+
+def transcript_headers(transcript):
+    headers = {
+        "ETag": transcript.etag,
+        "Last-Modified": formatdate(transcript.last_modified, usegmt=True),
+        "Cache-Control": CACHE_CONTROL if transcript.blob is None else ARCHIVE_CACHE_CONTROL,
+        "Vary": "Accept-Encoding",
+    }
+    if transcript.encoding:
+        headers["Content-Encoding"] = transcript.encoding
+    return headers
+
+
+class AssetFile(NamedTuple):
+    path: Optional[str]
+    url: str
+    etag: str
+    content_type: str
+
+
+def find_asset(key):
+    # Mirrored assets are served from disk; ones that failed to download
+    # (too large, already gone) redirect to where they came from.
+    if not KEY_RE.fullmatch(key):
+        return None
+    store = get_asset_store()
+    found = store.lookup(key)
+    if found is None:
+        return None
+    url, digest, content_type = found
+    if digest is None:
+        return AssetFile(None, url, "", "")
+    # Checked again here, rows from before the check may hold anything
+    return AssetFile(store.blob_path(digest), url, f'"{digest[:32]}"', safe_content_type(content_type))
+
+
+def asset_headers(asset):
+    headers = {"ETag": asset.etag, "Cache-Control": ARCHIVE_CACHE_CONTROL, "X-Content-Type-Options": "nosniff"}
+    if asset.content_type == DOWNLOAD_CONTENT_TYPE:
+        headers["Content-Disposition"] = "attachment"
+    return headers
+
+
+def search_allowed(headers):
+    # Returns the HTTP status to refuse with, or None
+    if not SEARCH_TOKEN:
+        return 404
+    if not hmac.compare_digest(headers.get("X-Search-Token", "").encode(), SEARCH_TOKEN.encode()):
+        return 403
+    return None
+
+
+def search_payload(args):
+    # Shared by both frontends: GET /transcripts/search?q=...&page=...&category=...
+    query = args.get("q", "").strip()
+    try:
+        page = max(int(args.get("page", 1)), 1)
+    except ValueError:
+        page = 1
+    category = args.get("category") or None
+
+    total, hits = search.search(query, SEARCH_PAGE_SIZE, (page - 1) * SEARCH_PAGE_SIZE, category)
+    return {
+        "query": query,
+        "page": page,
+        "per_page": SEARCH_PAGE_SIZE,
+        "total": total,
+        "results": [
+            {**hit._asdict(), "url": transcripts.transcript_url(hit.ticket)}
+            for hit in hits
+        ],
+    }
+
+
+# ---------------- aiohttp frontend ----------------
+
+# Runs on the bot's own event loop instead of a Flask thread. Enabled with
+# WEB_SERVER=aiohttp, see bot.py.
+
+async def handle_home(request):
+    return web.Response(text="Bot is running")
+
+
+async def handle_transcript(request):
+    # The archive lookup can wait on a store or compaction, and hashing a
+    # loose file reads all of it; neither belongs on the bot's event loop
+    transcript = await asyncio.to_thread(
+        find_transcript, request.match_info["ticket_name"], request.headers.get("Accept-Encoding", ""))
+    if transcript is None:
+        raise web.HTTPNotFound(text="Transcript not found")
+
+    headers = transcript_headers(transcript)
+    if is_not_modified(transcript, request.headers.get("If-None-Match")):
+        if transcript.blob is not None:
+            transcript.blob.close()
+        return web.Response(status=304, headers=headers)
+
+    if transcript.blob is not None:
+        with transcript.blob as blob:
+            return await stream_blob(request, blob, headers)
+
+    # FileResponse uses sendfile, but sets its own mtime based validators
+    # right before sending, so ours are put back in on_response_prepare.
+    request["validators"] = {key: headers[key] for key in ("ETag", "Last-Modified")}
+    return web.FileResponse(transcript.path, headers={**headers, "Content-Type": "text/html; charset=utf-8"})
+
+
+async def stream_blob(request, blob, headers):
+    # Archived transcripts are sent a block at a time, read off the loop
+    response = web.StreamResponse(headers={**headers, "Content-Type": "text/html; charset=utf-8"})
+    response.content_length = blob.length
+    await response.prepare(request)
+    if request.method != "HEAD":
+        blocks = blob.blocks()
+        while block := await asyncio.to_thread(next, blocks, None):
+            await response.write(block)
+    await response.write_eof()
+    return response
+
+
+async def handle_asset(request):
+    asset = await asyncio.to_thread(find_asset, request.match_info["key"])
+    if asset is None:
+        raise web.HTTPNotFound(text="Asset not found")
+    if asset.path is None:
+        raise web.HTTPFound(asset.url)
+    headers = asset_headers(asset)
+    if is_not_modified(asset, request.headers.get("If-None-Match")):
+        return web.Response(status=304, headers=headers)
+    request["validators"] = {"ETag": asset.etag}
+    return web.FileResponse(asset.path, headers={**headers, "Content-Type": asset.content_type})
+
+
+async def handle_metrics(request):
+    return web.Response(body=metrics.registry.render().encode("utf-8"), headers={"Content-Type": metrics.CONTENT_TYPE})
+
+
+async def handle_search(request):
+    refused = search_allowed(request.headers)
+    if refused is not None:
+        raise web.HTTPNotFound() if refused == 404 else web.HTTPForbidden()
+    payload = await asyncio.to_thread(search_payload, request.query)
+    return web.json_response(payload)
+
+
+async def restore_validators(request, response):
+    validators = request.get("validators")
+    if validators:
+        response.headers.update(validators)
+
+
+def create_app():
+    app = web.Application()
+    app.router.add_get("/", handle_home)
+    app.router.add_get("/transcripts/search", handle_search)
+    app.router.add_get("/transcripts/{ticket_name}", handle_transcript)
+    app.router.add_get("/assets/{key}", handle_asset)
+    app.router.add_get("/metrics", handle_metrics)
+    app.on_response_prepare.append(restore_validators)
+    return app
+
+
+async def start_web_server(host, port):
+    runner = web.AppRunner(create_app(), access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    return runner